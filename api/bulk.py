@@ -0,0 +1,54 @@
+""" Batch updates and deletes of matches
+
+Every batch runs in single transaction: matches are written with one bulk
+UPDATE (or DELETE), characters of edited matches are replaced with one DELETE
+and one multi-row INSERT, and history of every affected user is refreshed
+once, from earliest changed match (see matches.signals.deferred_maintenance).
+Batches of created matches are written by api.bulk_import.create_matches.
+"""
+
+from django.db import transaction
+
+from matches.models import Match, MatchCharacter
+from matches.signals import defer_change, deferred_maintenance
+
+MAX_BATCH_SIZE = 1000
+
+
+def load_matches(pks):
+    """ Returns dict of matches with given primary keys, loaded with single query
+    """
+    matches = Match.objects.filter(pk__in=pks).only('pk', 'user_id', 'date', 'mmr_after')
+    return {match.pk: match for match in matches}
+
+
+def update_matches(changes):
+    """ Applies list of (match, validated_data) pairs, where validated_data
+    holds new mmr_after and/or characters of match
+    """
+    with transaction.atomic(), deferred_maintenance():
+        updated = []
+        for match, data in changes:
+            if 'mmr_after' in data:
+                match.mmr_after = data['mmr_after']
+                updated.append(match)
+        Match.objects.bulk_update(updated, ['mmr_after'], batch_size=500)
+
+        relinked = [(match, data['characters']) for match, data in changes if 'characters' in data]
+        if relinked:
+            MatchCharacter.objects.filter(match_id__in=[match.pk for match, _ in relinked]).delete()
+            MatchCharacter.objects.bulk_create([
+                MatchCharacter(match_id=match.pk, character_id=character.pk, user_id=match.user_id)
+                for match, characters in relinked
+                for character in set(characters)
+            ])
+
+        for match, _ in changes:
+            defer_change(match.user_id, match.date, match.pk)
+
+
+def delete_matches(pks):
+    """ Deletes matches with given primary keys
+    """
+    with transaction.atomic(), deferred_maintenance():
+        Match.objects.filter(pk__in=pks).delete()
@@ -0,0 +1,198 @@
+""" Streaming import of match histories
+
+Rows are read from request body line by line, validated against character
+catalog and written in chunks of CHUNK_SIZE rows: one bulk INSERT of matches
+and one of their characters per chunk, each chunk in its own transaction.
+Target throughput is THROUGHPUT_TARGET rows per second, benchmark_matches
+reports whether import meets it.
+
+CSV body (text/csv) has header row with columns:
+    date - ISO 8601 date and time of match, optional (defaults to now)
+    mmr_after - player's MMR after match
+    characters - IDs or names of characters, separated with ';'
+NDJSON body (application/x-ndjson) has one JSON object per line with same
+keys, characters being a list.
+"""
+
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from characters.catalog import catalog
+from matches.models import Match, MatchCharacter, MatchSequence, history_changed
+
+CHUNK_SIZE = 500
+THROUGHPUT_TARGET = 2000
+MAX_REPORTED_ERRORS = 1000
+
+CSV = 'text/csv'
+NDJSON = 'application/x-ndjson'
+CONTENT_TYPES = (CSV, NDJSON)
+
+
+class RowError(ValueError):
+    """ Raised when row of imported data is invalid, holds dict of field errors
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        row['characters'] = [
+            c for c in (row.get('characters') or '').split(';') if c.strip()
+        ]
+        yield row
+
+
+def _ndjson_rows(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield RowError({'non_field_errors': ['Invalid JSON.']})
+            continue
+        if not isinstance(row, dict):
+            yield RowError({'non_field_errors': ['Expected JSON object.']})
+            continue
+        yield row
+
+
+def parse_rows(stream, content_type):
+    """ Yields dicts (or RowError instances) read from binary stream of given content type
+    """
+    lines = codecs.iterdecode(stream, 'utf-8')
+    if content_type == CSV:
+        return _csv_rows(lines)
+    return _ndjson_rows(lines)
+
+
+def _character(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return catalog.get(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.isdigit():
+            return catalog.get(int(value))
+        return catalog.byName(value)
+    return None
+
+
+def validate_row(row, now):
+    """ Returns (date, mmr_after, characters) tuple from imported row,
+    raises RowError if row is invalid
+    """
+    errors = {}
+
+    date = row.get('date')
+    if date in (None, ''):
+        date = now
+    else:
+        try:
+            date = parse_datetime(date) if isinstance(date, str) else None
+        except ValueError:
+            # Well formatted, but not existing date
+            date = None
+        if date is None:
+            errors['date'] = ['Invalid date, use ISO 8601 format.']
+        elif timezone.is_naive(date):
+            date = timezone.make_aware(date)
+
+    mmr_after = row.get('mmr_after')
+    try:
+        if isinstance(mmr_after, bool):
+            raise ValueError
+        mmr_after = int(mmr_after)
+        if not 0 <= mmr_after <= 2147483647:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors['mmr_after'] = ['A valid non-negative integer is required.']
+
+    values = row.get('characters')
+    characters = []
+    if not isinstance(values, list) or not values:
+        errors['characters'] = ['At least one character is required.']
+    else:
+        for value in values:
+            character = _character(value)
+            if character is None:
+                errors['characters'] = ['Unknown character "{}".'.format(value)]
+                break
+            if character not in characters:
+                characters.append(character)
+
+    if errors:
+        raise RowError(errors)
+    return date, mmr_after, characters
+
+
+def create_matches(user, chunk):
+    """ Writes validated (date, mmr_after, characters) rows in single
+    transaction, returns list of created matches
+    """
+    with transaction.atomic():
+        matches = Match.objects.bulk_create([
+            Match(user=user, date=date, mmr_after=mmr_after)
+            for date, mmr_after, _ in chunk
+        ])
+        MatchCharacter.objects.bulk_create([
+            MatchCharacter(match_id=match.pk, character_id=character.pk, user_id=user.pk)
+            for match, (_, _, characters) in zip(matches, chunk)
+            for character in characters
+        ])
+        first = min(matches, key=lambda m: (m.date, m.pk))
+        appended = MatchSequence.refreshFrom(user.pk, first.date, first.pk)
+        history_changed.send(sender=Match, user_id=user.pk, appended=appended)
+    return matches
+
+
+def import_matches(user, rows):
+    """ Imports matches of given user from iterable of rows returned by parse_rows
+
+    Returns dict with number of created matches and list of errors of rejected
+    rows, each with its 1-based number
+    """
+    now = timezone.now()
+    created = 0
+    errors = []
+    error_count = 0
+    chunk = []
+    number = 0
+    try:
+        for number, row in enumerate(rows, start=1):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                chunk.append(validate_row(row, now))
+            except RowError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'row': number, 'errors': e.errors})
+            if len(chunk) >= CHUNK_SIZE:
+                create_matches(user, chunk)
+                created += len(chunk)
+                chunk = []
+    except (csv.Error, UnicodeDecodeError):
+        # Rest of the body cannot be read, import what was read so far
+        error_count += 1
+        errors.append({
+            'row': number + 1,
+            'errors': {'non_field_errors': ['Malformed data, import stopped.']}
+        })
+    if chunk:
+        create_matches(user, chunk)
+        created += len(chunk)
+    return {
+        'created': created,
+        'rejected': error_count,
+        'errors': errors,
+    }
@@ -0,0 +1,191 @@
+""" Compact columnar encoding of match lists for sync clients
+
+Encodes data of MatchSerializer(many=True) (list of dicts with any of its
+fields) column by column instead of repeating field names and ISO dates
+for every match. All integers are little-endian; varints are unsigned
+LEB128 (7 bits per byte, lowest first, high bit set on all bytes but the
+last), signed values are zigzag-encoded into them (0, -1, 1, -2, ... as
+0, 1, 2, 3, ...).
+
+    magic       b'OVM'
+    version     1 byte, VERSION
+    fields      1 byte, bit i set if FIELDS[i] is present
+    flags       1 byte, SECONDS if all dates are whole seconds
+    count       varint, number of matches
+    columns of present fields in order of FIELDS:
+    id          signed varints, first ID then differences from previous
+    date        signed varints, first time since Unix epoch (in seconds
+                with SECONDS flag, microseconds otherwise) then differences
+                from previous
+    mmr_after   width byte (1, 2 or 4), then count unsigned ints of
+                that width
+    characters  varint k and k varints of character IDs used on page in
+                ascending order (first ID then differences), then
+                ceil(k / 8) bytes of bitmap per match, bit i (lowest bit
+                of byte i // 8 first) set if match has i-th of those IDs
+
+Lists are newest first, so differences of IDs and dates are small negative
+numbers, 1-5 bytes each; MMR is stored packed, so clients can read the
+column straight into a typed array. decode() is the reference decoder, it
+returns the same data as JSON renderer would render.
+"""
+
+import struct
+from datetime import datetime, timedelta, timezone
+
+from rest_framework.fields import DateTimeField
+
+MAGIC = b'OVM'
+VERSION = 1
+FIELDS = ('id', 'date', 'mmr_after', 'characters')
+SECONDS = 1
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECONDS = 10 ** 6
+# struct formats of MMR widths
+WIDTHS = {1: 'B', 2: 'H', 4: 'I'}
+
+
+class DecodeError(ValueError):
+    """ Raised when decoded content is not valid columnar encoding
+    """
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out, value):
+    _write_varint(out, value << 1 if value >= 0 else (~value << 1) | 1)
+
+
+def _write_deltas(out, values):
+    previous = 0
+    for value in values:
+        _write_signed(out, value - previous)
+        previous = value
+
+
+def _microseconds(value):
+    """ Returns microseconds since epoch of ISO 8601 date
+    """
+    delta = datetime.fromisoformat(value) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * MICROSECONDS + delta.microseconds
+
+
+def encode(data):
+    """ Returns bytes of list of matches' data, every item having the same fields
+    """
+    present = [name for name in FIELDS if name in data[0]] if data else []
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(sum(1 << FIELDS.index(name) for name in present))
+    times = None
+    flags = 0
+    if 'date' in present:
+        times = [_microseconds(item['date']) for item in data]
+        if all(t % MICROSECONDS == 0 for t in times):
+            flags |= SECONDS
+            times = [t // MICROSECONDS for t in times]
+    out.append(flags)
+    _write_varint(out, len(data))
+
+    if 'id' in present:
+        _write_deltas(out, [item['id'] for item in data])
+    if times is not None:
+        _write_deltas(out, times)
+    if 'mmr_after' in present:
+        mmr = [item['mmr_after'] for item in data]
+        width = next(w for w in WIDTHS if max(mmr, default=0) < 1 << (8 * w))
+        out.append(width)
+        out += struct.pack('<{}{}'.format(len(mmr), WIDTHS[width]), *mmr)
+    if 'characters' in present:
+        palette = sorted({c for item in data for c in item['characters']})
+        _write_varint(out, len(palette))
+        _write_deltas(out, palette)
+        bits = {character: 1 << i for i, character in enumerate(palette)}
+        size = (len(palette) + 7) // 8
+        for item in data:
+            out += sum(bits[c] for c in item['characters']).to_bytes(size, 'little')
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, content):
+        self.content = memoryview(content)
+        self.position = 0
+
+    def read(self, size):
+        end = self.position + size
+        if end > len(self.content):
+            raise DecodeError('Content is truncated.')
+        chunk = self.content[self.position:end]
+        self.position = end
+        return chunk
+
+    def varint(self):
+        value = shift = 0
+        while True:
+            byte, = self.read(1)
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def signed(self):
+        value = self.varint()
+        return ~(value >> 1) if value & 1 else value >> 1
+
+    def deltas(self, count):
+        values = []
+        value = 0
+        for _ in range(count):
+            value += self.signed()
+            values.append(value)
+        return values
+
+
+def decode(content):
+    """ Returns list of matches' data encoded by encode(), with dates
+    formatted the way REST framework formats them
+    """
+    reader = _Reader(content)
+    if bytes(reader.read(len(MAGIC))) != MAGIC:
+        raise DecodeError('Content is not columnar match list.')
+    version, fields, flags = reader.read(3)
+    if version != VERSION:
+        raise DecodeError('Unsupported version {}.'.format(version))
+    count = reader.varint()
+    columns = {}
+    for i, name in enumerate(FIELDS):
+        if not fields & 1 << i:
+            continue
+        if name == 'id':
+            columns[name] = reader.deltas(count)
+        elif name == 'date':
+            unit = MICROSECONDS if flags & SECONDS else 1
+            date_field = DateTimeField()
+            columns[name] = [
+                date_field.to_representation(EPOCH + timedelta(microseconds=t * unit))
+                for t in reader.deltas(count)
+            ]
+        elif name == 'mmr_after':
+            width, = reader.read(1)
+            if width not in WIDTHS:
+                raise DecodeError('Unsupported MMR width {}.'.format(width))
+            columns[name] = list(struct.unpack(
+                '<{}{}'.format(count, WIDTHS[width]), reader.read(count * width)
+            ))
+        else:
+            palette = reader.deltas(reader.varint())
+            size = (len(palette) + 7) // 8
+            columns[name] = [
+                [c for bit, c in enumerate(palette) if bitmap >> bit & 1]
+                for bitmap in (int.from_bytes(reader.read(size), 'little') for _ in range(count))
+            ]
+    return [
+        {name: values[i] for name, values in columns.items()} for i in range(count)
+    ]
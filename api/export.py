@@ -0,0 +1,147 @@
+""" Streaming export of match histories
+
+Matches are read oldest first through server-side cursor, CHUNK_SIZE rows at
+a time, with characters of each chunk loaded in one query, and written out
+as they are read, so memory used does not grow with length of history.
+Under ASGI rows are read with async ORM (aexport_rows), as Django streams
+only asynchronous iterators there.
+
+CSV has columns id, date, mmr_after, mmr_difference and characters (names
+separated with ';'), so it can be imported back. NDJSON has one object per
+match with same keys, characters being a list of IDs like in MatchSerializer.
+mmr_difference is empty (null) for first match.
+"""
+
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.fields import DateTimeField
+
+from matches.models import Match, MatchWithPrevData
+
+CHUNK_SIZE = 2000
+
+CSV_COLUMNS = ('id', 'date', 'mmr_after', 'mmr_difference', 'characters')
+
+
+# Columns read for every exported match
+MATCH_COLUMNS = ('id', 'date', 'mmr_after', 'mmr_difference')
+
+
+def _matches(user, lookups):
+    return MatchWithPrevData.objects.filter(user=user, **(lookups or {})).order_by(
+        'date', 'id'
+    )
+
+
+def _chunk_rows(chunk, characters, date_field):
+    for pk, date, mmr_after, mmr_difference in chunk:
+        yield (
+            pk,
+            date_field.to_representation(date),
+            mmr_after,
+            mmr_difference,
+            characters[pk]
+        )
+
+
+def export_rows(user, lookups=None):
+    """ Yields (id, date, mmr_after, mmr_difference, characters) tuples of
+    all matches of given user (limited by date lookups, if given), oldest first
+    """
+    matches = _matches(user, lookups).values_list(*MATCH_COLUMNS).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+    date_field = DateTimeField()
+    while True:
+        chunk = list(islice(matches, CHUNK_SIZE))
+        if not chunk:
+            return
+        characters = Match.charactersOf([row[0] for row in chunk], user.pk)
+        yield from _chunk_rows(chunk, characters, date_field)
+
+
+async def aexport_rows(user, lookups=None):
+    """ Asynchronous version of export_rows, for streaming under ASGI, where
+    Django would read synchronous iterator whole before sending it
+    """
+    date_field = DateTimeField()
+    chunk = []
+    # aiterator() of values_list() would run query on event loop
+    matches = _matches(user, lookups).values(*MATCH_COLUMNS).aiterator(chunk_size=CHUNK_SIZE)
+    async for row in matches:
+        chunk.append(tuple(row[name] for name in MATCH_COLUMNS))
+        if len(chunk) == CHUNK_SIZE:
+            characters = await Match.acharactersOf([row[0] for row in chunk], user.pk)
+            for exported in _chunk_rows(chunk, characters, date_field):
+                yield exported
+            chunk = []
+    if chunk:
+        characters = await Match.acharactersOf([row[0] for row in chunk], user.pk)
+        for exported in _chunk_rows(chunk, characters, date_field):
+            yield exported
+
+
+def _csv_writer():
+    """ Returns function formatting values as CSV line
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+    return line
+
+
+def _csv_values(row):
+    pk, date, mmr_after, mmr_difference, characters = row
+    return pk, date, mmr_after, mmr_difference, ';'.join(c.name for c in characters)
+
+
+def _ndjson_line(row):
+    pk, date, mmr_after, mmr_difference, characters = row
+    return json.dumps({
+        'id': pk,
+        'date': date,
+        'mmr_after': mmr_after,
+        'mmr_difference': mmr_difference,
+        'characters': [c.pk for c in characters],
+    }) + '\n'
+
+
+def csv_lines(rows):
+    """ Yields CSV lines (header included) of exported rows
+    """
+    line = _csv_writer()
+    yield line(CSV_COLUMNS)
+    for row in rows:
+        yield line(_csv_values(row))
+
+
+async def acsv_lines(rows):
+    """ Asynchronous version of csv_lines, for rows of aexport_rows
+    """
+    line = _csv_writer()
+    yield line(CSV_COLUMNS)
+    async for row in rows:
+        yield line(_csv_values(row))
+
+
+def ndjson_lines(rows):
+    """ Yields NDJSON lines of exported rows
+    """
+    for row in rows:
+        yield _ndjson_line(row)
+
+
+async def andjson_lines(rows):
+    """ Asynchronous version of ndjson_lines, for rows of aexport_rows
+    """
+    async for row in rows:
+        yield _ndjson_line(row)
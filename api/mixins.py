@@ -0,0 +1,38 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+
+class AsyncDispatchMixin:
+    """
+    Lets REST framework views and viewsets have async handlers (list, get, ...)
+    next to sync ones.
+
+    View is a coroutine function, so under ASGI it runs on event loop.
+    Requests for async handlers are authenticated and checked against
+    permissions and throttles in thread (they may read database), then the
+    handler is awaited. Requests for sync handlers are dispatched in thread
+    as a whole, the same way Django runs sync views. Under WSGI Django runs
+    the view in its own event loop.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        return markcoroutinefunction(super().as_view(*args, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if not iscoroutinefunction(handler):
+            return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,64 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from matches.pagination import InvalidCursor, apaginate, paginate
+
+class MatchCursorPagination(BasePagination):
+    """
+    Keyset pagination of matches ordered by (date, id), newest first.
+    Response body stays a plain list, links to older (next) and newer (prev)
+    pages are sent in Link header
+    """
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            matches, self.next_cursor, self.previous_cursor = paginate(
+                queryset, cursor, self.get_page_size(request)
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        return matches
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Asynchronous version of paginate_queryset
+        """
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            matches, self.next_cursor, self.previous_cursor = await apaginate(
+                queryset, cursor, self.get_page_size(request)
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        return matches
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        links = []
+        if self.next_cursor is not None:
+            links.append('<{}>; rel="next"'.format(self.get_link(self.next_cursor)))
+        if self.previous_cursor is not None:
+            links.append('<{}>; rel="prev"'.format(self.get_link(self.previous_cursor)))
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
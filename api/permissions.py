@@ -6,4 +6,10 @@ class IsMatchOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.user
\ No newline at end of file
+        return request.user == obj.user
+
+    def has_bulk_permission(self, request, view, matches):
+        """
+        Checks ownership of whole batch of matches at once
+        """
+        return all(match.user_id == request.user.pk for match in matches)
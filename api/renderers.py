@@ -0,0 +1,41 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from . import columns
+
+
+class StreamRenderer(BaseRenderer):
+    """
+    Renderer of streamed exports; views return StreamingHttpResponse with
+    already rendered content, so only error responses are rendered here
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data)
+
+
+class CSVRenderer(StreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class MatchColumnsRenderer(BaseRenderer):
+    """
+    Renderer of match lists in compact columnar encoding (see api.columns)
+    for sync clients; error responses are rendered as JSON
+    """
+    media_type = 'application/x-match-columns'
+    format = 'columns'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, list):
+            return json.dumps(data).encode('utf-8')
+        return columns.encode(data)
@@ -0,0 +1,15 @@
+from rest_framework.routers import DefaultRouter
+
+
+class BulkRouter(DefaultRouter):
+    """
+    DefaultRouter which also routes PATCH and DELETE requests of list URL to
+    bulk_partial_update and bulk_destroy methods of viewsets which have them
+    """
+    routes = [
+        DefaultRouter.routes[0]._replace(mapping=dict(
+            DefaultRouter.routes[0].mapping,
+            patch='bulk_partial_update',
+            delete='bulk_destroy',
+        )),
+    ] + DefaultRouter.routes[1:]
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 
+from characters.catalog import catalog
 from characters.models import Character
-from matches.models import Match
+from matches.models import Match, MatchCharacter, RatingSummary
 
 
 class CharacterSerializer(serializers.ModelSerializer):
@@ -10,7 +11,91 @@ class CharacterSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'role')
 
 
+class CatalogCharacterField(serializers.PrimaryKeyRelatedField):
+    """
+    Character primary key field, validated against process-local catalog
+    instead of querying database for every ID
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Character.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            character = catalog.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if character is None:
+            self.fail('does_not_exist', pk_value=data)
+        return character
+
+
 class MatchSerializer(serializers.ModelSerializer):
+    """
+    fields - optional list of names of fields to include, in addition to
+        (and not beyond) Meta.fields
+    """
+    characters = CatalogCharacterField(many=True)
+
     class Meta:
         model = Match
-        fields = ('id', 'characters', 'date', 'mmr_after')
\ No newline at end of file
+        fields = ('id', 'characters', 'date', 'mmr_after')
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+async def amatch_values_data(rows, fields=None, user_id=None):
+    """
+    Returns representation of matches given as dicts of their values (as
+    returned by values() of Match queryset), identical to data of
+    MatchSerializer(many=True, fields=fields), without instantiating models
+
+    rows have to hold values of all serialized fields except characters, which
+    are read with single query of through table (using async ORM), ordered by
+    character ID; if all matches belong to one user, pass user_id to read
+    only their rows
+    """
+    serializer = MatchSerializer(fields=fields)
+    # Characters are not read from rows, so they have no field here
+    columns = [
+        (name, None if name == 'characters' else field)
+        for name, field in serializer.fields.items()
+    ]
+
+    characters = None
+    if 'characters' in serializer.fields:
+        characters = {row['id']: [] for row in rows}
+        links = MatchCharacter.objects.filter(match_id__in=list(characters))
+        if user_id is not None:
+            links = links.filter(user_id=user_id)
+        links = links.order_by('character_id').values_list('match_id', 'character_id')
+        async for match_id, character_id in links:
+            characters[match_id].append(character_id)
+
+    data = []
+    for row in rows:
+        item = {}
+        for name, field in columns:
+            if field is None:
+                item[name] = characters[row['id']]
+            else:
+                value = row[name]
+                item[name] = None if value is None else field.to_representation(value)
+        data.append(item)
+    return data
+
+
+class RatingSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RatingSummary
+        fields = (
+            'current_mmr', 'peak_mmr', 'lowest_mmr',
+            'wins', 'losses', 'draws', 'streak', 'last_match'
+        )
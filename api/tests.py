@@ -1,11 +1,22 @@
-from django.test import TestCase
+import json
+import warnings
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import DateTimeField
 from rest_framework.test import APIRequestFactory, APIClient, force_authenticate
 from rest_framework import status
 
 from characters.models import Character
-from matches.models import Match
+from matches.models import Match, MatchWithPrevData, RatingSummary, Season
+from . import bulk_import, columns, export
 from .serializers import CharacterSerializer, MatchSerializer
 from .permissions import IsMatchOwner
 
@@ -198,6 +209,59 @@ class TestMatchesViewset(TestCase):
         )
         self.client.logout()
 
+    def testListingDoesNotQueryCharactersPerMatch(self):
+        """
+        Characters of listed matches should be loaded in one query
+        """
+        self.client.force_authenticate(user=self.owner)
+        # Load character catalog
+        self.client.get(self.API_MATCHES_LIST_URL)
+        with CaptureQueriesContext(connection) as one_match:
+            self.client.get(self.API_MATCHES_LIST_URL)
+        for mmr in range(5):
+            match = Match(user=self.owner, mmr_after=mmr)
+            match.save()
+            match.characters.set([self.character])
+        with CaptureQueriesContext(connection) as many_matches:
+            response = self.client.get(self.API_MATCHES_LIST_URL)
+        self.assertEqual(6, len(response.data))
+        self.assertEqual(len(one_match), len(many_matches))
+        self.client.logout()
+
+    def testListIsPaginatedWithCursor(self):
+        """
+        Matches should be listed newest first, in pages linked by cursors,
+        which stay valid when new matches are added
+        """
+        for mmr in range(6):
+            match = Match(user=self.owner, mmr_after=mmr)
+            match.save()
+            if mmr % 2 == 0:
+                # Matches played at the same time should not be skipped
+                match.date = self.match.date
+                match.save()
+        expected = list(
+            Match.objects.filter(user=self.owner).order_by('-date', '-id').values_list('pk', flat=True)
+        )
+
+        self.client.force_authenticate(user=self.owner)
+        listed = []
+        url = self.API_MATCHES_LIST_URL + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertLessEqual(len(response.data), 3)
+            listed.extend(m['id'] for m in response.data)
+            if not listed[3:]:
+                Match(user=self.owner, mmr_after=9000).save()
+            links = response.get('Link', '')
+            url = links.split('>; rel="next"')[0][1:] if 'rel="next"' in links else None
+        self.assertEqual(expected, listed, 'Every match should be listed exactly once')
+
+        response = self.client.get(self.API_MATCHES_LIST_URL + '?cursor=invalid')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.client.logout()
+
     API_MEW_MATCH_URL = API_MATCHES_LIST_URL
     def testCreatedMatchBelongsToCurrenltyLoggedInUser(self):
         """
@@ -221,4 +285,917 @@ class TestMatchesViewset(TestCase):
             'User field of recently created match should be assigned to currently logged user'
         )
         self.client.logout()
-    
\ No newline at end of file
+
+    def testCreatingMatchWithUnknownCharacter(self):
+        """
+        POST request with ID of character that does not exist should be rejected
+        """
+        self.client.force_authenticate(user=self.owner)
+        for characters in ([12345], ['abc']):
+            response = self.client.post(self.API_MEW_MATCH_URL, data={
+                'characters': characters,
+                'mmr_after': 5000
+            })
+            self.assertEqual(
+                status.HTTP_400_BAD_REQUEST,
+                response.status_code,
+                'Request response code should be 400 (Bad Request)'
+            )
+            self.assertIn('characters', response.data)
+        self.assertFalse(Match.objects.filter(mmr_after=5000).exists())
+        self.client.logout()
+    
+
+class TestCharactersViewset(TestCase):
+    def setUp(self):
+        self.character = Character(name='Test', role=Character.DAMAGE)
+        self.character.save()
+        self.client = APIClient()
+
+    API_CHARACTERS_URL = '/api/characters/'
+    def testListingAndRetrievingCharacters(self):
+        """
+        Characters should be listed and retrieved from catalog
+        """
+        response = self.client.get(self.API_CHARACTERS_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([CharacterSerializer(self.character).data], response.data)
+
+        response = self.client.get('{}{}/'.format(self.API_CHARACTERS_URL, self.character.pk))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(CharacterSerializer(self.character).data, response.data)
+
+        response = self.client.get('{}{}/'.format(self.API_CHARACTERS_URL, 12345))
+        self.assertEqual(
+            status.HTTP_404_NOT_FOUND,
+            response.status_code,
+            'Request for non-existent character should return 404'
+        )
+
+
+class TestMatchListFastPath(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+
+    def setUp(self):
+        self.characters = [
+            Character(name='Sombra', role=Character.DAMAGE),
+            Character(name='Lucio', role=Character.SUPPORT),
+            Character(name='Sigma', role=Character.TANK),
+        ]
+        for c in self.characters:
+            c.save()
+        self.user = User.objects.create_user('sparse')
+        for mmr, characters in ((2000, [2, 0]), (2100, []), (2050, [1]), (2075, [0, 1, 2])):
+            match = Match(user=self.user, mmr_after=mmr)
+            match.save()
+            match.characters.set([self.characters[i] for i in characters])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def serialized(self, fields=None):
+        matches = Match.objects.filter(user=self.user).order_by('-date', '-id').prefetch_related(
+            Prefetch('characters', queryset=Character.objects.order_by('pk'))
+        )
+        return JSONRenderer().render(MatchSerializer(matches, many=True, fields=fields).data)
+
+    def testOutputIsIdenticalToSerializer(self):
+        """
+        Listing should render exactly the same bytes as MatchSerializer
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, HTTP_ACCEPT='application/json')
+        self.assertEqual(self.serialized(), response.content)
+        for fields in ('id,date,mmr_after', 'characters', 'mmr_after,id'):
+            response = self.client.get(
+                self.API_MATCHES_LIST_URL, {'fields': fields}, HTTP_ACCEPT='application/json'
+            )
+            self.assertEqual(self.serialized(fields.split(',')), response.content)
+
+    def testSparseFields(self):
+        """
+        Only requested fields should be returned, by list and detail
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, {'fields': 'id,mmr_after'})
+        self.assertEqual(['id', 'mmr_after'], list(response.data[0]))
+        pk = response.data[0]['id']
+        response = self.client.get('{}{}/'.format(self.API_MATCHES_LIST_URL, pk), {'fields': 'date'})
+        self.assertEqual(['date'], list(response.data))
+
+        response = self.client.get(self.API_MATCHES_LIST_URL, {'fields': 'id,password'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def testPagesAreLinked(self):
+        """
+        Cursor pagination should work with rows read as values
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, {'page_size': 3, 'fields': 'mmr_after'})
+        self.assertEqual([{'mmr_after': 2075}, {'mmr_after': 2050}, {'mmr_after': 2100}], response.data)
+        next_url = response['Link'].split(';')[0].strip('<>')
+        response = self.client.get(next_url)
+        self.assertEqual([{'mmr_after': 2000}], response.data)
+
+
+class TestMatchDateRange(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+    API_EXPORT_URL = '/api/matches/export/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('ranged')
+        start = datetime(2018, 7, 1, 12, tzinfo=timezone.utc)
+        for day, mmr in enumerate((2000, 2050, 2100, 2025)):
+            Match(user=self.user, date=start + timedelta(days=day), mmr_after=mmr).save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testListingRange(self):
+        """
+        Only matches between since and until should be listed
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, {
+            'since': '2018-07-02', 'until': '2018-07-03T12:00:00Z', 'fields': 'mmr_after'
+        })
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'mmr_after': 2100}, {'mmr_after': 2050}], response.data)
+
+    def testPagesKeepRange(self):
+        """
+        Link to next page should keep the range
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, {
+            'since': '2018-07-02', 'page_size': 2, 'fields': 'mmr_after'
+        })
+        self.assertEqual([{'mmr_after': 2025}, {'mmr_after': 2100}], response.data)
+        url = response['Link'][1:response['Link'].index('>')]
+        self.assertIn('since=2018-07-02', url)
+        response = self.client.get(url)
+        self.assertEqual([{'mmr_after': 2050}], response.data)
+
+    def testExportingRange(self):
+        """
+        Export should contain only matches in range
+        """
+        response = self.client.get(self.API_EXPORT_URL, {'format': 'ndjson', 'until': '2018-07-02'})
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).decode('utf-8').splitlines()
+        ]
+        self.assertEqual([2000, 2050], [r['mmr_after'] for r in rows])
+
+    def testInvalidRange(self):
+        """
+        Unparsable bound should be rejected
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL, {'since': 'last week'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('since', response.data)
+
+
+class TestMatchSeasons(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+    API_ANALYTICS_URL = '/api/me/analytics/'
+    API_TRENDS_URL = '/api/me/trends/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('seasoned')
+        self.character = Character(name='Mercy', role=Character.SUPPORT)
+        self.character.save()
+        start = datetime(2018, 7, 1, 12, tzinfo=timezone.utc)
+        self.season = Season.objects.create(name='Season 1', start=start + timedelta(days=2))
+        for day, mmr in enumerate((2000, 2050, 2100, 2025)):
+            match = Match(user=self.user, date=start + timedelta(days=day), mmr_after=mmr)
+            match.save()
+            match.characters.set([self.character])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def testListingSeason(self):
+        """
+        Only matches of season should be listed
+        """
+        for season in (self.season.pk, 'current'):
+            response = self.client.get(self.API_MATCHES_LIST_URL, {
+                'season': season, 'fields': 'mmr_after'
+            })
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertEqual([{'mmr_after': 2025}, {'mmr_after': 2100}], response.data)
+        response = self.client.get(self.API_MATCHES_LIST_URL, {'season': 'first'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('season', response.data)
+
+    def testSeasonAnalytics(self):
+        """
+        Stats and trends should cover matches of season, which starts over
+        """
+        response = self.client.get(self.API_ANALYTICS_URL, {'season': 'current'})
+        character, = response.data['characters']
+        self.assertEqual((2, 0, 1, -75), (
+            character['games'], character['wins'], character['losses'], character['mmr_difference']
+        ))
+        response = self.client.get(self.API_ANALYTICS_URL)
+        self.assertEqual(4, response.data['characters'][0]['games'])
+        response = self.client.get(self.API_TRENDS_URL, {'season': self.season.pk})
+        self.assertEqual(2, response.data['matches'])
+
+
+class TestMatchColumns(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+    COLUMNS = 'application/x-match-columns'
+
+    def setUp(self):
+        self.characters = [
+            Character(name='Tracer', role=Character.DAMAGE),
+            Character(name='Zarya', role=Character.TANK),
+        ]
+        for c in self.characters:
+            c.save()
+        self.user = User.objects.create_user('syncing')
+        start = datetime(2018, 7, 1, 12, tzinfo=timezone.utc)
+        for hours, mmr, characters in ((0, 2000, [0]), (3, 2025, []), (5, 1990, [0, 1])):
+            match = Match(user=self.user, date=start + timedelta(hours=hours), mmr_after=mmr)
+            match.save()
+            match.characters.set([self.characters[i] for i in characters])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def list(self, params=None, **headers):
+        return self.client.get(self.API_MATCHES_LIST_URL, params or {}, **headers)
+
+    def testDecodesToJsonData(self):
+        """
+        Decoded columns should equal JSON of the same request, also with
+        ?fields= and dates with fractions of seconds
+        """
+        for params in ({}, {'fields': 'date,characters'}, {'fields': 'mmr_after'}):
+            data = self.list(params).json()
+            response = self.list(params, HTTP_ACCEPT=self.COLUMNS)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertEqual(self.COLUMNS, response['Content-Type'])
+            self.assertEqual(data, columns.decode(response.content))
+        Match.objects.filter(mmr_after=2025).update(
+            date=datetime(2018, 7, 1, 15, 0, 0, 250000, tzinfo=timezone.utc)
+        )
+        data = self.list().json()
+        self.assertIn('.250000', data[1]['date'])
+        self.assertEqual(data, columns.decode(self.list({'format': 'columns'}).content))
+        self.assertEqual([], columns.decode(self.list({'since': '2019-01-01'}, HTTP_ACCEPT=self.COLUMNS).content))
+
+    def testSmallerThanJson(self):
+        """
+        Encoding should pack matches into a few bytes each and keep pagination
+        """
+        for i in range(100):
+            match = Match(user=self.user, mmr_after=2000 + i % 50)
+            match.save()
+            match.characters.set(self.characters[:i % 2 + 1])
+        json_response = self.list({'page_size': 100})
+        response = self.list({'page_size': 100}, HTTP_ACCEPT=self.COLUMNS)
+        self.assertLess(len(response.content), len(json_response.content) / 5)
+        self.assertEqual(json_response['Link'], response['Link'])
+
+    def testErrorsAreJson(self):
+        """
+        Errors should be rendered as JSON, other actions should not offer columns
+        """
+        response = self.list({'since': 'yesterday'}, HTTP_ACCEPT=self.COLUMNS)
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('since', json.loads(response.content))
+        response = self.client.get(
+            '{}{}/'.format(self.API_MATCHES_LIST_URL, Match.objects.first().pk),
+            HTTP_ACCEPT=self.COLUMNS
+        )
+        self.assertEqual(status.HTTP_406_NOT_ACCEPTABLE, response.status_code)
+
+    def testEtagDependsOnFormat(self):
+        """
+        Cached JSON should not be revalidated as columns
+        """
+        etag = self.list()['ETag']
+        response = self.list(HTTP_ACCEPT=self.COLUMNS, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        response = self.list(HTTP_ACCEPT=self.COLUMNS, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def testInvalidContent(self):
+        """
+        Decoder should reject other content, unknown versions and truncated columns
+        """
+        for content in (b'', b'{}', b'OVM\x02\x00\x00\x00', b'OVM\x01\x04\x00\x02\x02\x01'):
+            with self.assertRaises(columns.DecodeError):
+                columns.decode(content)
+
+
+class TestBulkOperations(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+
+    def setUp(self):
+        self.characters = [
+            Character(name='Reinhardt', role=Character.TANK),
+            Character(name='Zarya', role=Character.TANK),
+        ]
+        for c in self.characters:
+            c.save()
+        self.user = User.objects.create_user('batcher')
+        self.other = User.objects.create_user('other')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Load character catalog
+        self.client.get(self.API_MATCHES_LIST_URL)
+
+    def create(self, mmrs):
+        response = self.client.post(self.API_MATCHES_LIST_URL, [
+            {'mmr_after': mmr, 'characters': [c.pk for c in self.characters]} for mmr in mmrs
+        ], format='json')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        return [m['id'] for m in response.data]
+
+    def history(self):
+        return list(MatchWithPrevData.objects.filter(user=self.user).order_by('date', 'id').values_list(
+            'mmr_after', 'mmr_difference', 'match_order'
+        ))
+
+    def testBulkCreate(self):
+        """
+        List of matches should be created with number of queries independent of its length
+        """
+        self.create([2000])
+        with CaptureQueriesContext(connection) as few:
+            self.create([2100])
+        with CaptureQueriesContext(connection) as many:
+            pks = self.create(range(2200, 2300))
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(102, Match.objects.filter(user=self.user).count())
+        self.assertEqual(200, Match.characters.through.objects.filter(match_id__in=pks).count())
+        self.assertEqual(self.history()[:3], [(2000, None, 1), (2100, 100, 2), (2200, 100, 3)])
+        self.assertEqual(2299, self.user.rating_summary.current_mmr)
+
+    def testBulkCreateIsAtomic(self):
+        """
+        Batch with invalid match should not create any match
+        """
+        response = self.client.post(self.API_MATCHES_LIST_URL, [
+            {'mmr_after': 2000, 'characters': [self.characters[0].pk]},
+            {'mmr_after': 2100, 'characters': [12345]},
+        ], format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('characters', response.data[1])
+        self.assertFalse(Match.objects.exists())
+
+    def testBulkPartialUpdate(self):
+        """
+        Matches of list should be updated and history refreshed once
+        """
+        pks = self.create([2000, 2100, 2200, 2300])
+        # Both batches move current MMR to another range of MMR histogram
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.patch(self.API_MATCHES_LIST_URL, [
+                {'id': pks[1], 'mmr_after': 1900},
+                {'id': pks[3], 'mmr_after': 2350, 'characters': [self.characters[1].pk]},
+            ], format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([1900, 2350], [m['mmr_after'] for m in response.data])
+        self.assertEqual([self.characters[1].pk], response.data[1]['characters'])
+        self.assertEqual(
+            [(2000, None, 1), (1900, -100, 2), (2200, 300, 3), (2350, 150, 4)], self.history()
+        )
+        self.assertEqual(2, Match.objects.get(pk=pks[0]).characters.count())
+
+        more = self.create(range(10))
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.patch(self.API_MATCHES_LIST_URL, [
+                {'id': pk, 'mmr_after': 2500, 'characters': [self.characters[0].pk]} for pk in more
+            ], format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(len(few), len(many))
+
+    def testBulkDestroy(self):
+        """
+        Matches of list should be deleted and history refreshed once
+        """
+        pks = self.create([2000, 2100, 2200, 2300])
+        response = self.client.delete(self.API_MATCHES_LIST_URL, [pks[0], pks[2]], format='json')
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertEqual([(2100, None, 1), (2300, 200, 2)], self.history())
+        self.assertEqual(2300, RatingSummary.objects.get(user=self.user).current_mmr)
+
+    def testOwnershipIsCheckedForWholeBatch(self):
+        """
+        Batch with match of other user should be rejected without changing anything
+        """
+        pks = self.create([2000])
+        foreign = Match(user=self.other, mmr_after=3000)
+        foreign.save()
+        response = self.client.delete(self.API_MATCHES_LIST_URL, [pks[0], foreign.pk], format='json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+        response = self.client.patch(self.API_MATCHES_LIST_URL, [
+            {'id': pks[0], 'mmr_after': 1}, {'id': foreign.pk, 'mmr_after': 1}
+        ], format='json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+        self.assertEqual(2, Match.objects.filter(mmr_after__gt=1).count())
+
+        response = self.client.delete(self.API_MATCHES_LIST_URL, [pks[0], 12345678], format='json')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        response = self.client.delete(self.API_MATCHES_LIST_URL, [pks[0], pks[0]], format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class TestConditionalRequests(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+    API_CHARACTERS_URL = '/api/characters/'
+
+    def setUp(self):
+        self.character = Character(name='Ana', role=Character.SUPPORT)
+        self.character.save()
+        self.user = User.objects.create_user('poller')
+        self.match = Match(user=self.user, mmr_after=2000)
+        self.match.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testMatchesNotModified(self):
+        """
+        Matches should answer 304 to request with current ETag or
+        Last-Modified without reading matches
+        """
+        response = self.client.get(self.API_MATCHES_LIST_URL)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.API_MATCHES_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        tables = ('"matches_match"', '"matches_match_characters"', '"matches_prev_match_data"')
+        self.assertFalse([q for q in queries if any(t in q['sql'] for t in tables)])
+        response = self.client.get(self.API_MATCHES_LIST_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+        url = '{}{}/'.format(self.API_MATCHES_LIST_URL, self.match.pk)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def testMatchesModified(self):
+        """
+        Match created through API should change ETag
+        """
+        etag = self.client.get(self.API_MATCHES_LIST_URL)['ETag']
+        self.client.post(
+            self.API_MATCHES_LIST_URL, {'mmr_after': 2100, 'characters': [self.character.pk]}, format='json'
+        )
+        response = self.client.get(self.API_MATCHES_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(2, len(response.data))
+
+    def testCharactersNotModified(self):
+        """
+        Characters should answer 304 until any character changes
+        """
+        etag = self.client.get(self.API_CHARACTERS_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.API_CHARACTERS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        self.character.name = 'Baptiste'
+        self.character.save()
+        response = self.client.get(self.API_CHARACTERS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+
+class TestMatchImport(TestCase):
+    API_IMPORT_URL = '/api/matches/import/'
+
+    def setUp(self):
+        self.characters = [
+            Character(name='Mercy', role=Character.SUPPORT),
+            Character(name='Genji', role=Character.DAMAGE),
+        ]
+        for c in self.characters:
+            c.save()
+        self.user = User.objects.create_user('importer')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testImportingCsv(self):
+        """
+        Valid CSV rows should be imported with their dates and characters,
+        invalid ones reported with their numbers
+        """
+        body = (
+            'date,mmr_after,characters\n'
+            '2018-07-01T12:00:00Z,2500,{};Genji\n'
+            '2018-07-01T11:00:00Z,2400,mercy\n'
+            'yesterday,2600,Mercy\n'
+            '2018-07-01T13:00:00Z,-5,Mercy\n'
+            '2018-07-01T14:00:00Z,2550,Tracer\n'
+        ).format(self.characters[0].pk)
+        response = self.client.generic('POST', self.API_IMPORT_URL, body, content_type='text/csv')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(2, response.data['created'])
+        self.assertEqual(3, response.data['rejected'])
+        self.assertEqual(
+            [(3, ['date']), (4, ['mmr_after']), (5, ['characters'])],
+            [(e['row'], list(e['errors'])) for e in response.data['errors']]
+        )
+
+        matches = list(MatchWithPrevData.objects.filter(user=self.user).order_by('date'))
+        self.assertEqual([2400, 2500], [m.mmr_after for m in matches])
+        self.assertEqual([0, 100], [m.mmrDifference() for m in matches])
+        self.assertEqual(
+            set(self.characters),
+            set(Match.objects.get(pk=matches[1].pk).characters.all())
+        )
+
+    def testImportingNdjson(self):
+        """
+        NDJSON rows should be imported in chunks, matches without date should
+        be dated with time of import
+        """
+        lines = [
+            json.dumps({'mmr_after': mmr, 'characters': [self.characters[mmr % 2].pk]})
+            for mmr in range(bulk_import.CHUNK_SIZE + 10)
+        ]
+        lines.insert(3, '{not json')
+        response = self.client.generic(
+            'POST', self.API_IMPORT_URL, '\n'.join(lines), content_type='application/x-ndjson'
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(bulk_import.CHUNK_SIZE + 10, response.data['created'])
+        self.assertEqual([4], [e['row'] for e in response.data['errors']])
+        self.assertEqual(
+            list(range(bulk_import.CHUNK_SIZE + 10)),
+            list(Match.objects.filter(user=self.user).order_by('date', 'id').values_list('mmr_after', flat=True))
+        )
+        self.assertEqual(
+            bulk_import.CHUNK_SIZE + 10,
+            MatchWithPrevData.objects.filter(user=self.user).first().match_order
+        )
+
+    def testImpossibleDates(self):
+        """
+        Well formatted dates which do not exist should be reported as row
+        errors in both formats
+        """
+        dates = ('2018-13-45T10:00:00', '2018-02-30T10:00:00')
+        bodies = {
+            'text/csv': 'date,mmr_after,characters\n' + ''.join(
+                '{},2500,Mercy\n'.format(date) for date in dates
+            ) + '2018-07-01T12:00:00Z,2500,Mercy\n',
+            'application/x-ndjson': '\n'.join(
+                json.dumps({'date': date, 'mmr_after': 2500, 'characters': ['Mercy']})
+                for date in (*dates, '2018-07-01T12:00:00Z')
+            ),
+        }
+        for content_type, body in bodies.items():
+            response = self.client.generic('POST', self.API_IMPORT_URL, body, content_type=content_type)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertEqual(1, response.data['created'])
+            self.assertEqual(
+                [(1, ['date']), (2, ['date'])],
+                [(e['row'], list(e['errors'])) for e in response.data['errors']]
+            )
+        self.assertEqual(2, Match.objects.filter(user=self.user).count())
+
+    def testUnsupportedContentType(self):
+        """
+        Import should accept only CSV and NDJSON
+        """
+        response = self.client.post(self.API_IMPORT_URL, {'mmr_after': 1}, format='json')
+        self.assertEqual(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, response.status_code)
+
+    def testLargeImport(self):
+        """
+        Import should write matches in chunks, with a few queries per chunk
+        instead of per row (throughput is measured by benchmark_matches)
+        """
+        rows = 4 * bulk_import.CHUNK_SIZE
+        body = 'mmr_after,characters\n' + ''.join(
+            '{},Mercy;Genji\n'.format(2000 + mmr) for mmr in range(rows)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.generic('POST', self.API_IMPORT_URL, body, content_type='text/csv')
+        self.assertEqual(rows, response.data['created'])
+        self.assertEqual(2 * rows, Match.characters.through.objects.filter(user=self.user).count())
+        self.assertLess(len(queries), rows // 10)
+
+
+class TestMatchExport(TestCase):
+    API_EXPORT_URL = '/api/matches/export/'
+
+    def setUp(self):
+        self.characters = [
+            Character(name='Mercy', role=Character.SUPPORT),
+            Character(name='Genji', role=Character.DAMAGE),
+        ]
+        for c in self.characters:
+            c.save()
+        self.user = User.objects.create_user('exporter')
+        self.matches = []
+        for mmr in (2000, 2100, 2050):
+            match = Match(user=self.user, mmr_after=mmr)
+            match.save()
+            match.characters.set(self.characters[:1 + mmr % 2])
+            self.matches.append(match)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testExportingCsv(self):
+        """
+        CSV export should stream whole history, oldest first
+        """
+        response = self.client.get(self.API_EXPORT_URL, {'format': 'csv'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        date = DateTimeField().to_representation(self.matches[1].date)
+        self.assertEqual('id,date,mmr_after,mmr_difference,characters', lines[0])
+        self.assertEqual(4, len(lines))
+        self.assertEqual('{},{},2100,100,Mercy'.format(self.matches[1].pk, date), lines[2])
+        self.assertTrue(lines[1].endswith(',2000,,Mercy'))
+
+    def testExportingNdjson(self):
+        """
+        NDJSON export should contain one JSON object per match
+        """
+        response = self.client.get(self.API_EXPORT_URL, {'format': 'ndjson'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).decode('utf-8').splitlines()
+        ]
+        self.assertEqual([m.pk for m in self.matches], [r['id'] for r in rows])
+        self.assertEqual([None, 100, -50], [r['mmr_difference'] for r in rows])
+        self.assertEqual([self.characters[0].pk], rows[0]['characters'])
+
+    async def testStreamingUnderAsgi(self):
+        """
+        Under ASGI export should be streamed from async iterator chunk by
+        chunk, instead of being read whole first
+        """
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch.object(export, 'CHUNK_SIZE', 2), warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for format in ('csv', 'ndjson'):
+                response = await client.get(self.API_EXPORT_URL, {'format': format})
+                self.assertEqual(status.HTTP_200_OK, response.status_code)
+                self.assertTrue(response.is_async)
+                lines = b''.join([
+                    chunk async for chunk in response.streaming_content
+                ]).decode('utf-8').splitlines()
+                self.assertEqual(3 + (format == 'csv'), len(lines))
+            self.assertEqual([m.pk for m in self.matches], [json.loads(l)['id'] for l in lines])
+            self.assertEqual([self.characters[0].pk], json.loads(lines[0])['characters'])
+
+    def testExportRequiresLogin(self):
+        """
+        Export should not be available for anonymous user
+        """
+        self.client.logout()
+        response = self.client.get(self.API_EXPORT_URL, {'format': 'csv'})
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+
+
+class TestRatingSummaryView(TestCase):
+    API_SUMMARY_URL = '/api/me/summary/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('player')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testSummaryOfUserWithoutMatches(self):
+        """
+        User without matches should get empty summary
+        """
+        response = self.client.get(self.API_SUMMARY_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIsNone(response.data['current_mmr'])
+        self.assertEqual(0, response.data['wins'])
+
+    def testSummary(self):
+        """
+        Summary should describe logged user's history
+        """
+        for mmr in (2000, 2100, 2050):
+            last = Match(user=self.user, mmr_after=mmr)
+            last.save()
+        response = self.client.get(self.API_SUMMARY_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({
+            'current_mmr': 2050,
+            'peak_mmr': 2100,
+            'lowest_mmr': 2000,
+            'wins': 1,
+            'losses': 1,
+            'draws': 0,
+            'streak': -1,
+            'last_match': last.pk,
+        }, response.data)
+
+
+class TestLeaderboardViews(TestCase):
+    API_PERCENTILE_URL = '/api/me/percentile/'
+    API_LEADERBOARD_URL = '/api/leaderboard/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('player')
+        self.other = User.objects.create_user('other')
+        Match(user=self.other, mmr_after=3000).save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def testPercentile(self):
+        """
+        Percentile should compare logged user's current MMR with all players
+        """
+        response = self.client.get(self.API_PERCENTILE_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual({'mmr': None, 'players': 1, 'top_percent': None}, response.data)
+        Match(user=self.user, mmr_after=2000).save()
+        cache.clear()
+        response = self.client.get(self.API_PERCENTILE_URL)
+        self.assertEqual({'mmr': 2000, 'players': 2, 'top_percent': 100.0}, response.data)
+
+    def testLeaderboard(self):
+        """
+        Leaderboard should list players with highest MMR to logged users
+        """
+        response = self.client.get(self.API_LEADERBOARD_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'rank': 1, 'username': 'other', 'mmr': 3000}], response.data)
+        self.client.logout()
+        self.assertIn(
+            self.client.get(self.API_LEADERBOARD_URL).status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+
+
+class TestAsyncReads(TestCase):
+    API_MATCHES_LIST_URL = '/api/matches/'
+    API_SUMMARY_URL = '/api/me/summary/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('async')
+        for mmr in (2000, 2100):
+            Match(user=self.user, mmr_after=mmr).save()
+
+    async def testReadsOnEventLoop(self):
+        """
+        Match list and summary should be served by ASGI handler, with
+        conditional requests of list answered with 304
+        """
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(self.API_MATCHES_LIST_URL, {'fields': 'mmr_after'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([{'mmr_after': 2100}, {'mmr_after': 2000}], response.json())
+        response = await client.get(self.API_MATCHES_LIST_URL, {'fields': 'mmr_after'}, headers={
+            'If-None-Match': response['ETag']
+        })
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        response = await client.get(self.API_SUMMARY_URL)
+        self.assertEqual(2100, response.json()['current_mmr'])
+
+    async def testSyncActionsAndPermissions(self):
+        """
+        Sync actions of the same viewset and permission checks should work under ASGI
+        """
+        response = await AsyncClient().get(self.API_MATCHES_LIST_URL)
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.post(
+            self.API_MATCHES_LIST_URL, {'mmr_after': 2200, 'characters': []},
+            content_type='application/json'
+        )
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        response = await client.get(self.API_SUMMARY_URL)
+        self.assertEqual(2200, response.json()['current_mmr'])
+
+
+class TestCharacterStatsView(TestCase):
+    API_ANALYTICS_URL = '/api/me/analytics/'
+
+    def setUp(self):
+        self.character = Character(name='Mercy', role=Character.SUPPORT)
+        self.character.save()
+        self.user = User.objects.create_user('analyst')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testLargeHistory(self):
+        """
+        Stats of 10000 matches should be computed with one grouped query
+        (latency is measured by benchmark_matches)
+        """
+        rows = bulk_import.parse_rows(
+            ('{{"mmr_after": {}, "characters": [{}]}}\n'.format(2000 + i % 7, self.character.pk).encode('utf-8')
+             for i in range(10000)),
+            bulk_import.NDJSON
+        )
+        self.assertEqual(10000, bulk_import.import_matches(self.user, rows)['created'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.API_ANALYTICS_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(10000, response.data['characters'][0]['games'])
+        stats_queries = [q for q in queries if '"matches_match_characters"' in q['sql']]
+        self.assertEqual(1, len(stats_queries))
+
+
+class TestMmrTrendsView(TestCase):
+    API_TRENDS_URL = '/api/me/trends/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def testTrendsOfUserWithoutMatches(self):
+        """
+        User without matches should get empty statistics
+        """
+        response = self.client.get(self.API_TRENDS_URL)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(0, response.data['matches'])
+        self.assertIsNone(response.data['current'])
+
+    def testTrends(self):
+        """
+        Statistics should describe logged user's history, series only on request
+        """
+        for mmr in (2000, 2100, 2050):
+            Match(user=self.user, mmr_after=mmr).save()
+        response = self.client.get(self.API_TRENDS_URL, {'window': 2})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, response.data['matches'])
+        self.assertEqual(2075, response.data['current']['rolling_mean'])
+        self.assertNotIn('series', response.data)
+
+        response = self.client.get(self.API_TRENDS_URL, {'series': 'true'})
+        self.assertEqual([2000, 2100, 2050], response.data['series']['mmr'])
+        self.assertIsNone(response.data['series']['rolling_volatility'][0])
+
+    def testInvalidWindow(self):
+        """
+        Window outside of allowed range should be rejected
+        """
+        for window in ('0', '1001', 'x'):
+            response = self.client.get(self.API_TRENDS_URL, {'window': window})
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class TestMatchChart(TestCase):
+    API_CHART_URL = '/api/matches/chart/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('charted')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        start = datetime(2018, 1, 1, tzinfo=timezone.utc)
+        Match.objects.bulk_create([
+            Match(user=self.user, date=start + timedelta(hours=6 * i), mmr_after=2000 + (i * 37) % 500)
+            for i in range(20000)
+        ])
+
+    def testResponseSizeIsBounded(self):
+        """
+        Chart should have at most ?points points, whatever history length is
+        """
+        response = self.client.get(self.API_CHART_URL, {'points': 300})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(20000, response.data['matches'])
+        self.assertEqual(300, len(response.data['data']))
+        self.assertEqual(2000, response.data['data'][0]['mmr'])
+        self.assertEqual(datetime(2018, 1, 1, tzinfo=timezone.utc), response.data['data'][0]['date'])
+
+    def testBuckets(self):
+        """
+        Bucketed chart should have min, max and close of each bucket
+        """
+        response = self.client.get(self.API_CHART_URL, {'bucket': 'day', 'points': 5000})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5000, len(response.data['data']))
+        self.assertEqual(
+            {'date': datetime(2018, 1, 1, tzinfo=timezone.utc), 'min': 2000, 'max': 2111, 'close': 2111},
+            response.data['data'][0]
+        )
+        response = self.client.get(self.API_CHART_URL, {'bucket': 'week', 'points': 10})
+        self.assertEqual(10, len(response.data['data']))
+
+    def testInvalidParameters(self):
+        """
+        Invalid number of points or bucket should be rejected
+        """
+        for params in ({'points': 2}, {'points': 'x'}, {'bucket': 'month'}):
+            response = self.client.get(self.API_CHART_URL, params)
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
@@ -1,12 +1,16 @@
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
-
 from api import views
+from api.routers import BulkRouter
 
-router = DefaultRouter()
+router = BulkRouter()
 router.register(r'characters', views.CharactersViewset)
 router.register(r'matches', views.MatchesViewset)
 
 urlpatterns = [
+    path('me/summary/', views.RatingSummaryView.as_view(), name='me-summary'),
+    path('me/analytics/', views.CharacterStatsView.as_view(), name='me-analytics'),
+    path('me/trends/', views.MmrTrendsView.as_view(), name='me-trends'),
+    path('me/percentile/', views.PercentileView.as_view(), name='me-percentile'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     path('', include(router.urls))
 ]
\ No newline at end of file
@@ -1,24 +1,420 @@
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.timezone import now
+from django.views.decorators.http import condition
+from rest_framework import generics
 from rest_framework import viewsets
 from rest_framework import permissions
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from characters.catalog import catalog
+from characters.conditional import characters_etag, characters_last_modified
 from characters.models import Character 
-from matches.models import Match
-from .serializers import CharacterSerializer, MatchSerializer
+from matches.analytics import character_stats
+from matches import leaderboard, timeseries
+from matches.conditional import async_condition, matches_etag, matches_last_modified
+from matches.daterange import InvalidDateRange, date_lookups
+from matches.seasons import InvalidSeason, season_lookups
+from matches.models import Match, RatingSummary
+from .serializers import (
+    CharacterSerializer, MatchSerializer, RatingSummarySerializer, amatch_values_data
+)
+from .mixins import AsyncDispatchMixin
 from .permissions import IsMatchOwner
+from .pagination import MatchCursorPagination
+from .renderers import CSVRenderer, MatchColumnsRenderer, NDJSONRenderer
+from . import bulk, bulk_import, export
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+characters_condition = method_decorator(
+    condition(etag_func=characters_etag, last_modified_func=characters_last_modified)
+)
+matches_condition = method_decorator(
+    condition(etag_func=matches_etag, last_modified_func=matches_last_modified)
+)
+async_matches_condition = method_decorator(
+    async_condition(etag_func=matches_etag, last_modified_func=matches_last_modified)
+)
+
 
 class CharactersViewset(viewsets.ReadOnlyModelViewSet):
     serializer_class = CharacterSerializer
     queryset = Character.objects.all()
 
+    @characters_condition
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(catalog.all(), many=True)
+        return Response(serializer.data)
+
+    @characters_condition
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class MatchesViewset(viewsets.ModelViewSet):
+    def get_object(self):
+        try:
+            character = catalog.get(int(self.kwargs['pk']))
+        except ValueError:
+            character = None
+        if character is None:
+            raise NotFound()
+        self.check_object_permissions(self.request, character)
+        return character
+
+
+class MatchesViewset(AsyncDispatchMixin, viewsets.ModelViewSet):
     serializer_class = MatchSerializer
     permission_classes = (IsMatchOwner, permissions.IsAuthenticated)
+    pagination_class = MatchCursorPagination
     queryset = Match.objects.all()
+    chart_points = 500
+    max_chart_points = 5000
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            # Accept: application/x-match-columns or ?format=columns
+            renderers.append(MatchColumnsRenderer())
+        return renderers
+
+    def check_bulk_permissions(self, request, matches):
+        """
+        Checks permissions to whole batch of matches at once, with
+        has_bulk_permission of permissions which have it
+        """
+        for permission in self.get_permissions():
+            check = getattr(permission, 'has_bulk_permission', None)
+            if check is not None:
+                allowed = check(request, self, matches)
+            else:
+                allowed = all(permission.has_object_permission(request, self, m) for m in matches)
+            if not allowed:
+                self.permission_denied(request, message=getattr(permission, 'message', None))
+
+    def get_batch(self, data):
+        """
+        Returns list of items of batch request, raises ValidationError if it is not valid list
+        """
+        if not isinstance(data, list) or not data:
+            raise ValidationError({'non_field_errors': ['Expected non-empty list.']})
+        if len(data) > bulk.MAX_BATCH_SIZE:
+            raise ValidationError({'non_field_errors': [
+                'Batch cannot have more than {} items.'.format(bulk.MAX_BATCH_SIZE)
+            ]})
+        return data
+
+    def get_batch_matches(self, request, pks):
+        """
+        Returns dict of matches of batch by their primary keys, checks they
+        exist and logged user may change them
+        """
+        if len(set(pks)) != len(pks):
+            raise ValidationError({'non_field_errors': ['Batch cannot have duplicate IDs.']})
+        matches = bulk.load_matches(pks)
+        missing = [pk for pk in pks if pk not in matches]
+        if missing:
+            raise NotFound('Matches {} do not exist.'.format(', '.join(map(str, missing))))
+        self.check_bulk_permissions(request, list(matches.values()))
+        return matches
+
+    def get_batch_response_data(self, pks):
+        matches = Match.objects.filter(pk__in=pks).prefetch_related('characters')
+        matches = {match.pk: match for match in matches}
+        return self.get_serializer([matches[pk] for pk in pks], many=True).data
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates match, or all matches of list in single transaction
+        """
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=self.get_batch(request.data), many=True)
+        serializer.is_valid(raise_exception=True)
+        date = now()
+        matches = bulk_import.create_matches(request.user, [
+            (date, data['mmr_after'], list(dict.fromkeys(data['characters'])))
+            for data in serializer.validated_data
+        ])
+        return Response(
+            self.get_batch_response_data([match.pk for match in matches]),
+            status=status.HTTP_201_CREATED
+        )
+
+    def bulk_partial_update(self, request, *args, **kwargs):
+        """
+        Partially updates list of matches, each identified by its id, in single transaction
+        """
+        items = self.get_batch(request.data)
+        if not all(isinstance(item, dict) and type(item.get('id')) is int for item in items):
+            raise ValidationError({'non_field_errors': ['Every item should be object with integer id.']})
+        pks = [item['id'] for item in items]
+        matches = self.get_batch_matches(request, pks)
+        serializers = [
+            self.get_serializer(matches[item['id']], data=item, partial=True) for item in items
+        ]
+        errors = [{} if s.is_valid() else s.errors for s in serializers]
+        if any(errors):
+            raise ValidationError(errors)
+        bulk.update_matches([(s.instance, s.validated_data) for s in serializers])
+        return Response(self.get_batch_response_data(pks))
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        """
+        Deletes list of matches, given by their ids, in single transaction
+        """
+        pks = self.get_batch(request.data)
+        if not all(type(pk) is int for pk in pks):
+            raise ValidationError({'non_field_errors': ['Expected list of integer ids.']})
+        self.get_batch_matches(request, pks)
+        bulk.delete_matches(pks)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def get_queryset(self):
         user = self.request.user
-        return Match.objects.filter(user=user)
\ No newline at end of file
+        return Match.objects.filter(user=user).prefetch_related(
+            Prefetch('characters', queryset=Character.objects.order_by('pk'))
+        )
+
+    def get_requested_fields(self):
+        """
+        Returns list of fields requested with ?fields=, None if all fields are requested
+        """
+        fields = self.request.query_params.get('fields')
+        if fields is None:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in MatchSerializer.Meta.fields]
+        if not fields or unknown:
+            raise ValidationError({
+                'fields': 'Fields should be comma-separated names of: {}.'.format(
+                    ', '.join(MatchSerializer.Meta.fields)
+                )
+            })
+        return fields
+
+    def get_lookups(self):
+        """
+        Returns lookups filtering matches by ?since=, ?until= and ?season=,
+        see matches.daterange and matches.seasons
+        """
+        try:
+            return dict(
+                date_lookups(self.request.query_params),
+                **season_lookups(self.request.query_params)
+            )
+        except (InvalidDateRange, InvalidSeason) as e:
+            raise ValidationError({e.param: str(e)})
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    @async_matches_condition
+    async def list(self, request, *args, **kwargs):
+        """
+        Lists matches of logged user, newest first; ?fields=id,date,... limits
+        fields of every match, ?since= and ?until= (ISO 8601 dates or times)
+        limit their dates, ?season= (ID or current) limits them to a season.
+        Matches are read with values() and serialized without instantiating
+        models; sync clients may ask for compact columnar encoding (see
+        api.columns) instead of JSON
+        """
+        fields = self.get_requested_fields()
+        columns = [
+            name for name in (fields or MatchSerializer.Meta.fields) if name != 'characters'
+        ]
+        # Current season is read from database
+        lookups = await sync_to_async(self.get_lookups)()
+        queryset = self.filter_queryset(Match.objects.filter(user=request.user, **lookups))
+        rows = await self.paginator.apaginate_queryset(
+            queryset.values(*{'id', 'date', *columns}), request, view=self
+        )
+        return self.get_paginated_response(await amatch_values_data(rows, fields, request.user.pk))
+
+    @matches_condition
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Imports matches of logged user from CSV or NDJSON body, which is
+        read as a stream, see api.bulk_import for format
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type not in bulk_import.CONTENT_TYPES:
+            return Response(
+                {'detail': 'Content type should be one of: {}.'.format(
+                    ', '.join(bulk_import.CONTENT_TYPES)
+                )},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        rows = bulk_import.parse_rows(request._request, content_type)
+        return Response(bulk_import.import_matches(request.user, rows))
+
+    @action(detail=False, methods=['get'])
+    @matches_condition
+    def chart(self, request):
+        """
+        MMR history of logged user downsampled for charts to at most ?points=N
+        points (default 500) with Largest-Triangle-Three-Buckets;
+        ?bucket=day|week returns min, max and closing MMR of each UTC day or week
+        instead
+        """
+        try:
+            points = int(request.query_params.get('points', self.chart_points))
+        except ValueError:
+            points = 0
+        if not 3 <= points <= self.max_chart_points:
+            raise ValidationError({
+                'points': 'Points should be an integer between 3 and {}.'.format(self.max_chart_points)
+            })
+        period = request.query_params.get('bucket')
+        if period is not None and period not in timeseries.PERIODS:
+            raise ValidationError({
+                'bucket': 'Bucket should be one of: {}.'.format(', '.join(timeseries.PERIODS))
+            })
+
+        timestamps, mmr = timeseries.load_series(request.user.pk)
+        if period is None:
+            selected = timeseries.lttb(timestamps, mmr, points)
+            data = [
+                {'date': _utc(t), 'mmr': int(m)}
+                for t, m in zip(timestamps[selected].tolist(), mmr[selected].tolist())
+            ]
+        else:
+            data = [
+                {'date': _utc(t), 'min': int(low), 'max': int(high), 'close': int(close)}
+                for t, low, high, close in zip(*(
+                    values.tolist() for values in
+                    timeseries.bucket_series(timestamps, mmr, period, points)
+                ))
+            ]
+        return Response({
+            'matches': len(mmr),
+            'bucket': period,
+            'data': data,
+        })
+
+    @action(detail=False, methods=['get'], renderer_classes=(CSVRenderer, NDJSONRenderer))
+    def export(self, request):
+        """
+        Streams whole match history of logged user as CSV (default, ?format=csv)
+        or NDJSON (?format=ndjson), see api.export for format; ?since= and
+        ?until= limit dates of exported matches, ?season= their season
+        """
+        lookups = self.get_lookups()
+        ndjson = request.accepted_renderer.format == 'ndjson'
+        if isinstance(request._request, ASGIRequest):
+            # Django streams only asynchronous iterators under ASGI
+            rows = export.aexport_rows(request.user, lookups)
+            lines = export.andjson_lines(rows) if ndjson else export.acsv_lines(rows)
+        else:
+            rows = export.export_rows(request.user, lookups)
+            lines = export.ndjson_lines(rows) if ndjson else export.csv_lines(rows)
+        extension = 'ndjson' if ndjson else 'csv'
+        response = StreamingHttpResponse(
+            lines, content_type=request.accepted_renderer.media_type
+        )
+        response['Content-Disposition'] = 'attachment; filename="matches.{}"'.format(extension)
+        return response
+
+
+class RatingSummaryView(AsyncDispatchMixin, generics.RetrieveAPIView):
+    """
+    Current rating of logged user, read from their RatingSummary
+    """
+    serializer_class = RatingSummarySerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    async def get(self, request, *args, **kwargs):
+        summary = await RatingSummary.objects.filter(user=request.user).afirst()
+        if summary is None:
+            # User has not played any matches yet
+            summary = RatingSummary(user=request.user)
+        serializer = self.get_serializer(summary)
+        return Response(serializer.data)
+
+
+class PercentileView(APIView):
+    """
+    Current MMR of logged user, number of players with any matches and
+    share of them (in percent) with the same or higher current MMR
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        mmr = RatingSummary.objects.filter(user=request.user).values_list(
+            'current_mmr', flat=True
+        ).first()
+        return Response(dict(leaderboard.percentile(mmr), mmr=mmr))
+
+
+class LeaderboardView(APIView):
+    """
+    Players with highest current MMR, with their ranks
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        return Response(leaderboard.leaderboard())
+
+
+def _season_lookups(request):
+    try:
+        return season_lookups(request.query_params)
+    except InvalidSeason as e:
+        raise ValidationError({e.param: str(e)})
+
+
+class CharacterStatsView(APIView):
+    """
+    MMR difference, games, wins, losses and win rate of logged user per
+    character and per role; ?season= (ID or current) limits them to a season
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        return Response(character_stats(request.user.pk, _season_lookups(request)))
+
+
+class MmrTrendsView(APIView):
+    """
+    Rolling average and volatility, trend, drawdown and win probability of
+    logged user's MMR; ?window=N sets size of rolling window (default 10),
+    ?series=true adds values for every match, ?season= (ID or current)
+    limits matches to a season
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    max_window = 1000
+
+    def get(self, request):
+        try:
+            window = int(request.query_params.get('window', timeseries.DEFAULT_WINDOW))
+        except ValueError:
+            window = 0
+        if not 1 <= window <= self.max_window:
+            raise ValidationError({
+                'window': 'Window should be an integer between 1 and {}.'.format(self.max_window)
+            })
+        timestamps, mmr = timeseries.load_series(request.user.pk, _season_lookups(request))
+        statistics = timeseries.compute_statistics(timestamps, mmr, window)
+        series = statistics.pop('series')
+        if series is not None and request.query_params.get('series') in ('1', 'true'):
+            statistics['series'] = timeseries.series_to_lists(series)
+        return Response(statistics)
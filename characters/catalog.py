@@ -0,0 +1,86 @@
+""" Process-local cache of Character data
+
+Characters almost never change, so each worker loads them once and serves
+lookups from memory. Catalog is reloaded when Character is saved or deleted
+in this process, or when CatalogVersion stamp in database shows other worker
+has changed it (checked at most every CHECK_INTERVAL seconds).
+"""
+
+import time
+
+from .models import CatalogVersion, Character
+
+
+class CharacterCatalog:
+    CHECK_INTERVAL = 5
+
+    def __init__(self):
+        self._version = None
+        self._modified = None
+        self._checked_at = None
+        self._data = ([], {}, {}, {})
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+        version, modified = CatalogVersion.stamp()
+        if version != self._version:
+            characters = list(Character.objects.order_by('pk'))
+            by_role = {role: [] for role, _ in Character.ROLE_CHOICES}
+            for c in characters:
+                by_role.setdefault(c.role, []).append(c)
+            self._data = (
+                characters,
+                {c.pk: c for c in characters},
+                by_role,
+                {c.name.lower(): c for c in characters},
+            )
+            self._version = version
+            self._modified = modified
+        self._checked_at = now
+
+    def invalidate(self):
+        """ Forces catalog to be reloaded on next lookup
+        """
+        self._version = None
+        self._checked_at = None
+
+    def version(self):
+        """ Returns version of loaded Character data
+        """
+        self._refresh()
+        return self._version
+
+    def modified(self):
+        """ Returns time of last change of loaded Character data, None if unknown
+        """
+        self._refresh()
+        return self._modified
+
+    def all(self):
+        """ Returns list of all characters, ordered by pk
+        """
+        self._refresh()
+        return self._data[0]
+
+    def get(self, pk):
+        """ Returns character with given pk, None if there is no such character
+        """
+        self._refresh()
+        return self._data[1].get(pk)
+
+    def byName(self, name):
+        """ Returns character with given name (case insensitive), None if there is no such character
+        """
+        self._refresh()
+        return self._data[3].get(name.lower())
+
+    def byRole(self, role):
+        """ Returns list of characters with given role
+        """
+        self._refresh()
+        return self._data[2].get(role, [])
+
+
+catalog = CharacterCatalog()
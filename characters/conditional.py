@@ -0,0 +1,24 @@
+""" ETag and Last-Modified of character data, for django.views.decorators.http.condition
+
+Validators come from character catalog, so conditional requests are answered
+from memory of the worker.
+"""
+
+from .catalog import catalog
+
+
+def characters_etag(request, *args, **kwargs):
+    """ Returns ETag of character data, distinct for every format negotiated
+    by REST framework
+    """
+    etag = 'characters-{}'.format(catalog.version())
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None:
+        etag = '{}-{}'.format(etag, renderer.format)
+    return etag
+
+
+def characters_last_modified(request, *args, **kwargs):
+    """ Returns time of last change of character data
+    """
+    return catalog.modified()
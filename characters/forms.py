@@ -0,0 +1,61 @@
+from django.core.exceptions import ValidationError
+from django.forms import ModelMultipleChoiceField
+from django.forms.models import ModelChoiceIterator
+
+from .catalog import catalog
+from .models import Character
+
+
+class CatalogChoiceIterator(ModelChoiceIterator):
+    """ Iterates over characters from catalog instead of querying database
+    """
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in catalog.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(catalog.all()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(catalog.all())
+
+
+class CharacterMultipleChoiceField(ModelMultipleChoiceField):
+    """ Multiple choice of characters, with choices and validation served
+    from process-local catalog
+    """
+    iterator = CatalogChoiceIterator
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Character.objects.all())
+        super().__init__(**kwargs)
+
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise ValidationError(
+                self.error_messages['invalid_list'],
+                code='invalid_list',
+            )
+        characters = []
+        for pk in value:
+            try:
+                character = catalog.get(int(pk))
+            except (ValueError, TypeError):
+                raise ValidationError(
+                    self.error_messages['invalid_pk_value'],
+                    code='invalid_pk_value',
+                    params={'pk': pk},
+                )
+            if character is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': pk},
+                )
+            characters.append(character)
+        return characters
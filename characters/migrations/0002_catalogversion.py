@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+def create_catalog_version(apps, schema_editor):
+    CatalogVersion = apps.get_model('characters', 'CatalogVersion')
+    CatalogVersion.objects.create(pk=1, version=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Character(models.Model):
     """ Describes single Overwatch character
@@ -20,3 +21,36 @@ class Character(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class CatalogVersion(models.Model):
+    """ Single-row stamp of Character data version, bumped on every Character
+    save and delete, so workers can tell their cached catalog is stale
+
+    version - number of changes made to characters
+    modified - time of last change, None if characters were never changed
+    """
+
+    version = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(null=True)
+
+    @classmethod
+    def stamp(cls):
+        """ Returns (version, modified) tuple of current Character data
+        """
+        stamp = cls.objects.filter(pk=1).values_list('version', 'modified').first()
+        return (0, None) if stamp is None else stamp
+
+    @classmethod
+    def current(cls):
+        """ Returns current version of Character data
+        """
+        return cls.stamp()[0]
+
+    @classmethod
+    def bump(cls):
+        """ Marks Character data as changed
+        """
+        now = timezone.now()
+        if cls.objects.filter(pk=1).update(version=models.F('version') + 1, modified=now) == 0:
+            cls.objects.create(pk=1, version=1, modified=now)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import catalog
+from .models import CatalogVersion, Character
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def invalidate_catalog(sender, **kwargs):
+    """ Marks Character data as changed for this and other workers
+    """
+    CatalogVersion.bump()
+    catalog.invalidate()
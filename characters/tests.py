@@ -1,5 +1,6 @@
 from django.test import TestCase
-from .models import Character
+from .catalog import CharacterCatalog
+from .models import CatalogVersion, Character
 
 
 class TestCharacterModel(TestCase):
@@ -8,3 +9,46 @@ class TestCharacterModel(TestCase):
     
     def test_str(self):
         self.assertEqual(self.character.name, str(self.character))
+
+
+class TestCharacterCatalog(TestCase):
+    def setUp(self):
+        self.characters = [
+            Character(name='Tank', role=Character.TANK),
+            Character(name='Support', role=Character.SUPPORT),
+        ]
+        for c in self.characters:
+            c.save()
+        self.catalog = CharacterCatalog()
+
+    def test_lookups(self):
+        """ Catalog should find characters by PK and by role without querying database again
+        """
+        self.catalog.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.catalog.all(), self.characters)
+            self.assertEqual(self.catalog.get(self.characters[0].pk), self.characters[0])
+            self.assertIsNone(self.catalog.get(12345))
+            self.assertEqual(self.catalog.byRole(Character.SUPPORT), [self.characters[1]])
+            self.assertEqual(self.catalog.byRole(Character.DAMAGE), [])
+
+    def test_reloads_when_version_changes(self):
+        """ Catalog should notice characters changed by other worker once version is bumped
+        """
+        self.assertEqual(len(self.catalog.all()), 2)
+        Character.objects.filter(pk=self.characters[0].pk).update(name='Renamed')
+        CatalogVersion.bump()
+        self.assertEqual(self.catalog.get(self.characters[0].pk).name, 'Tank',
+            'Version should not be checked more often than CHECK_INTERVAL')
+        self.catalog._checked_at -= CharacterCatalog.CHECK_INTERVAL
+        self.assertEqual(self.catalog.get(self.characters[0].pk).name, 'Renamed')
+
+    def test_saving_character_bumps_version(self):
+        """ Saving and deleting Character should bump catalog version
+        """
+        version = CatalogVersion.current()
+        self.characters[0].name = 'Renamed'
+        self.characters[0].save()
+        self.assertEqual(CatalogVersion.current(), version + 1)
+        self.characters[1].delete()
+        self.assertEqual(CatalogVersion.current(), version + 2)
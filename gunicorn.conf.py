@@ -0,0 +1,54 @@
+""" Gunicorn configuration
+
+App is served from ov_mmr_tracker.asgi by uvicorn workers (of uvicorn-worker
+package, which replaces deprecated uvicorn.workers), each running an
+event loop, so async views (matches list page, match list and rating
+summary API) wait for database without blocking the worker and other
+requests; sync views run in threads of the worker. Number of workers is
+taken from WEB_CONCURRENCY (1 by default); with async workers one or two
+per CPU core are usually enough:
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py ov_mmr_tracker.asgi:application
+
+Standalone uvicorn serves the same app, e.g. for development:
+
+    uvicorn --workers 4 ov_mmr_tracker.asgi:application
+
+WSGI app with sync workers can still be served by overriding worker class:
+
+    gunicorn -c gunicorn.conf.py --worker-class sync ov_mmr_tracker.wsgi
+
+Every worker opens its database connections (see ov_mmr_tracker.db and
+connection settings in ov_mmr_tracker.docker_settings) before it accepts
+requests.
+
+Workers share request metrics through PROMETHEUS_MULTIPROC_DIR (see
+ov_mmr_tracker.metrics), which is emptied when server starts; metrics of
+exited workers are marked dead so their live values are dropped.
+"""
+
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+bind = '0.0.0.0:8000'
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def post_worker_init(worker):
+    from ov_mmr_tracker.db import warm_up
+    warm_up()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,7 +1,28 @@
 from django.contrib.admin import ModelAdmin, register
-from .models import Match
+from .models import Match, Season
 
 # Register your models here.
 @register(Match)
 class MatchAdmin(ModelAdmin):
-    pass
\ No newline at end of file
+    list_display = ('__str__', 'mmr_after', 'characters_list', 'season')
+    list_select_related = ('user', 'season')
+    list_filter = ('season',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('characters')
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        # Admin leaves out fields with through model, but MatchCharacter
+        # fills its user on its own, so characters are edited as usual
+        if db_field.name == 'characters':
+            return db_field.formfield(**kwargs)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def characters_list(self, obj):
+        return ', '.join([str(x) for x in obj.characters.all()])
+    characters_list.short_description = 'characters'
+
+
+@register(Season)
+class SeasonAdmin(ModelAdmin):
+    list_display = ('name', 'start')
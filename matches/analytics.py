@@ -0,0 +1,127 @@
+""" Aggregated statistics of user's matches
+"""
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from characters.catalog import catalog
+from characters.models import Character
+from .daterange import lookups_key
+from .models import MatchCharacter
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _cache_key(user_id):
+    # v2: rows of _load_stats, cached by earlier versions in other format
+    return 'matches:character_stats:v2:{}'.format(user_id)
+
+
+def _empty_role(role):
+    return {
+        'role': role, 'games': 0, 'wins': 0, 'losses': 0, 'draws': 0,
+        'mmr_difference': 0
+    }
+
+
+def _rates(stats):
+    decided = stats['wins'] + stats['losses'] + stats['draws']
+    stats['win_rate'] = stats['wins'] / decided if decided else None
+    return stats
+
+
+# Outer query of _load_stats, grouping rows of the inner one by character
+_STATS_SQL = """
+SELECT character_id, role,
+    COUNT(*),
+    COUNT(CASE WHEN mmr_difference > 0 THEN 1 END),
+    COUNT(CASE WHEN mmr_difference < 0 THEN 1 END),
+    COUNT(CASE WHEN mmr_difference = 0 THEN 1 END),
+    COALESCE(SUM(mmr_difference), 0),
+    COUNT(CASE WHEN role_order = 1 THEN 1 END),
+    COUNT(CASE WHEN role_order = 1 AND mmr_difference > 0 THEN 1 END),
+    COUNT(CASE WHEN role_order = 1 AND mmr_difference < 0 THEN 1 END),
+    COUNT(CASE WHEN role_order = 1 AND mmr_difference = 0 THEN 1 END),
+    COALESCE(SUM(CASE WHEN role_order = 1 THEN mmr_difference END), 0)
+FROM ({}) characters_of_matches
+GROUP BY character_id, role
+ORDER BY character_id
+"""
+
+
+def _load_stats(user_id, lookups=None):
+    """ Returns list of (character_id, role, character_stats, role_stats) of
+    characters played, both stats being (games, wins, losses, draws,
+    mmr_difference) tuples; role_stats count only matches in which the
+    character is first (by ID) of its role, so summing them per role
+    counts every match once however many characters of the role were played
+
+    Computed by one grouped query over characters of matches joined to
+    their sequence and role. Rows are numbered within (match, role) by
+    window function, which ORM cannot aggregate over, so grouping query
+    wraps SQL of ORM query of the rows.
+    """
+    match_lookups = {'match__' + name: value for name, value in (lookups or {}).items()}
+    rows = MatchCharacter.objects.filter(
+        user_id=user_id, match__user_id=user_id, **match_lookups
+    ).values(
+        'character_id',
+        role=F('character__role'),
+        mmr_difference=F('match__sequence__mmr_difference'),
+        role_order=Window(
+            RowNumber(), partition_by=[F('match_id'), F('character__role')],
+            order_by=F('character_id').asc(),
+        ),
+    )
+    sql, params = rows.query.get_compiler(rows.db).as_sql()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(_STATS_SQL.format(sql), params)
+        return [(r[0], r[1], r[2:7], r[7:12]) for r in cursor.fetchall()]
+
+
+def character_stats(user_id, lookups=None):
+    """ Returns dict with MMR difference, games played, wins, losses, draws
+    and win rate of given user, per character and per role, of matches
+    filtered by lookups (e.g. of matches.seasons) if given
+
+    Stats are computed with one grouped query of characters of user's
+    matches (see _load_stats) and cached until user changes their matches
+    or characters change. First match of user in every season counts as
+    played, but not as win, loss or draw. Match played on several
+    characters of one role counts once in stats of the role.
+    """
+    # Roles of characters are read from database along with stats
+    key = (catalog.version(), lookups_key(lookups or {}))
+    # Stats of all lookups are cached together, so they are dropped together
+    cached = cache.get(_cache_key(user_id)) or {}
+    rows = cached.get(key)
+    if rows is None:
+        rows = cached[key] = _load_stats(user_id, lookups)
+        cache.set(_cache_key(user_id), cached, CACHE_TIMEOUT)
+
+    fields = ('games', 'wins', 'losses', 'draws', 'mmr_difference')
+    characters = []
+    roles = {role: _empty_role(role) for role, _ in Character.ROLE_CHOICES}
+    for character_id, role, totals, role_totals in rows:
+        stats = roles.setdefault(role, _empty_role(role))
+        for field, value in zip(fields, role_totals):
+            stats[field] += value
+        character = catalog.get(character_id)
+        if character is None:
+            continue
+        characters.append(_rates(dict(
+            {'character': character_id, 'name': character.name, 'role': character.role},
+            **dict(zip(fields, totals))
+        )))
+    return {
+        'characters': characters,
+        'roles': [_rates(r) for r in roles.values()],
+    }
+
+
+def invalidate_character_stats(user_id):
+    """ Drops cached stats of given user
+    """
+    cache.delete(_cache_key(user_id))
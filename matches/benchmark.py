@@ -0,0 +1,243 @@
+""" Benchmark of reading and writing match histories
+
+For every history size a synthetic user is seeded (see matches.synthetic)
+and each operation is run `repeat` times, measuring wall time and number
+of database queries; peak memory allocated by Python is measured in one
+additional run with tracemalloc, as tracing slows operations down. Data of
+every size is written in transaction which is rolled back afterwards, so
+benchmark leaves database unchanged; cache is cleared before uncached
+operations, so it should not be run against production cache. Import
+reports rows per second and whether it meets THROUGHPUT_TARGET of
+api.bulk_import.
+
+Connection overhead of a request is measured first: request_finished and
+request_started signals are sent (closing the connection, or returning it
+to pool, as configured) and first query is timed, so results of runs with
+different connection settings show what reusing connections saves.
+"""
+
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from asgiref.sync import async_to_sync
+from django.core import signals
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import bulk_import
+from api.pagination import MatchCursorPagination
+from api.views import MatchesViewset
+from . import timeseries
+from .analytics import character_stats
+from .models import Match, MatchWithPrevData
+from .synthetic import ensure_characters, seed
+from .views import MATCHES_PER_PAGE, index_page
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_REPEAT = 5
+# Rows of benchmarked import, 4 chunks
+IMPORT_ROWS = 4 * bulk_import.CHUNK_SIZE
+
+
+def _render(response):
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code >= 400:
+        raise RuntimeError('Benchmarked view responded with {}'.format(response.status_code))
+    return response
+
+
+def _operations(user, characters):
+    """ Returns list of (name, function, uncached, throughput) tuples of
+    benchmarked operations, throughput being (rows, target) for operations
+    processing rows, whose rows per second are reported against target
+    rows per second, or None
+    """
+    factory = RequestFactory()
+    api_factory = APIRequestFactory()
+    # Views are coroutine functions, run in event loop the way Django does under WSGI
+    index_view = async_to_sync(index_page)
+    api_list = async_to_sync(MatchesViewset.as_view({'get': 'list'}))
+    api_create = async_to_sync(MatchesViewset.as_view({'post': 'create'}))
+    api_import = async_to_sync(MatchesViewset.as_view({'post': 'bulk_import'}))
+
+    async def auser():
+        return user
+
+    def index():
+        request = factory.get('/matches/list')
+        request.user = user
+        request.auser = auser
+        return _render(index_view(request))
+
+    def matches_list(**params):
+        request = api_factory.get('/api/matches/', params)
+        force_authenticate(request, user=user)
+        return _render(api_list(request))
+
+    def whole_history(format):
+        # What sync clients download, as JSON and in columnar encoding
+        return matches_list(page_size=MatchCursorPagination.max_page_size, format=format)
+
+    def matches_create():
+        request = api_factory.post('/api/matches/', {
+            'mmr_after': 2500, 'characters': [characters[0].pk]
+        }, format='json')
+        force_authenticate(request, user=user)
+        return _render(api_create(request))
+
+    def matches_import():
+        body = 'mmr_after,characters\n' + ''.join(
+            '{},{}\n'.format(2000 + row % 500, ';'.join(c.name for c in characters))
+            for row in range(IMPORT_ROWS)
+        )
+        request = api_factory.generic(
+            'POST', '/api/matches/import/', body, content_type=bulk_import.CSV
+        )
+        force_authenticate(request, user=user)
+        return _render(api_import(request))
+
+    def prev_data_page():
+        matches = MatchWithPrevData.objects.filter(user=user)[:MATCHES_PER_PAGE]
+        return [m.mmrDifference() for m in matches]
+
+    def prev_data_history():
+        return list(MatchWithPrevData.objects.filter(user=user).values_list(
+            'mmr_after', 'mmr_difference'
+        ).iterator())
+
+    def last_match():
+        return Match.lastMatch(user), MatchWithPrevData.lastMatch(user)
+
+    def stats():
+        return character_stats(user.pk)
+
+    def trends():
+        return timeseries.compute_statistics(*timeseries.load_series(user.pk))
+
+    return [
+        ('index_page', index, True, None),
+        ('index_page_cached', index, False, None),
+        ('api_matches_list', matches_list, False, None),
+        ('api_matches_page_json', lambda: whole_history('json'), False, None),
+        ('api_matches_page_columns', lambda: whole_history('columns'), False, None),
+        ('api_matches_create', matches_create, False, None),
+        ('prev_data_page', prev_data_page, False, None),
+        ('prev_data_history', prev_data_history, False, None),
+        ('last_match', last_match, False, None),
+        ('character_stats', stats, True, None),
+        ('trend_statistics', trends, False, None),
+        # Last, as it makes history longer by IMPORT_ROWS on every run
+        ('api_matches_import', matches_import, False, (IMPORT_ROWS, bulk_import.THROUGHPUT_TARGET)),
+    ]
+
+
+def _timings(times):
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'max': max(times),
+    }
+
+
+def _connection_overhead(repeat):
+    """ Returns wall times of first query of request, including getting
+    connection, None when run in transaction (e.g. in tests), which
+    closing connection would break
+    """
+    if connection.in_atomic_block:
+        return None
+    times = []
+    for _ in range(repeat):
+        signals.request_finished.send(sender=__name__)
+        signals.request_started.send(sender=__name__)
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        times.append(time.perf_counter() - started)
+    signals.request_finished.send(sender=__name__)
+    return _timings(times)
+
+
+def _measure(function, uncached, repeat):
+    """ Returns dict of wall times, query count and peak memory of function,
+    and size of body if it returns response
+    """
+    # Warm-up run loads catalog and fills cache for cached operations
+    function()
+    times = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            if uncached:
+                cache.clear()
+            started = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - started)
+    if uncached:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    measured = {
+        'wall_time': _timings(times),
+        'queries': len(queries) // repeat,
+        'peak_memory': peak_memory,
+    }
+    if hasattr(result, 'content'):
+        measured['response_bytes'] = len(result.content)
+    return measured
+
+
+def _revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, characters_per_match=1, seed_value=0):
+    """ Runs benchmark of all operations for histories of given sizes,
+    returns JSON-serializable dict of results
+    """
+    connection_overhead = _connection_overhead(repeat)
+    results = []
+    for size in sizes:
+        # Requests are built for test server host
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user, = seed(1, size, characters_per_match, prefix='benchmark', seed=seed_value)
+            characters = ensure_characters(characters_per_match)
+            for name, function, uncached, throughput in _operations(user, characters):
+                result = {'operation': name, 'matches': size}
+                result.update(_measure(function, uncached, repeat))
+                if throughput is not None:
+                    rows, target = throughput
+                    result['rows_per_second'] = rows / result['wall_time']['median']
+                    result['target_rows_per_second'] = target
+                    result['meets_target'] = result['rows_per_second'] >= target
+                results.append(result)
+            transaction.set_rollback(True)
+    return {
+        'revision': _revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'repeat': repeat,
+        'characters_per_match': characters_per_match,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'pool': bool(connection.settings_dict['OPTIONS'].get('pool')),
+        'connection_overhead': connection_overhead,
+        'results': results,
+    }
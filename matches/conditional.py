@@ -0,0 +1,99 @@
+""" ETag and Last-Modified of match data, for django.views.decorators.http.condition
+
+Validators are built from user's MatchDataVersion, SeasonsVersion and
+version of character catalog, so request with matching If-None-Match or
+If-Modified-Since header is answered with 304 after reading those single
+rows, without touching matches. Matches of ?season=current change also
+when next season starts, which writes nothing, so validators of such
+requests include the season of current time and its start.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from characters.catalog import catalog
+from .models import MatchDataVersion, Season, SeasonsVersion
+from .seasons import PARAM as SEASON_PARAM, CURRENT as CURRENT_SEASON
+
+
+def match_data_stamp(request):
+    """ Returns (version, modified) of logged user's match data, read once per request
+    """
+    stamp = getattr(request, '_match_data_stamp', None)
+    if stamp is None:
+        stamp = request._match_data_stamp = MatchDataVersion.current(request.user.pk)
+    return stamp
+
+
+def seasons_stamp(request):
+    """ Returns (version, modified, current) of seasons, read once per request;
+    current is (pk, start) of season of current time, None if there is none
+    or request does not ask for ?season=current
+    """
+    stamp = getattr(request, '_seasons_stamp', None)
+    if stamp is None:
+        current = None
+        if request.GET.get(SEASON_PARAM) == CURRENT_SEASON:
+            current = Season.startAt(timezone.now())
+        stamp = request._seasons_stamp = (*SeasonsVersion.stamp(), current)
+    return stamp
+
+
+def _latest(*dates):
+    dates = [d for d in dates if d is not None]
+    return max(dates) if dates else None
+
+
+def matches_etag(request, *args, **kwargs):
+    """ Returns ETag of logged user's matches, distinct for every format
+    negotiated by REST framework
+    """
+    version, _ = match_data_stamp(request)
+    seasons_version, _, current = seasons_stamp(request)
+    etag = 'matches-{}-{}-{}-{}'.format(
+        request.user.pk, version, catalog.version(), seasons_version
+    )
+    if current is not None:
+        etag = '{}-s{}'.format(etag, current[0])
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None:
+        etag = '{}-{}'.format(etag, renderer.format)
+    return etag
+
+
+def matches_last_modified(request, *args, **kwargs):
+    """ Returns time of last change of logged user's matches, characters or
+    seasons, or start of current season when matches of it are requested
+    """
+    _, modified = match_data_stamp(request)
+    _, seasons_modified, current = seasons_stamp(request)
+    return _latest(
+        modified, catalog.modified(), seasons_modified, current and current[1]
+    )
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """ condition decorator for async views
+
+    Django calls validators of async views synchronously on event loop,
+    where they could not read database, so they are computed in thread
+    before view is entered.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            def validators():
+                return (
+                    etag_func and etag_func(request, *args, **kwargs),
+                    last_modified_func and last_modified_func(request, *args, **kwargs),
+                )
+            etag, last_modified = await sync_to_async(validators)()
+            return await condition(
+                etag_func=etag_func and (lambda *args, **kwargs: etag),
+                last_modified_func=last_modified_func and (lambda *args, **kwargs: last_modified),
+            )(view)(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,68 @@
+""" Filtering of match histories by ?since= and ?until= query parameters
+
+Both bounds are inclusive and accept ISO 8601 date (2018-07-01) or date and
+time (2018-07-01T18:30:00+02:00); time without offset is in current time
+zone. Date given as `until` includes the whole day. Filtered queries are
+served by the (user, date, id) index of matches, see Match.Meta.indexes.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+PARAMS = ('since', 'until')
+
+
+class InvalidDateRange(ValueError):
+    """ Raised when since or until passed by client cannot be parsed
+    """
+
+    def __init__(self, param):
+        super().__init__('{} should be ISO 8601 date or date and time.'.format(param.capitalize()))
+        self.param = param
+
+
+def _parse(value, param):
+    """ Returns (datetime, whole_day) parsed from value of param
+    """
+    try:
+        day = parse_date(value)
+        if day is not None:
+            date_time, whole_day = datetime.combine(day, time()), True
+        else:
+            date_time, whole_day = parse_datetime(value), False
+    except ValueError:
+        raise InvalidDateRange(param)
+    if date_time is None:
+        raise InvalidDateRange(param)
+    if timezone.is_naive(date_time):
+        date_time = timezone.make_aware(date_time)
+    return date_time, whole_day
+
+
+def date_lookups(params):
+    """ Returns dict of field lookups filtering matches by since and until
+    in params (query dict), empty dict if none of them is given
+    """
+    lookups = {}
+    since = params.get('since')
+    if since:
+        lookups['date__gte'], _ = _parse(since, 'since')
+    until = params.get('until')
+    if until:
+        date_time, whole_day = _parse(until, 'until')
+        if whole_day:
+            lookups['date__lt'] = date_time + timedelta(days=1)
+        else:
+            lookups['date__lte'] = date_time
+    return lookups
+
+
+def lookups_key(lookups):
+    """ Returns string identifying lookups, usable as part of cache key
+    """
+    return ','.join(
+        '{}={}'.format(name, value.isoformat() if hasattr(value, 'isoformat') else value)
+        for name, value in sorted(lookups.items())
+    )
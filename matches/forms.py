@@ -1,8 +1,11 @@
 from django.forms import ModelForm
 
+from characters.forms import CharacterMultipleChoiceField
 from .models import Match
 
 class MatchForm(ModelForm):
+    characters = CharacterMultipleChoiceField()
+
     class Meta:
         model = Match
-        fields = ['characters', 'mmr_after']
\ No newline at end of file
+        fields = ['characters', 'mmr_after']
@@ -0,0 +1,72 @@
+""" Global leaderboard and percentile of current MMR
+
+Both are read from data maintained on every change of users' histories:
+leaderboard with single query of index of RatingSummary by current MMR,
+percentile from histogram of current MMR of all users (MmrBucket). Both are
+cached for CACHE_TIMEOUT seconds, so they may lag behind latest matches by
+that much.
+"""
+
+from django.core.cache import cache
+
+from .models import MmrBucket, RatingSummary
+
+CACHE_TIMEOUT = 60
+TOP_PLAYERS = 100
+
+HISTOGRAM_CACHE_KEY = 'matches:mmr_histogram'
+LEADERBOARD_CACHE_KEY = 'matches:leaderboard'
+
+
+def histogram():
+    """ Returns list of (mmr_from, players) of non-empty ranges of current
+    MMR, highest first
+    """
+    buckets = cache.get(HISTOGRAM_CACHE_KEY)
+    if buckets is None:
+        buckets = list(MmrBucket.objects.filter(players__gt=0).order_by(
+            '-mmr_from'
+        ).values_list('mmr_from', 'players'))
+        cache.set(HISTOGRAM_CACHE_KEY, buckets, CACHE_TIMEOUT)
+    return buckets
+
+
+def percentile(mmr):
+    """ Returns dict with number of players having current MMR and share
+    of them (in percent) having the same or higher MMR than given one
+
+    Players are assumed to be spread evenly over range of MMR containing
+    given one, but at least one of them (the user) is counted in.
+    """
+    buckets = histogram()
+    players = sum(count for _, count in buckets)
+    if mmr is None or not players:
+        return {'players': players, 'top_percent': None}
+    mmr_from = MmrBucket.of(mmr)
+    higher = 0
+    for bucket, count in buckets:
+        if bucket < mmr_from:
+            break
+        if bucket > mmr_from:
+            higher += count
+        else:
+            higher += max(1, count * (mmr_from + MmrBucket.WIDTH - mmr) / MmrBucket.WIDTH)
+    top_percent = min(100.0, 100 * max(higher, 1) / players)
+    return {'players': players, 'top_percent': round(top_percent, 2)}
+
+
+def leaderboard():
+    """ Returns list of TOP_PLAYERS users with highest current MMR as dicts
+    with rank (the same for equal MMR), username and MMR
+    """
+    rows = cache.get(LEADERBOARD_CACHE_KEY)
+    if rows is None:
+        top = RatingSummary.objects.filter(current_mmr__isnull=False).order_by(
+            '-current_mmr', 'user_id'
+        ).values_list('user__username', 'current_mmr')[:TOP_PLAYERS]
+        rows = []
+        for position, (username, mmr) in enumerate(top, 1):
+            rank = rows[-1]['rank'] if rows and rows[-1]['mmr'] == mmr else position
+            rows.append({'rank': rank, 'username': username, 'mmr': mmr})
+        cache.set(LEADERBOARD_CACHE_KEY, rows, CACHE_TIMEOUT)
+    return rows
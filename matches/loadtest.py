@@ -0,0 +1,129 @@
+""" Load test of read endpoints of running server
+
+Synthetic user is seeded (see matches.synthetic) in database the server
+uses and logged in; then for every path `concurrency` clients, each with
+its own keep-alive connection, send GET requests one after another for
+`duration` seconds. Throughput and latency percentiles of successful
+responses are reported, so the same test run against servers with
+different workers (see gunicorn.conf.py) on the same machine compares
+their concurrent throughput. Seeded user is deleted afterwards.
+"""
+
+import http.client
+import platform
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.test import Client
+
+from .synthetic import seed
+
+DEFAULT_PATHS = ('/matches/list', '/api/matches/', '/api/me/summary/')
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 10
+DEFAULT_MATCHES = 1000
+
+
+def _session_cookie(user):
+    """ Returns Cookie header of session of logged in user
+    """
+    client = Client()
+    client.force_login(user)
+    return '{}={}'.format(
+        settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value
+    )
+
+
+def _client(url, path, headers, deadline, latencies, errors):
+    """ Sends requests for path until deadline, appends latencies of
+    successful responses and counts failed ones
+    """
+    parts = urlsplit(url)
+    connection_class = (
+        http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    )
+    connection = connection_class(parts.netloc, timeout=30)
+    failed = 0
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', parts.path.rstrip('/') + path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                continue
+            if response.status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failed += 1
+    finally:
+        connection.close()
+        errors.append(failed)
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def load(url, path, headers, concurrency, duration):
+    """ Returns dict of throughput and latencies of `concurrency` clients
+    requesting path for `duration` seconds
+    """
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+    clients = [
+        threading.Thread(target=_client, args=(url, path, headers, deadline, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        'path': path,
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput': len(latencies) / elapsed,
+    }
+    if latencies:
+        result['latency'] = {
+            'median': statistics.median(latencies),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1],
+        }
+    return result
+
+
+def run(url, paths=DEFAULT_PATHS, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION,
+        matches=DEFAULT_MATCHES, seed_value=0):
+    """ Runs load test of given paths of server at url, returns
+    JSON-serializable dict of results
+    """
+    user, = seed(1, matches, 1, prefix='loadtest', seed=seed_value)
+    try:
+        headers = {'Cookie': _session_cookie(user), 'Accept': 'application/json'}
+        results = [load(url, path, headers, concurrency, duration) for path in paths]
+    finally:
+        user.delete()
+    return {
+        'url': url,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'concurrency': concurrency,
+        'duration': duration,
+        'matches': matches,
+        'results': results,
+    }
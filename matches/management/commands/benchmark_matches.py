@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches import benchmark
+
+
+def _sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(',')]
+    except ValueError:
+        raise CommandError('Sizes should be comma-separated integers.')
+    if any(size < 1 for size in sizes):
+        raise CommandError('Sizes should be positive.')
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures wall time, query count and peak memory of match views and '
+        'queries at several history sizes, writes results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=','.join(str(s) for s in benchmark.DEFAULT_SIZES),
+            help='Comma-separated numbers of matches of benchmarked user'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=benchmark.DEFAULT_REPEAT,
+            help='Number of timed runs of every operation'
+        )
+        parser.add_argument(
+            '--characters', type=int, default=1, help='Number of characters played in every match'
+        )
+        parser.add_argument('--output', help='File to write results to, standard output by default')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['characters'] < 1:
+            raise CommandError('Repeat and characters should be positive.')
+        results = benchmark.run(
+            _sizes(options['sizes']), options['repeat'], options['characters']
+        )
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        for result in results['results']:
+            if not result.get('meets_target', True):
+                self.stderr.write(
+                    '{operation} of {matches} matches: {rows_per_second:.0f} rows per '
+                    'second, below target of {target_rows_per_second}'.format(**result)
+                )
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from matches import partition_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures per-user queries on plain and hash-partitioned match tables '
+        'filled with synthetic data (PostgreSQL only), writes results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=partition_benchmark.DEFAULT_USERS,
+            help='Number of synthetic users'
+        )
+        parser.add_argument(
+            '--matches', type=int, default=partition_benchmark.DEFAULT_MATCHES,
+            help='Number of matches of every user'
+        )
+        parser.add_argument(
+            '--partitions', type=int, default=partition_benchmark.DEFAULT_PARTITIONS,
+            help='Number of partitions of every table'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=partition_benchmark.DEFAULT_REPEAT,
+            help='Number of users every query is timed for'
+        )
+        parser.add_argument('--output', help='File to write results to, standard output by default')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['matches'], options['partitions'], options['repeat']) < 1:
+            raise CommandError('Users, matches, partitions and repeat should be positive.')
+        try:
+            results = partition_benchmark.run(
+                options['users'], options['matches'], options['partitions'], options['repeat']
+            )
+        except NotSupportedError as e:
+            raise CommandError(str(e))
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures throughput and latency of read endpoints of running server '
+        'under concurrent load, writes results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='URL of running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument(
+            '--paths', default=','.join(loadtest.DEFAULT_PATHS),
+            help='Comma-separated paths requested by clients'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=loadtest.DEFAULT_CONCURRENCY,
+            help='Number of concurrent clients'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=loadtest.DEFAULT_DURATION,
+            help='Seconds every path is requested for'
+        )
+        parser.add_argument(
+            '--matches', type=int, default=loadtest.DEFAULT_MATCHES,
+            help='Number of matches of user making requests'
+        )
+        parser.add_argument('--output', help='File to write results to, standard output by default')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0 or options['matches'] < 0:
+            raise CommandError(
+                'Concurrency and duration should be positive, matches cannot be negative.'
+            )
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        if not paths or not all(path.startswith('/') for path in paths):
+            raise CommandError('Paths should be comma-separated and start with /.')
+        results = loadtest.run(
+            options['url'], paths, options['concurrency'], options['duration'], options['matches']
+        )
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from matches import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds match tables partitioned by hash of user (PostgreSQL only), '
+        'or as plain tables again with --undo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions', type=int, default=16, help='Number of partitions of every table'
+        )
+        parser.add_argument('--undo', action='store_true', help='Rebuild tables without partitions')
+
+    def handle(self, *args, **options):
+        try:
+            if options['undo']:
+                partitioning.unpartition()
+                self.stdout.write(self.style.SUCCESS('Match tables are not partitioned anymore'))
+            else:
+                partitioning.partition(options['partitions'])
+                self.stdout.write(self.style.SUCCESS(
+                    'Match tables are partitioned into {} partitions'.format(options['partitions'])
+                ))
+        except (NotSupportedError, ValueError) as e:
+            raise CommandError(str(e))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches.synthetic import seed
+
+
+class Command(BaseCommand):
+    help = 'Creates synthetic users with match histories, using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--matches', type=int, default=1000, help='Number of matches of every user')
+        parser.add_argument(
+            '--characters', type=int, default=1, help='Number of characters played in every match'
+        )
+        parser.add_argument('--prefix', default='synthetic', help='Prefix of usernames')
+        parser.add_argument('--seed', type=int, help='Seed making generated histories reproducible')
+
+    def handle(self, *args, **options):
+        if options['users'] < 0 or options['matches'] < 0:
+            raise CommandError('Number of users and matches cannot be negative.')
+        if options['characters'] < 1:
+            raise CommandError('Every match needs at least one character.')
+        started = time.perf_counter()
+        users = seed(
+            options['users'], options['matches'], options['characters'],
+            prefix=options['prefix'], seed=options['seed']
+        )
+        self.stdout.write(self.style.SUCCESS('Created {} users with {} matches in {:.1f} s'.format(
+            len(users), len(users) * options['matches'], time.perf_counter() - started
+        )))
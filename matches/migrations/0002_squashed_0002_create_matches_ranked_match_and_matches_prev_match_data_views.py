@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from matches.schema import create_or_replace_view
+
+
+class Migration(migrations.Migration):
+
+    # Views of 0002, created on every database; databases which have run
+    # 0002 (CREATE OR REPLACE VIEW, which SQLite lacks) skip this migration
+    replaces = [
+        ('matches', '0002_create_matches_ranked_match_and_matches_prev_match_data_views'),
+    ]
+
+    dependencies = [
+        ('matches', '0001_initial'),
+    ]
+
+    operations = [
+        create_or_replace_view('matches_ranked_match', """
+SELECT m.id, m.mmr_after, m.date, m.user_id,
+rank() OVER (PARTITION BY m.user_id ORDER BY m.date) as match_order
+FROM matches_match m
+        """),
+        create_or_replace_view('matches_prev_match_data', """
+SELECT m.*, o.id AS last_match_id, m.mmr_after - o.mmr_after AS mmr_difference
+FROM matches_ranked_match m
+LEFT JOIN matches_ranked_match o ON m.user_id=o.user_id AND m.match_order = o.match_order+1
+        """),
+    ]
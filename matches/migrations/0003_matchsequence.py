@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_match_sequence(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    MatchSequence = apps.get_model('matches', 'MatchSequence')
+
+    batch = []
+    prev_user_id, prev_pk, prev_mmr, prev_sequence = None, None, None, 0
+    matches = Match.objects.order_by('user_id', 'date', 'id').values_list(
+        'pk', 'user_id', 'mmr_after'
+    )
+    for pk, user_id, mmr_after in matches.iterator(chunk_size=2000):
+        if user_id != prev_user_id:
+            prev_pk, prev_mmr, prev_sequence = None, None, 0
+        batch.append(MatchSequence(
+            match_id=pk,
+            user_id=user_id,
+            sequence=prev_sequence + 1,
+            last_match_id=prev_pk,
+            mmr_difference=None if prev_mmr is None else mmr_after - prev_mmr
+        ))
+        prev_user_id, prev_pk, prev_mmr, prev_sequence = user_id, pk, mmr_after, prev_sequence + 1
+        if len(batch) >= 2000:
+            MatchSequence.objects.bulk_create(batch)
+            batch = []
+    MatchSequence.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0002_create_matches_ranked_match_and_matches_prev_match_data_views'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchWithPrevData',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('mmr_after', models.PositiveIntegerField()),
+                ('last_match_id', models.IntegerField(null=True)),
+                ('mmr_difference', models.IntegerField(null=True)),
+                ('match_order', models.PositiveIntegerField(null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'matches',
+                'db_table': 'matches_prev_match_data',
+                'ordering': ('-date', '-id'),
+                'managed': False,
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='match',
+            options={'ordering': ('-date', '-id'), 'verbose_name_plural': 'matches'},
+        ),
+        migrations.CreateModel(
+            name='MatchSequence',
+            fields=[
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sequence', serialize=False, to='matches.match')),
+                ('sequence', models.PositiveIntegerField()),
+                ('mmr_difference', models.IntegerField(null=True)),
+                ('last_match', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matches.match')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'sequence'], name='matches_mat_user_id_fe587e_idx')],
+            },
+        ),
+        migrations.RunPython(fill_match_sequence, migrations.RunPython.noop),
+
+        migrations.RunSQL("""
+DROP VIEW matches_prev_match_data;
+DROP VIEW matches_ranked_match;
+CREATE VIEW matches_prev_match_data AS
+SELECT m.*, s.last_match_id, s.mmr_difference, s.sequence AS match_order
+FROM matches_match m
+LEFT JOIN matches_matchsequence s ON s.match_id = m.id;
+        """, """
+DROP VIEW matches_prev_match_data;
+CREATE VIEW matches_ranked_match AS
+SELECT m.id, m.mmr_after, m.date, m.user_id, 
+rank() OVER (PARTITION BY m.user_id ORDER BY m.date) as match_order 
+FROM matches_match m;
+CREATE VIEW matches_prev_match_data AS
+SELECT m.*, o.id AS last_match_id, m.mmr_after - o.mmr_after AS mmr_difference
+FROM matches_ranked_match m 
+LEFT JOIN matches_ranked_match o ON m.user_id=o.user_id AND m.match_order = o.match_order+1;
+        """),
+    ]
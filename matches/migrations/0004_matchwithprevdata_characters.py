@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0003_matchsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchWithPrevDataCharacter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'db_table': 'matches_match_characters',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0001_initial'),
+        ('matches', '0004_matchwithprevdata_characters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['user', '-date', '-id'], name='matches_mat_user_id_ef7195_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from matches.schema import sqlite_remaking
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0005_match_user_date_index'),
+    ]
+
+    operations = sqlite_remaking(
+        migrations.AlterField(
+            model_name='match',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    )
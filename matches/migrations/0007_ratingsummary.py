@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_rating_summary(apps, schema_editor):
+    MatchSequence = apps.get_model('matches', 'MatchSequence')
+    RatingSummary = apps.get_model('matches', 'RatingSummary')
+
+    summaries = {}
+    sequences = MatchSequence.objects.order_by('user_id', 'sequence').values_list(
+        'user_id', 'match_id', 'match__mmr_after', 'mmr_difference'
+    )
+    for user_id, match_id, mmr_after, mmr_difference in sequences.iterator(chunk_size=2000):
+        summary = summaries.get(user_id)
+        if summary is None:
+            summary = summaries[user_id] = RatingSummary(user_id=user_id)
+        summary.current_mmr = mmr_after
+        summary.peak_mmr = max(summary.peak_mmr or 0, mmr_after)
+        summary.lowest_mmr = mmr_after if summary.lowest_mmr is None else min(summary.lowest_mmr, mmr_after)
+        if mmr_difference is None or mmr_difference == 0:
+            if mmr_difference is not None:
+                summary.draws += 1
+            summary.streak = 0
+        elif mmr_difference > 0:
+            summary.wins += 1
+            summary.streak = summary.streak + 1 if summary.streak > 0 else 1
+        else:
+            summary.losses += 1
+            summary.streak = summary.streak - 1 if summary.streak < 0 else -1
+        summary.last_match_id = match_id
+    RatingSummary.objects.bulk_create(summaries.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('matches', '0006_match_date_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('current_mmr', models.PositiveIntegerField(null=True)),
+                ('peak_mmr', models.PositiveIntegerField(null=True)),
+                ('lowest_mmr', models.PositiveIntegerField(null=True)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('streak', models.IntegerField(default=0)),
+                ('last_match', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matches.match')),
+            ],
+        ),
+        migrations.RunPython(fill_rating_summary, migrations.RunPython.noop),
+    ]
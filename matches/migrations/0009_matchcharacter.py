@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_match_character_user(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    MatchCharacter = apps.get_model('matches', 'MatchCharacter')
+    MatchCharacter.objects.update(user_id=models.Subquery(
+        Match.objects.filter(pk=models.OuterRef('match_id')).values('user_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0003_catalogversion_modified'),
+        ('matches', '0008_matchdataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Through table created along with Match.characters already exists
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='MatchCharacter',
+                fields=[
+                    ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('character', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='characters.character')),
+                    ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='matches.match')),
+                ],
+                options={
+                    'db_table': 'matches_match_characters',
+                    'unique_together': {('match', 'character')},
+                },
+            ),
+            migrations.AlterField(
+                model_name='match',
+                name='characters',
+                field=models.ManyToManyField(through='matches.MatchCharacter', to='characters.character'),
+            ),
+        ]),
+        migrations.AddField(
+            model_name='matchcharacter',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_match_character_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='matchcharacter',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# MmrBucket.WIDTH at the time of migration
+WIDTH = 10
+
+
+def fill_mmr_buckets(apps, schema_editor):
+    MmrBucket = apps.get_model('matches', 'MmrBucket')
+    RatingSummary = apps.get_model('matches', 'RatingSummary')
+
+    buckets = {}
+    counts = RatingSummary.objects.filter(current_mmr__isnull=False).values_list(
+        'current_mmr'
+    ).annotate(players=Count('pk')).order_by()
+    for mmr, players in counts:
+        mmr_from = mmr // WIDTH * WIDTH
+        buckets[mmr_from] = buckets.get(mmr_from, 0) + players
+    MmrBucket.objects.bulk_create(
+        [MmrBucket(mmr_from=mmr_from, players=players) for mmr_from, players in buckets.items()],
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0009_matchcharacter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MmrBucket',
+            fields=[
+                ('mmr_from', models.IntegerField(primary_key=True, serialize=False)),
+                ('players', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ratingsummary',
+            index=models.Index(fields=['-current_mmr', 'user'], name='matches_rating_leaderboard'),
+        ),
+        migrations.RunPython(fill_mmr_buckets, migrations.RunPython.noop),
+    ]
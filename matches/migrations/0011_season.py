@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from matches.schema import recreating_view
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0003_catalogversion_modified'),
+        ('matches', '0010_mmrbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Season',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('start', models.DateTimeField(unique=True)),
+            ],
+            options={
+                'ordering': ('-start',),
+            },
+        ),
+        # No seasons exist yet, so matches stay without season
+        *recreating_view(
+            migrations.AddField(
+                model_name='match',
+                name='season',
+                field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='matches.season'),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['user', 'season', '-date', '-id'], name='matches_match_user_season'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0011_season'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonsVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('modified', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,134 @@
-from django.db import models, connection
+import bisect
+
+from asgiref.sync import sync_to_async
+from django.db import models, connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Window
+from django.db.models.functions import Lag, RowNumber
 from django.contrib.auth.models import User
+from django.dispatch import Signal
+from django.utils import timezone
 
+from characters.catalog import catalog
 from characters.models import Character
 
+class Season(models.Model):
+    """ Competitive season, lasting from its start to start of the next one
+
+    name - name of the season
+    start - when the season starts
+
+    Matches are assigned to season of their date when they are created, and
+    reassigned when seasons change (see matches.signals). Matches played
+    before first season have no season.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    start = models.DateTimeField(unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ('-start',)
+
+    @classmethod
+    def idAt(cls, date):
+        """ Returns PK of season which given date belongs to, None if there is none
+        """
+        return cls.objects.filter(start__lte=date).order_by('-start').values_list(
+            'pk', flat=True
+        ).first()
+
+    @classmethod
+    def startAt(cls, date):
+        """ Returns (pk, start) of season which given date belongs to, None
+        if there is none
+        """
+        return cls.objects.filter(start__lte=date).order_by('-start').values_list(
+            'pk', 'start'
+        ).first()
+
+    @classmethod
+    def idFinder(cls):
+        """ Returns function mapping dates to PKs of their seasons like idAt,
+        with seasons loaded once, for creating matches in bulk
+        """
+        seasons = list(cls.objects.order_by('start').values_list('start', 'pk'))
+        starts = [start for start, _ in seasons]
+
+        def find(date):
+            position = bisect.bisect_right(starts, date)
+            return seasons[position - 1][1] if position else None
+        return find
+
+    @classmethod
+    def reassignMatches(cls):
+        """ Assigns all matches to seasons of their dates, returns set of IDs
+        of users whose matches have moved
+        """
+        seasons = list(cls.objects.order_by('start').values_list('start', 'pk'))
+        ranges = [(None, seasons[0][0] if seasons else None, None)] + [
+            (start, seasons[i + 1][0] if i + 1 < len(seasons) else None, pk)
+            for i, (start, pk) in enumerate(seasons)
+        ]
+        user_ids = set()
+        for start, end, pk in ranges:
+            matches = Match.objects.all()
+            if start is not None:
+                matches = matches.filter(date__gte=start)
+            if end is not None:
+                matches = matches.filter(date__lt=end)
+            if pk is None:
+                matches = matches.filter(season__isnull=False)
+            else:
+                matches = matches.exclude(season=pk)
+            user_ids.update(matches.values_list('user_id', flat=True).distinct())
+            matches.update(season_id=pk)
+        return user_ids
+
+
+class SeasonsVersion(models.Model):
+    """ Single-row stamp of Season data version, bumped on every Season save
+    and delete (see matches.signals), so conditional requests notice seasons
+    added, changed or deleted without touching any match
+
+    version - number of changes made to seasons
+    modified - time of last change, None if seasons were never changed
+    """
+
+    version = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(null=True)
+
+    @classmethod
+    def stamp(cls):
+        """ Returns (version, modified) tuple of current Season data
+        """
+        stamp = cls.objects.filter(pk=1).values_list('version', 'modified').first()
+        return (0, None) if stamp is None else stamp
+
+    @classmethod
+    def bump(cls):
+        """ Marks Season data as changed
+        """
+        now = timezone.now()
+        if cls.objects.filter(pk=1).update(version=models.F('version') + 1, modified=now) == 0:
+            cls.objects.create(pk=1, version=1, modified=now)
+
+
+class MatchQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """ Assigns given matches without season to seasons of their dates,
+        reading seasons once
+        """
+        objs = list(objs)
+        if any(match.season_id is None for match in objs):
+            find = Season.idFinder()
+            for match in objs:
+                if match.season_id is None:
+                    match.season_id = find(match.date)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Match(models.Model):
     """ Describes single Overwatch match
 
@@ -10,28 +136,85 @@ class Match(models.Model):
     user - which match is this
     mmr_after - player's MMR after match
     characters - characters played by user during this match
+    season - season the match was played in, assigned from date when match
+        is created, also in bulk
     """
 
-    date = models.DateTimeField(auto_now_add=True)
+    date = models.DateTimeField(default=timezone.now, editable=False)
     mmr_after = models.PositiveIntegerField()
-    characters = models.ManyToManyField(to=Character)
+    characters = models.ManyToManyField(to=Character, through='MatchCharacter')
     user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    season = models.ForeignKey(
+        to=Season, on_delete=models.SET_NULL, null=True, editable=False, related_name='+'
+    )
+
+    objects = MatchQuerySet.as_manager()
 
     def __str__(self):
         return "{}, {}".format(str(self.user), str(self.date))
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
         verbose_name_plural = 'matches'
+        indexes = [
+            models.Index(fields=['user', '-date', '-id']),
+            # Season-scoped lists and statistics
+            models.Index(fields=['user', 'season', '-date', '-id'], name='matches_match_user_season'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.season_id is None:
+            self.season_id = Season.idAt(self.date)
+        super().save(*args, **kwargs)
     
     @classmethod
     def lastMatch(cls, of:User):
         """ Return last match played by given user, otherwise return None
+        Reads it from user's RatingSummary
         """
-        user_matches = cls.objects.filter(user=of).order_by('-date')
-        if len(user_matches) == 0:
-            return None
-        return user_matches[0]
+        return cls.objects.filter(
+            pk=models.Subquery(
+                RatingSummary.objects.filter(user=of).values('last_match')[:1]
+            )
+        ).first()
+
+    @classmethod
+    def charactersOf(cls, match_pks, user_id=None):
+        """ Returns dict mapping each of given match PKs (of Match or MatchWithPrevData)
+        to list of its characters, loaded with single query of through table
+        If all matches belong to one user, pass user_id to read only their rows
+        """
+        characters = {pk: [] for pk in match_pks}
+        cls._addCharacters(characters, cls._characterLinks(characters, user_id))
+        return characters
+
+    @classmethod
+    async def acharactersOf(cls, match_pks, user_id=None):
+        """ Asynchronous version of charactersOf
+        """
+        characters = {pk: [] for pk in match_pks}
+        links = [link async for link in cls._characterLinks(characters, user_id)]
+        # Catalog may have to be reloaded from database
+        await sync_to_async(cls._addCharacters)(characters, links)
+        return characters
+
+    @classmethod
+    def _characterLinks(cls, match_pks, user_id=None):
+        """ Returns queryset of (match_id, character_id) pairs of given matches
+        """
+        links = MatchCharacter.objects.filter(match_id__in=list(match_pks))
+        if user_id is not None:
+            links = links.filter(user_id=user_id)
+        return links.order_by('character_id').values_list('match_id', 'character_id')
+
+    @staticmethod
+    def _addCharacters(characters, links):
+        """ Appends characters of (match_id, character_id) links to lists in characters dict
+        """
+        for match_id, character_id in links:
+            character = catalog.get(character_id)
+            if character is not None:
+                characters[match_id].append(character)
 
     def previousMatch(self):
         """ Returns match played before this match by same user
@@ -53,6 +236,431 @@ class Match(models.Model):
         return prevData.mmr_difference
 
 
+class MatchCharacterQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """ Fills missing user of given links from their matches, reading
+        owners of all of them with single query
+        """
+        objs = list(objs)
+        missing = {link.match_id for link in objs if link.user_id is None}
+        if missing:
+            owners = dict(Match.objects.filter(pk__in=missing).values_list('pk', 'user_id'))
+            for link in objs:
+                if link.user_id is None:
+                    link.user_id = owners.get(link.match_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class MatchCharacter(models.Model):
+    """ Character played in a match, through model of Match.characters
+
+    match - match the character was played in
+    character - played character
+    user - owner of the match, copied here so character rows can be read (and
+        partitioned, see matches.partitioning) by user; filled from match when
+        missing, also when Django adds characters to matches in bulk, and
+        updated when match changes its owner (see matches.signals)
+    """
+
+    match = models.ForeignKey(to=Match, on_delete=models.CASCADE)
+    character = models.ForeignKey(to=Character, on_delete=models.CASCADE)
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='+')
+
+    objects = MatchCharacterQuerySet.as_manager()
+
+    def __str__(self):
+        return "{}, {}".format(str(self.match), str(self.character))
+
+    class Meta:
+        db_table = 'matches_match_characters'
+        unique_together = [('match', 'character')]
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = Match.objects.filter(pk=self.match_id).values_list(
+                'user_id', flat=True
+            ).first()
+        super().save(*args, **kwargs)
+
+
+class MatchSequence(models.Model):
+    """ Stores position of a match in its user's history, maintained on every
+    Match insert, edit and delete (see matches.signals)
+
+    match - match described by this row
+    user - owner of the match, copied here so history can be walked by index
+    sequence - 1-based position of the match in user's history, ordered by (date, id)
+    last_match - match played before this one by same user in the same season
+    mmr_difference - MMR difference between this match and previous one
+
+    last_match and mmr_difference are NULL on first match of every season
+    (and on first match played before first season)
+    """
+
+    match = models.OneToOneField(
+        to=Match, on_delete=models.CASCADE, primary_key=True, related_name='sequence'
+    )
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    sequence = models.PositiveIntegerField()
+    last_match = models.ForeignKey(
+        to=Match, on_delete=models.SET_NULL, null=True, related_name='+'
+    )
+    mmr_difference = models.IntegerField(null=True)
+
+    def __str__(self):
+        return "{}, #{}".format(str(self.user), self.sequence)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sequence']),
+        ]
+
+    @classmethod
+    def refreshFrom(cls, user_id, date, pk, stop_early=True):
+        """ Recomputes sequence rows of user's matches played at or after (date, pk)
+
+        Rows are walked in history order and rewritten only if they differ
+        from stored ones. Unless stop_early is False, walk stops at first
+        unchanged row past the match following (date, pk), so appending or
+        editing a match touches at most two rows, while inserting or removing
+        one in the middle renumbers the tail.
+
+        If only new rows were added at the end of history, returns list of
+        (match_pk, mmr_after, mmr_difference) tuples of them, otherwise None.
+        """
+        with transaction.atomic():
+            # Serialize maintenance of a single user's history
+            list(User.objects.select_for_update().filter(pk=user_id).values_list('pk'))
+
+            user_matches = Match.objects.filter(user_id=user_id)
+            before = user_matches.filter(
+                Q(date__lt=date) | Q(date=date, pk__lt=pk)
+            ).order_by('-date', '-id').values_list(
+                'pk', 'mmr_after', 'season', 'sequence__sequence'
+            ).first()
+            if before is None:
+                prev_pk, prev_mmr, prev_season, prev_sequence = None, None, None, 0
+            else:
+                prev_pk, prev_mmr, prev_season, prev_sequence = before
+                if prev_sequence is None:
+                    # Predecessor is not numbered yet, start from the beginning
+                    cls.rebuild(user_id)
+                    return None
+
+            tail = user_matches.filter(
+                Q(date__gt=date) | Q(date=date, pk__gte=pk)
+            ).order_by('date', 'id').values_list(
+                'pk', 'mmr_after', 'season', 'sequence__user', 'sequence__sequence',
+                'sequence__last_match', 'sequence__mmr_difference'
+            )
+
+            to_create = []
+            to_update = []
+            appended = []
+            # Index of last row which may differ while its sequence does not
+            # (given match and the one following it)
+            changed_until = 0
+            for position, row in enumerate(tail.iterator(chunk_size=500)):
+                match_pk, mmr_after, season_id, *stored = row
+                if position == 0 and match_pk == pk:
+                    changed_until = 1
+                if season_id != prev_season:
+                    # Previous match belongs to another season
+                    prev_pk, prev_mmr = None, None
+                computed = [
+                    user_id,
+                    prev_sequence + 1,
+                    prev_pk,
+                    None if prev_mmr is None else mmr_after - prev_mmr,
+                ]
+                if stored == computed:
+                    if stop_early and position > changed_until:
+                        break
+                else:
+                    entry = cls(
+                        match_id=match_pk,
+                        user_id=user_id,
+                        sequence=computed[1],
+                        last_match_id=computed[2],
+                        mmr_difference=computed[3]
+                    )
+                    if stored[1] is None:
+                        to_create.append(entry)
+                        appended.append((match_pk, mmr_after, entry.mmr_difference))
+                    else:
+                        to_update.append(entry)
+                prev_pk, prev_mmr, prev_season, prev_sequence = (
+                    match_pk, mmr_after, season_id, computed[1]
+                )
+
+            cls.objects.bulk_update(
+                to_update, ['user', 'sequence', 'last_match', 'mmr_difference'],
+                batch_size=500
+            )
+            cls.objects.bulk_create(to_create, batch_size=500)
+        return None if to_update else appended
+
+    @classmethod
+    def computed(cls, user_id):
+        """ Returns list of (match_pk, sequence, last_match_pk, mmr_difference)
+        tuples of user's matches in history order, computed from Match table
+        alone by window functions - what stored rows of the user should contain
+        """
+        order = (F('date').asc(), F('id').asc())
+        season = [F('season')]
+        return list(Match.objects.filter(user_id=user_id).annotate(
+            position=Window(RowNumber(), order_by=order),
+            previous=Window(Lag('id'), partition_by=season, order_by=order),
+            difference=F('mmr_after') - Window(
+                Lag('mmr_after'), partition_by=season, order_by=order
+            ),
+        ).order_by(*order).values_list('pk', 'position', 'previous', 'difference'))
+
+    @classmethod
+    def rebuild(cls, user_id):
+        """ Recomputes sequence rows of all matches of given user
+        """
+        first = Match.objects.filter(user_id=user_id).order_by('date', 'id').first()
+        if first is not None:
+            cls.refreshFrom(user_id, first.date, first.pk, stop_early=False)
+
+
+# Sent (with user_id and appended arguments) after history of matches of
+# a user has changed and its MatchSequence rows were refreshed, while history
+# of that user is still locked. appended is list of (match_pk, mmr_after,
+# mmr_difference) tuples if matches were only added at the end of history,
+# None otherwise.
+history_changed = Signal()
+
+
+class RatingSummary(models.Model):
+    """ Describes current rating of a user in season of their last match,
+    maintained on every change of user's history (see matches.signals)
+
+    user - user described by this summary
+    current_mmr - MMR after last match
+    peak_mmr - highest MMR in history
+    lowest_mmr - lowest MMR in history
+    wins, losses, draws - number of matches which increased, decreased
+        or did not change MMR (first match of season is not counted)
+    streak - number of consecutive wins (positive) or losses (negative)
+        up to last match, 0 if last match was draw or first one of season
+    last_match - last match played by user
+    """
+
+    user = models.OneToOneField(
+        to=User, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary'
+    )
+    current_mmr = models.PositiveIntegerField(null=True)
+    peak_mmr = models.PositiveIntegerField(null=True)
+    lowest_mmr = models.PositiveIntegerField(null=True)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    streak = models.IntegerField(default=0)
+    last_match = models.ForeignKey(
+        to=Match, on_delete=models.SET_NULL, null=True, related_name='+'
+    )
+
+    class Meta:
+        indexes = [
+            # Leaderboard, see matches.leaderboard
+            models.Index(fields=['-current_mmr', 'user'], name='matches_rating_leaderboard'),
+        ]
+
+    def __str__(self):
+        return "{}, {}".format(str(self.user), self.current_mmr)
+
+    def addMatch(self, match_pk, mmr_after, mmr_difference):
+        """ Updates summary with match played after all other matches,
+        starting it over if match is first of its season
+        """
+        if mmr_difference is None:
+            self.peak_mmr = self.lowest_mmr = None
+            self.wins = self.losses = self.draws = 0
+        self.current_mmr = mmr_after
+        self.peak_mmr = mmr_after if self.peak_mmr is None else max(self.peak_mmr, mmr_after)
+        self.lowest_mmr = mmr_after if self.lowest_mmr is None else min(self.lowest_mmr, mmr_after)
+        if mmr_difference is None or mmr_difference == 0:
+            if mmr_difference is not None:
+                self.draws += 1
+            self.streak = 0
+        elif mmr_difference > 0:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        else:
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+        self.last_match_id = match_pk
+
+    @classmethod
+    def append(cls, user_id, appended):
+        """ Updates summary of given user with matches added at the end of history
+        """
+        summary = cls.objects.select_for_update().filter(user_id=user_id).first()
+        if summary is None:
+            summary = cls(user_id=user_id)
+        previous_mmr = summary.current_mmr
+        for match in appended:
+            summary.addMatch(*match)
+        summary.save()
+        MmrBucket.move(previous_mmr, summary.current_mmr)
+
+    @classmethod
+    def rebuild(cls, user_id):
+        """ Recomputes summary of given user from matches of season of their
+        last match
+        """
+        sequences = MatchSequence.objects.filter(user_id=user_id)
+        last = sequences.order_by('-sequence').values_list(
+            'match_id', 'sequence', 'match__mmr_after', 'mmr_difference'
+        ).first()
+        if last is None:
+            cls.remove(user_id)
+            return
+        last_match_id, last_sequence, current_mmr, last_difference = last
+        # First match of the season has no previous match
+        season_start = sequences.filter(mmr_difference=None).order_by(
+            '-sequence'
+        ).values_list('sequence', flat=True).first()
+        sequences = sequences.filter(sequence__gte=season_start)
+
+        totals = sequences.aggregate(
+            peak_mmr=Max('match__mmr_after'),
+            lowest_mmr=Min('match__mmr_after'),
+            wins=Count('pk', filter=Q(mmr_difference__gt=0)),
+            losses=Count('pk', filter=Q(mmr_difference__lt=0)),
+            draws=Count('pk', filter=Q(mmr_difference=0)),
+        )
+
+        streak = 0
+        if last_difference is not None and last_difference != 0:
+            won = last_difference > 0
+            # Last match which does not continue the streak
+            breaking = Q(mmr_difference=None) | (
+                Q(mmr_difference__lte=0) if won else Q(mmr_difference__gte=0)
+            )
+            streak_start = sequences.filter(breaking).order_by(
+                '-sequence'
+            ).values_list('sequence', flat=True).first() or 0
+            streak = last_sequence - streak_start
+            if not won:
+                streak = -streak
+
+        previous_mmr = cls.objects.filter(user_id=user_id).values_list(
+            'current_mmr', flat=True
+        ).first()
+        cls.objects.update_or_create(user_id=user_id, defaults=dict(
+            current_mmr=current_mmr,
+            streak=streak,
+            last_match_id=last_match_id,
+            **totals
+        ))
+        MmrBucket.move(previous_mmr, current_mmr)
+
+    @classmethod
+    def remove(cls, user_id):
+        """ Deletes summary of given user and removes them from histogram of
+        current MMR, if they still have summary
+        """
+        summary = cls.objects.select_for_update().filter(user_id=user_id).values_list(
+            'current_mmr', flat=True
+        )
+        for current_mmr in summary:
+            cls.objects.filter(user_id=user_id).delete()
+            MmrBucket.move(current_mmr, None)
+
+
+class MmrBucket(models.Model):
+    """ Number of users whose current MMR (see RatingSummary) falls into
+    range of WIDTH MMR points, maintained along with RatingSummary, so
+    histogram of current MMR of all users is read without scanning them
+
+    mmr_from - lowest MMR of the range, multiple of WIDTH
+    players - number of users with current MMR in the range
+    """
+
+    WIDTH = 10
+
+    mmr_from = models.IntegerField(primary_key=True)
+    players = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "{}-{}, {}".format(self.mmr_from, self.mmr_from + self.WIDTH - 1, self.players)
+
+    @classmethod
+    def of(cls, mmr):
+        """ Returns lowest MMR of range containing given MMR
+        """
+        return mmr // cls.WIDTH * cls.WIDTH
+
+    @classmethod
+    def add(cls, mmr, players):
+        """ Adds players (negative to remove them) to range of given MMR
+        """
+        mmr_from = cls.of(mmr)
+        changes = {'players': F('players') + players}
+        if cls.objects.filter(mmr_from=mmr_from).update(**changes) == 0:
+            _, created = cls.objects.get_or_create(
+                mmr_from=mmr_from, defaults={'players': players}
+            )
+            if not created:
+                cls.objects.filter(mmr_from=mmr_from).update(**changes)
+
+    @classmethod
+    def move(cls, previous_mmr, mmr):
+        """ Moves user from range of previous_mmr to range of mmr, either
+        can be None for user without matches
+        """
+        if previous_mmr is not None and mmr is not None and cls.of(previous_mmr) == cls.of(mmr):
+            return
+        if previous_mmr is not None:
+            cls.add(previous_mmr, -1)
+        if mmr is not None:
+            cls.add(mmr, 1)
+
+
+class MatchDataVersion(models.Model):
+    """ Version of user's match data, bumped on every change of user's matches
+    or their characters (see matches.signals), so conditional requests can be
+    answered without reading matches
+
+    user - owner of matches
+    version - number of changes made to user's matches
+    modified - time of last change
+    """
+
+    user = models.OneToOneField(
+        to=User, on_delete=models.CASCADE, primary_key=True, related_name='match_data_version'
+    )
+    version = models.BigIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "{}, {}".format(str(self.user), self.version)
+
+    @classmethod
+    def current(cls, user_id):
+        """ Returns (version, modified) tuple of match data of given user,
+        (0, None) if it was never changed
+        """
+        stamp = cls.objects.filter(user_id=user_id).values_list('version', 'modified').first()
+        return (0, None) if stamp is None else stamp
+
+    @classmethod
+    def bump(cls, user_id):
+        """ Marks match data of given user as changed
+        """
+        now = timezone.now()
+        changes = {'version': models.F('version') + 1, 'modified': now}
+        if cls.objects.filter(user_id=user_id).update(**changes) == 0:
+            _, created = cls.objects.get_or_create(
+                user_id=user_id, defaults={'version': 1, 'modified': now}
+            )
+            if not created:
+                cls.objects.filter(user_id=user_id).update(**changes)
+
+
 class MatchWithPrevData(models.Model):
     """ Describes single Overwatch match, with data about previous matches included
     This is read-only model!
@@ -61,26 +669,37 @@ class MatchWithPrevData(models.Model):
     user - which match is this
     mmr_after - player's MMR after match
     characters - characters played by user during this match
-    last_match_id - ID of a previous match played by same user
+    season - season the match was played in
+    last_match_id - ID of a previous match played by same user in the same season
     mmr_difference - MMR difference between this match and previous one played
-        by same user
+        by same user in the same season
+    match_order - 1-based position of this match in user's history
 
-    last_match_id and mmr_difference are NULL on first match
+    last_match_id and mmr_difference are NULL on first match of every season
+    Data is read from MatchSequence table, joined with matches by primary key
     Use this model instead Match when informations about last match and MMR difference
     are important to you
+    Use prefetch_related('characters') to load characters of many matches at once
     """
 
     date = models.DateTimeField(auto_now_add=True)
     mmr_after = models.PositiveIntegerField()
-    user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    user = models.ForeignKey(to=User, on_delete=models.DO_NOTHING)
+    season = models.ForeignKey(
+        to=Season, on_delete=models.DO_NOTHING, null=True, related_name='+'
+    )
     last_match_id = models.IntegerField(null=True)
     mmr_difference = models.IntegerField(null=True)
+    match_order = models.PositiveIntegerField(null=True)
+    characters = models.ManyToManyField(
+        to=Character, through='MatchWithPrevDataCharacter', related_name='+'
+    )
 
     def __str__(self):
         return "{}, {}".format(str(self.user), str(self.date))
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
         verbose_name_plural = 'matches'
         managed = False
         db_table = 'matches_prev_match_data'
@@ -88,11 +707,13 @@ class MatchWithPrevData(models.Model):
     @classmethod
     def lastMatch(cls, of:User):
         """ Return last match played by given user, otherwise return None
+        Reads it from user's RatingSummary
         """
-        user_matches = cls.objects.filter(user=of).order_by('-date')
-        if len(user_matches) == 0:
-            return None
-        return user_matches[0]
+        return cls.objects.filter(
+            pk=models.Subquery(
+                RatingSummary.objects.filter(user=of).values('last_match')[:1]
+            )
+        ).first()
 
     def previousMatch(self):
         """ Returns match played before this match by same user
@@ -112,9 +733,22 @@ class MatchWithPrevData(models.Model):
             return 0
         return self.mmr_difference
 
-    @property
-    def characters(self):
-        """
-        Returns list of characters related to this match
-        """
-        return Character.objects.filter(match__pk=self.pk)
+
+class MatchWithPrevDataCharacter(models.Model):
+    """ Read-only view of Match.characters through table, allowing characters of
+    MatchWithPrevData to be prefetched
+    """
+
+    match = models.ForeignKey(
+        to=MatchWithPrevData, on_delete=models.DO_NOTHING, related_name='+'
+    )
+    character = models.ForeignKey(
+        to=Character, on_delete=models.DO_NOTHING, related_name='+'
+    )
+    user = models.ForeignKey(
+        to=User, on_delete=models.DO_NOTHING, related_name='+'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'matches_match_characters'
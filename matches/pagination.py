@@ -0,0 +1,117 @@
+""" Keyset (cursor) pagination of match histories
+
+Matches are listed newest first, ordered by (date, id). Cursor holds (date, id)
+of the row page starts after, so every page is read from the (user, date, id)
+index the same way, without OFFSET, and stays stable when new matches are added.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Largest primary key (of bigint column), larger ones in cursors are rejected
+MAX_PK = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """ Raised when cursor passed by client cannot be decoded
+    """
+
+
+def encode_cursor(date, pk, reverse=False):
+    """ Returns opaque cursor pointing at match with given date and pk
+
+    reverse - whether cursor points to page of newer matches
+    """
+    raw = '{}|{}|{}'.format('r' if reverse else 'f', date.isoformat(), pk)
+    return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ Returns (date, pk, reverse) tuple stored in cursor
+    """
+    try:
+        direction, date, pk = urlsafe_b64decode(
+            cursor.encode('ascii')
+        ).decode('ascii').split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (BinasciiError, UnicodeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if date is None or direction not in ('f', 'r') or not 0 < pk <= MAX_PK:
+        raise InvalidCursor('Invalid cursor')
+    return date, pk, direction == 'r'
+
+
+def _position(row):
+    """ Returns (date, pk) of match or of dict of its values
+    """
+    if isinstance(row, dict):
+        return row['date'], row['id']
+    return row.date, row.pk
+
+
+def _page_queryset(queryset, cursor):
+    """ Returns (queryset, reverse) of rows of page starting at cursor, in
+    order they are read
+    """
+    reverse = False
+    if cursor is not None:
+        date, pk, reverse = decode_cursor(cursor)
+        if reverse:
+            queryset = queryset.filter(Q(date__gt=date) | Q(date=date, pk__gt=pk))
+        else:
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+
+    if reverse:
+        return queryset.order_by('date', 'id'), reverse
+    return queryset.order_by('-date', '-id'), reverse
+
+
+def _page(matches, cursor, reverse, page_size):
+    """ Returns (matches, next_cursor, previous_cursor) of page built from
+    up to page_size + 1 rows read from _page_queryset
+    """
+    has_more = len(matches) > page_size
+    matches = matches[:page_size]
+    if reverse:
+        matches.reverse()
+
+    next_cursor = None
+    previous_cursor = None
+    if matches:
+        first, last = _position(matches[0]), _position(matches[-1])
+        if reverse:
+            # Page was reached going back, so there are older matches
+            next_cursor = encode_cursor(*last)
+            if has_more:
+                previous_cursor = encode_cursor(*first, reverse=True)
+        else:
+            if has_more:
+                next_cursor = encode_cursor(*last)
+            if cursor is not None:
+                previous_cursor = encode_cursor(*first, reverse=True)
+    return matches, next_cursor, previous_cursor
+
+
+def paginate(queryset, cursor, page_size):
+    """ Returns (matches, next_cursor, previous_cursor) for page of queryset
+    starting at given cursor (first page if cursor is None)
+
+    queryset has to contain Match or MatchWithPrevData rows (or dicts of
+    their values, including date and id), next_cursor
+    leads to older matches and previous_cursor to newer ones; any of them
+    is None if there are no more matches in its direction
+    """
+    queryset, reverse = _page_queryset(queryset, cursor)
+    return _page(list(queryset[:page_size + 1]), cursor, reverse, page_size)
+
+
+async def apaginate(queryset, cursor, page_size):
+    """ Asynchronous version of paginate, reading page with async ORM
+    """
+    queryset, reverse = _page_queryset(queryset, cursor)
+    matches = [match async for match in queryset[:page_size + 1]]
+    return _page(matches, cursor, reverse, page_size)
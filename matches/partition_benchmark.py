@@ -0,0 +1,181 @@
+""" Benchmark of per-user queries on plain and hash-partitioned match tables
+
+Synthetic users and matches are inserted with single INSERT ... SELECT
+statements (millions of rows would take hours through the ORM), matches
+of all users interleaved in time the way they are entered, with one
+character each and MatchSequence computed by window functions. Queries of
+`repeat` random users are timed on plain tables, then tables are
+partitioned (see matches.partitioning) and the same queries are timed
+again; number of partitions of match tables every query plan reads is
+reported next to timings (1 for plain tables). Everything runs in transaction rolled back at the
+end, so benchmark leaves database unchanged, but it needs disk space for all
+generated rows and blocks match tables meanwhile.
+"""
+
+import platform
+import random as _random
+import re
+import time
+
+import django
+from django.db import DatabaseError, NotSupportedError, connection, transaction
+
+from . import partitioning
+from .analytics import _load_stats
+from .benchmark import _revision, _timings
+from .models import Match, MatchWithPrevData
+from .synthetic import ensure_characters
+from .views import MATCHES_PER_PAGE
+
+DEFAULT_USERS = 10000
+DEFAULT_MATCHES = 1000
+DEFAULT_PARTITIONS = 16
+DEFAULT_REPEAT = 20
+CHARACTERS = 3
+
+
+def _seed(users, matches, seed_value):
+    """ Inserts users with matches played every 2 hours, returns list of their IDs
+    """
+    characters = [c.pk for c in ensure_characters(CHARACTERS)][:CHARACTERS]
+    prefix = 'partition-benchmark-{}-'.format(int(time.time()))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT setseed(%s)', [_random.Random(seed_value).random()])
+        cursor.execute(
+            'INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, '
+            'email, is_staff, is_active, date_joined) '
+            "SELECT '!', false, %s || g, '', '', '', false, true, now() "
+            'FROM generate_series(1, %s) g RETURNING id', [prefix, users]
+        )
+        user_ids = sorted(pk for pk, in cursor.fetchall())
+        cursor.execute(
+            'INSERT INTO matches_match (date, mmr_after, user_id) '
+            "SELECT now() - make_interval(hours => 2 * (%s - g)), 1500 + floor(random() * 2000)::int, u "
+            'FROM generate_series(1, %s) g CROSS JOIN unnest(%s::integer[]) u ORDER BY g, u',
+            [matches, matches, user_ids]
+        )
+        cursor.execute(
+            'INSERT INTO matches_match_characters (match_id, character_id, user_id) '
+            'SELECT id, (%s::integer[])[1 + id %% %s], user_id FROM matches_match '
+            'WHERE user_id = ANY(%s)', [characters, len(characters), user_ids]
+        )
+        cursor.execute(
+            'INSERT INTO matches_matchsequence (match_id, user_id, sequence, last_match_id, mmr_difference) '
+            'SELECT id, user_id, row_number() OVER w, lag(id) OVER w, mmr_after - lag(mmr_after) OVER w '
+            'FROM matches_match WHERE user_id = ANY(%s) '
+            'WINDOW w AS (PARTITION BY user_id ORDER BY date, id)', [user_ids]
+        )
+        cursor.execute('ANALYZE')
+    return user_ids
+
+
+def _operations(pages):
+    """ Returns list of (name, function of user ID, queryset of its plan) tuples,
+    pages maps user IDs to PKs of matches on their first page
+    """
+    def page(user_id):
+        return MatchWithPrevData.objects.filter(user_id=user_id)[:MATCHES_PER_PAGE]
+
+    def page_characters(user_id):
+        return Match._characterLinks(pages[user_id], user_id)
+
+    def history(user_id):
+        return MatchWithPrevData.objects.filter(user_id=user_id).values_list(
+            'mmr_after', 'mmr_difference'
+        )
+
+    def match_count(user_id):
+        return Match.objects.filter(user_id=user_id)
+
+    return [
+        ('prev_data_page', lambda user_id: list(page(user_id)), page),
+        ('page_characters', lambda user_id: list(page_characters(user_id)), page_characters),
+        ('prev_data_history', lambda user_id: list(history(user_id)), history),
+        ('match_count', lambda user_id: match_count(user_id).count(), match_count),
+        ('character_stats', _load_stats, None),
+    ]
+
+
+def _partitions_read(queryset):
+    """ Returns number of partitions of match tables in plan of queryset,
+    1 for plain tables
+    """
+    plan = queryset.explain()
+    partitions = set(re.findall(r'\b(?:{}|{})_p\d+\b'.format(
+        partitioning.MATCH_TABLE, partitioning.CHARACTERS_TABLE
+    ), plan))
+    return len(partitions) or 1
+
+
+def _flush():
+    """ Writes out dirty pages of generated and copied rows, so that writing
+    them back does not slow measured queries down; needs superuser or
+    pg_checkpoint role, skipped without them
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CHECKPOINT')
+    except DatabaseError:
+        pass
+
+
+def _measure(user_ids, pages, layout):
+    _flush()
+    results = []
+    for name, function, plan in _operations(pages):
+        # Warm-up run of every user, so all layouts are measured with cache filled
+        for user_id in user_ids:
+            function(user_id)
+        times = []
+        for user_id in user_ids:
+            started = time.perf_counter()
+            function(user_id)
+            times.append(time.perf_counter() - started)
+        result = {'operation': name, 'layout': layout, 'wall_time': _timings(times)}
+        if plan is not None:
+            result['partitions_read'] = _partitions_read(plan(user_ids[0]))
+        results.append(result)
+    return results
+
+
+def run(users=DEFAULT_USERS, matches=DEFAULT_MATCHES, partitions=DEFAULT_PARTITIONS,
+        repeat=DEFAULT_REPEAT, seed_value=0):
+    """ Runs benchmark with `users` users having `matches` matches each,
+    returns JSON-serializable dict of results
+    """
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError('Partitioning benchmark needs PostgreSQL.')
+    if partitioning.partition_count():
+        raise NotSupportedError('Match tables should not be partitioned before benchmark.')
+    timings = {}
+    with transaction.atomic():
+        started = time.perf_counter()
+        user_ids = _seed(users, matches, seed_value)
+        timings['seed'] = time.perf_counter() - started
+        sample = _random.Random(seed_value).sample(user_ids, min(repeat, len(user_ids)))
+        pages = {
+            user_id: list(MatchWithPrevData.objects.filter(user_id=user_id).values_list(
+                'pk', flat=True
+            )[:MATCHES_PER_PAGE]) for user_id in sample
+        }
+        results = _measure(sample, pages, 'plain')
+        started = time.perf_counter()
+        partitioning.partition(partitions)
+        timings['partition'] = time.perf_counter() - started
+        results += _measure(sample, pages, 'partitioned')
+        total = Match.objects.count()
+        transaction.set_rollback(True)
+    return {
+        'revision': _revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'users': users,
+        'matches_per_user': matches,
+        'total_matches': total,
+        'partitions': partitions,
+        'repeat': len(sample),
+        'setup_time': timings,
+        'results': results,
+    }
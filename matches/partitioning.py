@@ -0,0 +1,215 @@
+""" Optional hash partitioning of match tables on PostgreSQL
+
+partition(partitions) rebuilds matches_match and matches_match_characters
+(MatchCharacter) as tables partitioned by hash of user_id, with `partitions`
+partitions each; unpartition() rebuilds them as plain tables. Tables keep
+their names, columns, indexes and constraints, so models,
+matches_prev_match_data view (recreated after rebuild) and migrations adding
+columns or indexes keep working, and queries filtering by user only scan
+one partition of each table.
+
+PostgreSQL needs primary key and unique constraints of partitioned table to
+contain partition key, so primary keys become (id, user_id) and unique
+(match_id, character_id) of characters becomes (match_id, character_id,
+user_id), which is the same as match has one user. Foreign keys referencing
+matches_match (of MatchSequence, RatingSummary and MatchCharacter) need
+unique id, so they are dropped while tables are partitioned; deletes are
+still cascaded by Django.
+
+Tables are locked and copied in single transaction, which takes a while on
+big tables and blocks all access to matches meanwhile.
+"""
+
+from django.apps import apps
+from django.db import NotSupportedError, connection, transaction
+
+from .models import Match, MatchCharacter
+from .schema import CREATE_PREV_MATCH_DATA_VIEW, PREV_MATCH_DATA_VIEW
+
+MATCH_TABLE = Match._meta.db_table
+CHARACTERS_TABLE = MatchCharacter._meta.db_table
+# Partitioned tables with their partition keys
+TABLES = ((MATCH_TABLE, 'user_id'), (CHARACTERS_TABLE, 'user_id'))
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError('Partitioning of match tables needs PostgreSQL.')
+
+
+def partition_count(table=MATCH_TABLE):
+    """ Returns number of partitions of given table, 0 if it is not partitioned
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind, (SELECT COUNT(*) FROM pg_inherits i WHERE i.inhparent = c.oid) "
+            "FROM pg_class c WHERE c.oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+    return row[1] if row is not None and row[0] == 'p' else 0
+
+
+def _constraints(cursor, table):
+    """ Returns list of (name, type, definition) of primary key, unique and
+    foreign key constraints of table
+    """
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f') "
+        "AND conparentid = 0 ORDER BY conname", [table]
+    )
+    return cursor.fetchall()
+
+
+def _indexes(cursor, table):
+    """ Returns list of definitions of indexes of table not backing constraints
+    """
+    cursor.execute(
+        "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = %s::regclass AND NOT EXISTS ("
+        "SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid"
+        ") ORDER BY c.relname", [table]
+    )
+    # Indexes of partitioned table are defined ON ONLY it
+    return [definition.replace(' ON ONLY ', ' ON ', 1) for definition, in cursor.fetchall()]
+
+
+def _drop_references(cursor, table):
+    """ Drops foreign keys of other tables referencing table
+    """
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = %s::regclass AND conrelid <> confrelid "
+        "AND conparentid = 0", [table]
+    )
+    for referencing, name in cursor.fetchall():
+        cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(
+            connection.ops.quote_name(referencing), connection.ops.quote_name(name)
+        ))
+
+
+def _restore_references(model):
+    """ Creates foreign keys of all managed models referencing model
+    """
+    with connection.schema_editor(atomic=False) as schema_editor:
+        for referencing in apps.get_models(include_auto_created=True):
+            if not referencing._meta.managed:
+                continue
+            for field in referencing._meta.local_fields:
+                if field.remote_field is not None and field.remote_field.model is model \
+                        and field.db_constraint:
+                    # Same constraint as the one Django creates along with the field
+                    schema_editor.execute(schema_editor._create_fk_sql(
+                        referencing, field, '_fk_%(to_table)s_%(to_column)s'
+                    ))
+
+
+def _with_key(definition, key, partitions):
+    """ Returns definition of unique constraint with partition key appended
+    to its columns, or with appended key removed if partitions is 0
+    """
+    start, end = definition.index('(') + 1, definition.rindex(')')
+    columns = [column.strip() for column in definition[start:end].split(',')]
+    if partitions and key not in columns:
+        columns.append(key)
+    elif not partitions and columns[-1] == key and len(columns) > 1:
+        columns.pop()
+    return '{}{}{}'.format(definition[:start], ', '.join(columns), definition[end:])
+
+
+def _rebuild(cursor, table, key, partitions):
+    """ Rebuilds table with its data, indexes and constraints, partitioned
+    by hash of key if partitions is not 0
+    """
+    quote = connection.ops.quote_name
+    new_table = '{}_rebuilt'.format(table)
+    constraints = _constraints(cursor, table)
+    indexes = _indexes(cursor, table)
+    cursor.execute(
+        "SELECT a.attidentity <> '', pg_get_serial_sequence(%s, 'id') FROM pg_attribute a "
+        "WHERE a.attrelid = %s::regclass AND a.attname = 'id'", [table, table]
+    )
+    identity, sequence = cursor.fetchone()
+
+    cursor.execute(
+        'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY){}'.format(
+            quote(new_table), quote(table),
+            ' PARTITION BY HASH ({})'.format(quote(key)) if partitions else ''
+        )
+    )
+    for remainder in range(partitions):
+        cursor.execute(
+            'CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {:d}, REMAINDER {:d})'.format(
+                quote('{}_p{}'.format(table, remainder)), quote(new_table), partitions, remainder
+            )
+        )
+    cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(quote(new_table), quote(table)))
+    if not identity and sequence:
+        # Serial column, sequence would be dropped along with old table
+        cursor.execute('ALTER SEQUENCE {} OWNED BY {}.id'.format(sequence, quote(new_table)))
+    cursor.execute('DROP TABLE {}'.format(quote(table)))
+    cursor.execute('ALTER TABLE {} RENAME TO {}'.format(quote(new_table), quote(table)))
+    if identity:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        new_sequence, = cursor.fetchone()
+        cursor.execute('ALTER SEQUENCE {} RENAME TO {}'.format(
+            new_sequence, quote(sequence.split('.')[-1].strip('"'))
+        ))
+        cursor.execute(
+            'SELECT setval(pg_get_serial_sequence(%s, \'id\'), COALESCE(MAX(id), 0) + 1, false) '
+            'FROM {}'.format(quote(table)), [table]
+        )
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = 'PRIMARY KEY (id{})'.format(', ' + quote(key) if partitions else '')
+        elif kind == 'u':
+            definition = _with_key(definition, key, partitions)
+        cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(
+            quote(table), quote(name), definition
+        ))
+    for definition in indexes:
+        cursor.execute(definition)
+    cursor.execute('ANALYZE {}'.format(quote(table)))
+
+
+def _rebuild_all(partitions):
+    _check_vendor()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(
+            ', '.join(connection.ops.quote_name(table) for table, _ in TABLES)
+        ))
+        # Tables with pending checks of deferred foreign keys cannot be altered
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute('DROP VIEW IF EXISTS {}'.format(PREV_MATCH_DATA_VIEW))
+        _drop_references(cursor, MATCH_TABLE)
+        for table, key in TABLES:
+            _rebuild(cursor, table, key, partitions)
+        if not partitions:
+            _restore_references(Match)
+        cursor.execute(CREATE_PREV_MATCH_DATA_VIEW)
+        # Django creates foreign keys initially deferred
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def partition(partitions):
+    """ Rebuilds match tables partitioned into given number of partitions
+    """
+    if partitions < 1:
+        raise ValueError('Number of partitions should be positive.')
+    _check_vendor()
+    if partition_count():
+        raise NotSupportedError('Match tables are partitioned already.')
+    _rebuild_all(partitions)
+
+
+def unpartition():
+    """ Rebuilds match tables as plain tables
+    """
+    _check_vendor()
+    if not partition_count():
+        raise NotSupportedError('Match tables are not partitioned.')
+    _rebuild_all(0)
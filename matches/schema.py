@@ -0,0 +1,78 @@
+""" Database views of matches app, shared by migrations
+
+matches_prev_match_data joins every match with its MatchSequence row. It
+is plain SQL understood by every supported database, but SQLite checks
+views when it renames tables, so migrations which make SQLite remake
+matches_match or matches_matchsequence (most of AlterField, some of
+AddField) have to be wrapped with sqlite_remaking(). PostgreSQL expands
+m.* when view is created, so migrations adding columns to matches_match
+have to be wrapped with recreating_view(). create_or_replace_view() creates
+views with the same DDL on every database, SQLite lacking CREATE OR REPLACE.
+"""
+
+from django.db import migrations
+
+PREV_MATCH_DATA_VIEW = 'matches_prev_match_data'
+
+CREATE_PREV_MATCH_DATA_VIEW = """
+CREATE VIEW matches_prev_match_data AS
+SELECT m.*, s.last_match_id, s.mmr_difference, s.sequence AS match_order
+FROM matches_match m
+LEFT JOIN matches_matchsequence s ON s.match_id = m.id
+"""
+
+
+def _drop_view_on_sqlite(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP VIEW IF EXISTS {}'.format(PREV_MATCH_DATA_VIEW))
+
+
+def _create_view_on_sqlite(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_PREV_MATCH_DATA_VIEW)
+
+
+def sqlite_remaking(*operations):
+    """ Returns list of given migration operations preceded by dropping
+    matches_prev_match_data view and followed by creating it again on SQLite
+    (both ways), other databases run operations only
+    """
+    return [
+        migrations.RunPython(_drop_view_on_sqlite, _create_view_on_sqlite),
+        *operations,
+        migrations.RunPython(_create_view_on_sqlite, _drop_view_on_sqlite),
+    ]
+
+
+def _drop_view(apps, schema_editor):
+    schema_editor.execute('DROP VIEW IF EXISTS {}'.format(PREV_MATCH_DATA_VIEW))
+
+
+def _create_view(apps, schema_editor):
+    schema_editor.execute(CREATE_PREV_MATCH_DATA_VIEW)
+
+
+def recreating_view(*operations):
+    """ Returns list of given migration operations preceded by dropping
+    matches_prev_match_data view and followed by creating it again on every
+    database (both ways), so view has all columns of matches_match
+    """
+    return [
+        migrations.RunPython(_drop_view, _create_view),
+        *operations,
+        migrations.RunPython(_create_view, _drop_view),
+    ]
+
+
+def create_or_replace_view(name, query):
+    """ Returns migration operation creating view of given name and SELECT
+    query, replacing view of that name; SQLite has no CREATE OR REPLACE
+    VIEW, so view is dropped there first
+    """
+    def create(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute('DROP VIEW IF EXISTS {}'.format(name))
+            schema_editor.execute('CREATE VIEW {} AS {}'.format(name, query))
+        else:
+            schema_editor.execute('CREATE OR REPLACE VIEW {} AS {}'.format(name, query))
+    return migrations.RunPython(create)
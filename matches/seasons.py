@@ -0,0 +1,38 @@
+""" Filtering of match histories by ?season= query parameter
+
+Value is ID of a season or `current` for season of current time (which
+means matches played before first season while there is none). Filtered
+queries are served by the (user, season, date, id) index of matches, see
+Match.Meta.indexes, so they read only rows of that season.
+"""
+
+from django.utils import timezone
+
+from .models import Season
+
+PARAM = 'season'
+CURRENT = 'current'
+
+
+class InvalidSeason(ValueError):
+    """ Raised when season passed by client is neither ID nor `current`
+    """
+
+    def __init__(self):
+        super().__init__('Season should be ID of a season or "{}".'.format(CURRENT))
+        self.param = PARAM
+
+
+def season_lookups(params):
+    """ Returns dict of field lookups filtering matches by season in params
+    (query dict), empty dict if it is not given
+    """
+    value = params.get(PARAM)
+    if not value:
+        return {}
+    if value == CURRENT:
+        return {'season_id': Season.idAt(timezone.now())}
+    try:
+        return {'season_id': int(value)}
+    except ValueError:
+        raise InvalidSeason()
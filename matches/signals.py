@@ -0,0 +1,209 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete, m2m_changed
+)
+from django.dispatch import receiver
+
+from .analytics import invalidate_character_stats
+from .models import (
+    Match, MatchCharacter, MatchDataVersion, MatchSequence, RatingSummary, Season,
+    SeasonsVersion, history_changed
+)
+
+# Positions of earliest changes of users' histories, collected while
+# maintenance is deferred
+_deferred_changes = ContextVar('deferred_changes', default=None)
+# IDs of users being deleted, whose histories need no maintenance
+_deleted_users = ContextVar('deleted_users', default=frozenset())
+
+@contextmanager
+def deferred_maintenance():
+    """ Defers maintenance of histories changed by saving and deleting
+    matches inside the block
+
+    Instead of refreshing history after every saved or deleted match, history
+    of every changed user is refreshed once, from earliest change, when block
+    exits; then history_changed is sent for every such user. Meant for batch
+    operations running in a transaction.
+    """
+    if _deferred_changes.get() is not None:
+        # Outer block will do the maintenance
+        yield
+        return
+    changes = {}
+    token = _deferred_changes.set(changes)
+    try:
+        yield
+    finally:
+        _deferred_changes.reset(token)
+    with transaction.atomic():
+        for user_id, (date, pk) in sorted(changes.items()):
+            MatchSequence.refreshFrom(user_id, date, pk, stop_early=False)
+            history_changed.send(sender=Match, user_id=user_id, appended=None)
+
+def defer_change(user_id, date, pk):
+    """ Records change of user's history at position (date, pk) if maintenance
+    is deferred, returns whether it is; history of user being deleted is
+    never maintained, as it is deleted along with them
+    """
+    if user_id in _deleted_users.get():
+        return True
+    changes = _deferred_changes.get()
+    if changes is None:
+        return False
+    if user_id not in changes or (date, pk) < changes[user_id]:
+        changes[user_id] = (date, pk)
+    return True
+
+@receiver(pre_save, sender=Match)
+def remember_match_position(sender, instance, **kwargs):
+    """ Stores position of edited match before save, so history can be
+    renumbered from there if it has moved
+    """
+    instance._previous_position = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_position = Match.objects.filter(
+            pk=instance.pk
+        ).values_list('user_id', 'date').first()
+
+@receiver(post_save, sender=Match)
+def move_match_characters(sender, instance, created, raw=False, **kwargs):
+    """ Moves characters of match given to another user along with it
+    """
+    previous = getattr(instance, '_previous_position', None)
+    if previous is not None and previous[0] != instance.user_id:
+        MatchCharacter.objects.filter(match_id=instance.pk).update(user_id=instance.user_id)
+
+@receiver(post_save, sender=Match)
+def update_match_sequence(sender, instance, created, raw=False, **kwargs):
+    """ Keeps MatchSequence up to date after match is created or edited
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_position', None)
+    if defer_change(instance.user_id, instance.date, instance.pk):
+        if previous is not None:
+            defer_change(previous[0], previous[1], instance.pk)
+        return
+    with transaction.atomic():
+        date = instance.date
+        if previous is not None and previous != (instance.user_id, instance.date):
+            previous_user_id, previous_date = previous
+            if previous_user_id != instance.user_id:
+                MatchSequence.refreshFrom(previous_user_id, previous_date, instance.pk)
+                history_changed.send(sender=Match, user_id=previous_user_id, appended=None)
+            else:
+                # Single walk from the earlier of both positions covers the move
+                date = min(date, previous_date)
+        appended = MatchSequence.refreshFrom(instance.user_id, date, instance.pk)
+        history_changed.send(
+            sender=Match, user_id=instance.user_id, appended=appended if created else None
+        )
+
+@receiver(post_delete, sender=Match)
+def remove_match_from_sequence(sender, instance, **kwargs):
+    """ Renumbers matches following deleted one
+    """
+    if defer_change(instance.user_id, instance.date, instance.pk):
+        return
+    with transaction.atomic():
+        MatchSequence.refreshFrom(instance.user_id, instance.date, instance.pk)
+        history_changed.send(sender=Match, user_id=instance.user_id, appended=None)
+
+@receiver(history_changed)
+def update_rating_summary(sender, user_id, appended, **kwargs):
+    """ Applies matches added at the end of history to user's RatingSummary,
+    recomputes it after any other change
+    """
+    if appended is None:
+        RatingSummary.rebuild(user_id)
+    elif appended:
+        RatingSummary.append(user_id, appended)
+
+@receiver(pre_delete, sender=Season)
+def remember_season_users(sender, instance, **kwargs):
+    """ Stores users having matches in deleted season, which deletion
+    takes out of it before their matches can be reassigned
+    """
+    instance._user_ids = set(Match.objects.filter(season=instance).values_list(
+        'user_id', flat=True
+    ).distinct())
+
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+def reassign_seasons(sender, instance, raw=False, **kwargs):
+    """ Moves matches to seasons of their dates after seasons have changed
+    and refreshes histories of their users, whose previous-match chains and
+    summaries now reset elsewhere
+    """
+    if raw:
+        return
+    with transaction.atomic():
+        user_ids = Season.reassignMatches() | getattr(instance, '_user_ids', set())
+        for user_id in sorted(user_ids):
+            MatchSequence.rebuild(user_id)
+            history_changed.send(sender=Match, user_id=user_id, appended=None)
+
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+def bump_seasons_version(sender, **kwargs):
+    """ Marks Season data as changed, even when no match has moved
+    """
+    SeasonsVersion.bump()
+
+@receiver(history_changed)
+def bump_match_data_version(sender, user_id, **kwargs):
+    """ Marks user's match data as changed, in the same transaction as change
+    """
+    MatchDataVersion.bump(user_id)
+
+@receiver(history_changed)
+def drop_cached_stats(sender, user_id, **kwargs):
+    """ Drops cached statistics of user whose history has changed, once
+    change is committed
+    """
+    transaction.on_commit(lambda: invalidate_character_stats(user_id))
+
+@receiver(m2m_changed, sender=Match.characters.through)
+def match_characters_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Marks match data of users whose matches' characters have changed
+    as changed and drops their cached statistics
+    """
+    if reverse:
+        # Matches of a character have changed
+        if action == 'pre_clear':
+            matches = Match.objects.filter(characters=instance)
+        elif action in ('post_add', 'post_remove'):
+            matches = Match.objects.filter(pk__in=pk_set)
+        else:
+            return
+        user_ids = matches.values_list('user_id', flat=True).distinct()
+    elif action.startswith('post_'):
+        user_ids = [instance.user_id]
+    else:
+        return
+    for user_id in set(user_ids):
+        MatchDataVersion.bump(user_id)
+        transaction.on_commit(partial(invalidate_character_stats, user_id))
+
+@receiver(pre_delete, sender=User)
+def remove_rating_summary(sender, instance, **kwargs):
+    """ Removes user from histogram of current MMR along with their summary,
+    which cascade would delete without updating it, and skips maintenance
+    of history while cascade deletes their matches one by one
+    """
+    RatingSummary.remove(instance.pk)
+    _deleted_users.set(_deleted_users.get() | {instance.pk})
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    """ Ends deletion of user started in remove_rating_summary and drops
+    their cached statistics once it is committed
+    """
+    _deleted_users.set(_deleted_users.get() - {instance.pk})
+    transaction.on_commit(partial(invalidate_character_stats, instance.pk))
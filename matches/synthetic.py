@@ -0,0 +1,90 @@
+""" Generator of synthetic match histories, for benchmarks and load tests
+
+Users, matches and their characters are written with bulk INSERTs, then
+MatchSequence of every user is rebuilt once and history_changed is sent, so
+generated data looks the same as data entered through views.
+"""
+
+import random as _random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from characters.models import Character
+from .models import Match, MatchCharacter, MatchSequence, history_changed
+
+BATCH_SIZE = 5000
+MATCH_INTERVAL = timedelta(hours=2)
+
+
+def ensure_characters(count):
+    """ Returns list of at least `count` characters, creating missing ones
+    """
+    characters = list(Character.objects.order_by('pk'))
+    roles = [role for role, _ in Character.ROLE_CHOICES]
+    for number in range(len(characters), count):
+        character = Character(name='Synthetic {}'.format(number + 1), role=roles[number % len(roles)])
+        character.save()
+        characters.append(character)
+    return characters
+
+
+def _history(user, matches, characters, per_match, end, rng):
+    """ Yields (Match, characters) pairs of random walk of user's MMR ending at `end`
+    """
+    mmr = rng.randint(1500, 3500)
+    date = end - MATCH_INTERVAL * matches
+    for _ in range(matches):
+        mmr = min(max(mmr + rng.choice((-1, 1)) * rng.randint(15, 35), 0), 5000)
+        date += MATCH_INTERVAL
+        yield Match(user=user, date=date, mmr_after=mmr), rng.sample(characters, per_match)
+
+
+def seed_user(user, matches, characters, per_match, end=None, rng=None):
+    """ Creates `matches` matches of given user, with `per_match` characters
+    chosen from `characters` each, played every MATCH_INTERVAL until `end`
+    """
+    rng = rng or _random.Random()
+    end = end or timezone.now()
+    history = _history(user, matches, characters, per_match, end, rng)
+    with transaction.atomic():
+        while True:
+            batch = [pair for _, pair in zip(range(BATCH_SIZE), history)]
+            if not batch:
+                break
+            created = Match.objects.bulk_create([match for match, _ in batch])
+            MatchCharacter.objects.bulk_create([
+                MatchCharacter(match_id=match.pk, character_id=character.pk, user_id=user.pk)
+                for match, (_, chosen) in zip(created, batch)
+                for character in chosen
+            ])
+        MatchSequence.rebuild(user.pk)
+        history_changed.send(sender=Match, user_id=user.pk, appended=None)
+
+
+def seed(users, matches, per_match, prefix='synthetic', seed=None):
+    """ Creates `users` users with `matches` matches and `per_match`
+    characters per match each, returns list of created users
+
+    Usernames start with prefix and random token, so seeding can be repeated.
+    seed makes generated histories reproducible.
+    """
+    rng = _random.Random(seed)
+    characters = ensure_characters(per_match)
+    token = uuid.uuid4().hex[:8]
+    created = User.objects.bulk_create([
+        User(username='{}-{}-{}'.format(prefix, token, number), password='!')
+        for number in range(users)
+    ])
+    if not all(user.pk for user in created):
+        # Backend does not return primary keys of bulk inserted rows
+        created = list(User.objects.filter(
+            username__startswith='{}-{}-'.format(prefix, token)
+        ).order_by('pk'))
+    end = timezone.now()
+    for user in created:
+        seed_user(user, matches, characters, per_match, end, rng)
+    return created
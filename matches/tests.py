@@ -1,10 +1,34 @@
-from django.test import TestCase, Client
+import json
+import re
+import unittest
+import warnings
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.test import AsyncClient, TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.db import NotSupportedError, connection
 from django.forms import ModelForm
 
+from api import bulk_import
 from characters.models import Character
-from .models import Match, MatchWithPrevData
+from . import benchmark, leaderboard, partition_benchmark, partitioning, timeseries
+from .daterange import InvalidDateRange, date_lookups
+from .seasons import InvalidSeason, season_lookups
+from .analytics import character_stats
+from .models import (
+    Match, MatchCharacter, MatchDataVersion, MatchSequence, MatchWithPrevData, MmrBucket,
+    RatingSummary, Season
+)
 from .forms import MatchForm
+from .pagination import encode_cursor
+from .views import MATCHES_PER_PAGE
 
 def _createSampleData(self):
     self.users = [
@@ -91,6 +115,506 @@ class MatchWithPrevDataModelTest(TestCase):
         self.assertEqual(self.withPrevData[3].mmrDifference(), -1000)
 
 
+class MatchSequenceTest(TestCase):
+    """
+    Tests maintenance of MatchSequence table on Match inserts, edits and deletes
+    """
+    def setUp(self):
+        _createSampleData(self)
+
+    def assertSequence(self, user, expected):
+        """ Checks that stored sequence of user's matches equals expected
+        list of (match, mmr_difference), is read through MatchWithPrevData
+        and agrees with full recomputation
+        """
+        def stored():
+            return list(
+                MatchSequence.objects.filter(user=user).order_by('sequence').values_list(
+                    'match_id', 'sequence', 'last_match_id', 'mmr_difference'
+                )
+            )
+        expected_rows = [
+            (
+                m.pk,
+                i + 1,
+                expected[i - 1][0].pk if i > 0 else None,
+                difference
+            ) for i, (m, difference) in enumerate(expected)
+        ]
+        self.assertEqual(stored(), expected_rows)
+        self.assertEqual(MatchSequence.computed(user.pk), expected_rows)
+        self.assertEqual(list(
+            MatchWithPrevData.objects.filter(user=user).order_by('date', 'id').values_list(
+                'pk', 'match_order', 'last_match_id', 'mmr_difference'
+            )
+        ), expected_rows)
+        MatchSequence.rebuild(user.pk)
+        self.assertEqual(stored(), expected_rows, 'Rebuild should not change anything')
+
+    def testSequenceOnInsert(self):
+        """ Matches appended to history should be numbered in order
+        """
+        self.assertSequence(self.users[0], [(self.matches[0], None), (self.matches[1], 1000)])
+        self.assertSequence(self.users[1], [(self.matches[2], None), (self.matches[3], -1000)])
+        self.assertSequence(self.users[2], [])
+
+    def testInsertInTheMiddle(self):
+        """ Match inserted between other matches should fix up the following one
+        """
+        match = Match(mmr_after=2500, user=self.users[0])
+        match.save()
+        match.date = self.matches[0].date + (self.matches[1].date - self.matches[0].date) / 2
+        match.save()
+        self.assertSequence(self.users[0], [
+            (self.matches[0], None), (match, 500), (self.matches[1], 500)
+        ])
+
+    def testEditingMmr(self):
+        """ Editing MMR should update difference of edited and following match
+        """
+        self.matches[0].mmr_after = 2200
+        self.matches[0].save()
+        self.assertSequence(self.users[0], [(self.matches[0], None), (self.matches[1], 800)])
+
+    def testDeletingMatch(self):
+        """ Deleting match from the middle should renumber following matches
+        """
+        match = Match(mmr_after=3300, user=self.users[0])
+        match.save()
+        self.matches[1].delete()
+        self.assertSequence(self.users[0], [(self.matches[0], None), (match, 1300)])
+        self.matches[0].delete()
+        self.assertSequence(self.users[0], [(match, None)])
+
+    def testMatchesWithTheSameDate(self):
+        """ Matches played at the same time should be ordered by ID
+        """
+        match = Match(mmr_after=3100, user=self.users[1])
+        match.save()
+        match.date = self.matches[3].date
+        match.save()
+        self.assertSequence(self.users[1], [
+            (self.matches[2], None), (self.matches[3], -1000), (match, 1100)
+        ])
+        withPrevData = MatchWithPrevData.objects.get(pk=match.pk)
+        self.assertEqual(withPrevData.previousMatch().pk, self.matches[3].pk)
+        self.assertEqual(withPrevData.match_order, 3)
+
+    def testShuffledHistory(self):
+        """ Matches added, moved and removed in random order should keep
+        sequence equal to one computed from Match table
+        """
+        generator = np.random.default_rng(0)
+        user = self.users[2]
+        start = self.matches[0].date
+        matches = []
+        for _ in range(30):
+            match = Match(mmr_after=int(generator.integers(1000, 4000)), user=user)
+            match.save()
+            match.date = start + timedelta(minutes=int(generator.integers(0, 20)))
+            match.save()
+            matches.append(match)
+        for match in matches[::4]:
+            match.delete()
+        for match in matches[1::4]:
+            match.mmr_after += 10
+            match.save()
+        rows = MatchSequence.computed(user.pk)
+        self.assertEqual(len(rows), len(matches) - len(matches[::4]))
+        self.assertEqual(list(
+            MatchWithPrevData.objects.filter(user=user).order_by('date', 'id').values_list(
+                'pk', 'match_order', 'last_match_id', 'mmr_difference'
+            )
+        ), rows)
+
+    def testMovingMatchToAnotherUser(self):
+        """ Changing owner of a match should update histories of both users
+        """
+        self.matches[0].user = self.users[1]
+        self.matches[0].save()
+        self.assertSequence(self.users[0], [(self.matches[1], None)])
+        self.assertSequence(self.users[1], [
+            (self.matches[0], None), (self.matches[2], 1000), (self.matches[3], -1000)
+        ])
+        self.assertEqual(
+            list(MatchCharacter.objects.filter(match=self.matches[0]).values_list('user', flat=True)),
+            [self.users[1].pk]
+        )
+
+
+class RatingSummaryTest(TestCase):
+    """
+    Tests maintenance of RatingSummary on changes of history
+    """
+    def setUp(self):
+        _createSampleData(self)
+
+    def summary(self, user):
+        return RatingSummary.objects.filter(user=user).values_list(
+            'current_mmr', 'peak_mmr', 'lowest_mmr', 'wins', 'losses', 'draws',
+            'streak', 'last_match'
+        ).first()
+
+    def assertSummary(self, user, expected):
+        """ Checks summary of user and that it agrees with full recomputation
+        """
+        self.assertEqual(self.summary(user), expected)
+        RatingSummary.rebuild(user.pk)
+        self.assertEqual(self.summary(user), expected, 'Rebuild should not change anything')
+
+    def addMatch(self, user, mmr_after):
+        match = Match(mmr_after=mmr_after, user=user)
+        match.save()
+        return match
+
+    def testSummaryOfSampleData(self):
+        """ Summary should describe history of each user
+        """
+        self.assertSummary(self.users[0], (3000, 3000, 2000, 1, 0, 0, 1, self.matches[1].pk))
+        self.assertSummary(self.users[1], (2000, 3000, 2000, 0, 1, 0, -1, self.matches[3].pk))
+        self.assertIsNone(self.summary(self.users[2]))
+
+    def testStreaks(self):
+        """ Streak should count consecutive wins or losses, draw should reset it
+        """
+        self.addMatch(self.users[0], 3100)
+        last = self.addMatch(self.users[0], 3200)
+        self.assertSummary(self.users[0], (3200, 3200, 2000, 3, 0, 0, 3, last.pk))
+        last = self.addMatch(self.users[0], 3200)
+        self.assertSummary(self.users[0], (3200, 3200, 2000, 3, 0, 1, 0, last.pk))
+        self.addMatch(self.users[0], 1900)
+        last = self.addMatch(self.users[0], 1800)
+        self.assertSummary(self.users[0], (1800, 3200, 1800, 3, 2, 1, -2, last.pk))
+
+    def testEditingAndDeletingMatches(self):
+        """ Editing or deleting match should recompute whole summary
+        """
+        self.matches[1].mmr_after = 1000
+        self.matches[1].save()
+        self.assertSummary(self.users[0], (1000, 2000, 1000, 0, 1, 0, -1, self.matches[1].pk))
+        self.matches[1].delete()
+        self.assertSummary(self.users[0], (2000, 2000, 2000, 0, 0, 0, 0, self.matches[0].pk))
+        self.matches[0].delete()
+        self.assertIsNone(self.summary(self.users[0]))
+        self.assertIsNone(Match.lastMatch(self.users[0]))
+
+    def testDeletingUser(self):
+        """ Deleting user should delete their matches and summary
+        """
+        user_pk = self.users[0].pk
+        self.users[0].delete()
+        self.assertFalse(Match.objects.filter(user=user_pk).exists())
+        self.assertIsNone(self.summary(user_pk))
+        self.assertSummary(self.users[1], (2000, 3000, 2000, 0, 1, 0, -1, self.matches[3].pk))
+
+    def testDeletingUserSkipsMaintenance(self):
+        """ Deleting user should not maintain history of each of their deleted
+        matches, so it should take the same queries whatever their number
+        """
+        counts = []
+        for matches in (3, 30):
+            user = User.objects.create_user('deleted{}'.format(matches))
+            for mmr in range(matches):
+                self.addMatch(user, 2000 + mmr)
+            with CaptureQueriesContext(connection) as queries, \
+                    self.captureOnCommitCallbacks() as callbacks:
+                user.delete()
+            counts.append(len(queries))
+            self.assertEqual(len(callbacks), 1)
+            self.assertFalse(MatchDataVersion.objects.filter(user_id=user.pk).exists())
+            self.assertFalse(MatchSequence.objects.filter(user_id=user.pk).exists())
+        self.assertEqual(counts[0], counts[1])
+        match = self.addMatch(self.users[1], 2500)
+        self.assertEqual(MatchSequence.objects.get(match=match).sequence, 3)
+
+    def testLastMatchIsReadFromSummary(self):
+        """ lastMatch should not depend on length of history
+        """
+        for mmr in range(20):
+            self.addMatch(self.users[1], mmr)
+        with self.assertNumQueries(1):
+            self.assertEqual(Match.lastMatch(self.users[1]).mmr_after, 19)
+        with self.assertNumQueries(1):
+            self.assertEqual(MatchWithPrevData.lastMatch(self.users[1]).mmr_after, 19)
+
+
+class LeaderboardTest(TestCase):
+    """
+    Tests histogram of current MMR, percentiles and leaderboard
+    """
+    def setUp(self):
+        cache.clear()
+        _createSampleData(self)
+
+    def tearDown(self):
+        cache.clear()
+
+    def assertHistogram(self):
+        """ Checks that histogram agrees with current MMR of all users
+        """
+        buckets = dict(MmrBucket.objects.values_list('mmr_from', 'players'))
+        # Emptied ranges are kept with no players
+        expected = dict.fromkeys(buckets, 0)
+        for mmr in RatingSummary.objects.values_list('current_mmr', flat=True):
+            expected[MmrBucket.of(mmr)] = expected.get(MmrBucket.of(mmr), 0) + 1
+        self.assertEqual(buckets, expected)
+
+    def testHistogramFollowsHistories(self):
+        """ Histogram should be updated on every change of users' last matches
+        """
+        self.assertEqual(leaderboard.histogram(), [(3000, 1), (2000, 1)])
+        cache.clear()
+        Match(user=self.users[2], mmr_after=2005).save()
+        Match(user=self.users[2], mmr_after=2504).save()
+        self.assertHistogram()
+        self.matches[1].mmr_after = 1500
+        self.matches[1].save()
+        self.assertHistogram()
+        self.matches[3].delete()
+        self.assertHistogram()
+        self.matches[2].delete()
+        self.assertHistogram()
+        self.users[0].delete()
+        self.assertHistogram()
+        self.assertEqual(leaderboard.histogram(), [(2500, 1)])
+
+    def testPercentile(self):
+        """ Share of players with the same or higher MMR should be
+        interpolated within range, counting user in
+        """
+        for mmr in (2009, 2500, 4000):
+            user = User.objects.create_user('player{}'.format(mmr))
+            Match(user=user, mmr_after=mmr).save()
+        self.assertEqual(leaderboard.percentile(4000), {'players': 5, 'top_percent': 20.0})
+        self.assertEqual(leaderboard.percentile(3000), {'players': 5, 'top_percent': 40.0})
+        self.assertEqual(leaderboard.percentile(2000), {'players': 5, 'top_percent': 100.0})
+        self.assertEqual(leaderboard.percentile(2005), {'players': 5, 'top_percent': 80.0})
+        self.assertEqual(leaderboard.percentile(None), {'players': 5, 'top_percent': None})
+        with self.assertNumQueries(0):
+            leaderboard.percentile(2500)
+
+    def testLeaderboard(self):
+        """ Players should be ranked by current MMR, equal MMR sharing
+        rank, with single query
+        """
+        user = User.objects.create_user('tied')
+        Match(user=user, mmr_after=2000).save()
+        with self.assertNumQueries(1):
+            self.assertEqual(leaderboard.leaderboard(), [
+                {'rank': 1, 'username': 'jimlahey', 'mmr': 3000},
+                {'rank': 2, 'username': 'randy', 'mmr': 2000},
+                {'rank': 2, 'username': 'tied', 'mmr': 2000},
+            ])
+        with self.assertNumQueries(0):
+            leaderboard.leaderboard()
+
+
+class CharacterStatsTest(TestCase):
+    """
+    Tests per character and per role statistics
+    """
+    def setUp(self):
+        _createSampleData(self)
+
+    def stats(self, user):
+        stats = character_stats(user.pk)
+        return (
+            {c['name']: (c['games'], c['wins'], c['losses'], c['mmr_difference']) for c in stats['characters']},
+            {r['role']: (r['games'], r['wins'], r['losses'], r['win_rate']) for r in stats['roles']},
+        )
+
+    def testStats(self):
+        """ Stats should aggregate MMR differences of matches by character and role
+        """
+        characters, roles = self.stats(self.users[1])
+        self.assertEqual(characters, {'char1': (2, 0, 1, -1000), 'char2': (1, 0, 1, -1000)})
+        self.assertEqual(roles[Character.SUPPORT], (2, 0, 1, 0.0))
+        self.assertEqual(roles[Character.DAMAGE], (1, 0, 1, 0.0))
+        self.assertEqual(roles[Character.TANK], (0, 0, 0, None))
+
+    def testMatchCountsOnceForRole(self):
+        """ Match played on several characters of one role should count once
+        in stats of the role, and once for every character
+        """
+        char3 = Character(name='char3', role=Character.DAMAGE)
+        char3.save()
+        match = Match(mmr_after=2050, user=self.users[1])
+        match.save()
+        match.characters.set([self.characters[1], char3])
+        characters, roles = self.stats(self.users[1])
+        self.assertEqual(characters['char2'], (2, 1, 1, -950))
+        self.assertEqual(characters['char3'], (1, 1, 0, 50))
+        self.assertEqual(roles[Character.DAMAGE], (2, 1, 1, 0.5))
+        self.assertEqual(roles[Character.SUPPORT], (2, 0, 1, 0.0))
+        damage, = [r for r in character_stats(self.users[1].pk)['roles'] if r['role'] == Character.DAMAGE]
+        self.assertEqual(damage['mmr_difference'], -950)
+
+    def testStatsAreCachedUntilHistoryChanges(self):
+        """ Stats should be served from cache until user's matches change
+        """
+        self.stats(self.users[0])
+        with self.assertNumQueries(0):
+            characters, _ = self.stats(self.users[0])
+        self.assertEqual(characters, {'char1': (1, 0, 0, 0), 'char2': (1, 1, 0, 1000)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            match = Match(mmr_after=3500, user=self.users[0])
+            match.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            match.characters.set([self.characters[1]])
+        characters, _ = self.stats(self.users[0])
+        self.assertEqual(characters, {'char1': (1, 0, 0, 0), 'char2': (2, 2, 0, 1500)})
+
+
+class TimeSeriesTest(TestCase):
+    """
+    Tests statistics of MMR history
+    """
+    def setUp(self):
+        self.timestamps = np.array([0.0, 86400.0, 2 * 86400.0, 3 * 86400.0, 4 * 86400.0])
+        self.mmr = np.array([2000.0, 2100.0, 2050.0, 2050.0, 2200.0])
+
+    def testRollingStatistics(self):
+        """ Rolling statistics should cover last `window` matches
+        """
+        statistics = timeseries.compute_statistics(self.timestamps, self.mmr, window=2)
+        series = statistics['series']
+        np.testing.assert_allclose(series['rolling_mean'], [2000, 2050, 2075, 2050, 2125])
+        np.testing.assert_allclose(series['rolling_volatility'][1:], [0, 75, 25, 75])
+        self.assertTrue(np.isnan(series['rolling_volatility'][0]))
+        np.testing.assert_allclose(series['drawdown'], [0, 0, -50, -50, 0])
+        # Wins among last 2 decided matches, smoothed: (1 + 1) / (1 + 2)
+        self.assertAlmostEqual(statistics['current']['win_probability'], 2 / 3)
+        self.assertEqual(statistics['max_drawdown'], -50)
+
+    def testTrend(self):
+        """ Trend should be least squares slope of MMR per match and per day
+        """
+        trend = timeseries.compute_statistics(self.timestamps, self.mmr)['trend']
+        self.assertAlmostEqual(trend['per_match'], 35.0)
+        self.assertAlmostEqual(trend['per_day'], 35.0)
+
+    def testEmptyAndSingleMatchHistory(self):
+        """ Statistics of short histories should be empty instead of failing
+        """
+        empty = np.array([])
+        self.assertIsNone(timeseries.compute_statistics(empty, empty)['current'])
+        statistics = timeseries.compute_statistics(self.timestamps[:1], self.mmr[:1])
+        self.assertIsNone(statistics['current']['rolling_volatility'])
+        self.assertEqual(statistics['trend'], {'per_match': 0.0, 'per_day': 0.0})
+
+    def testLoadSeries(self):
+        """ Series should hold user's matches, oldest first
+        """
+        _createSampleData(self)
+        timestamps, mmr = timeseries.load_series(self.users[1].pk)
+        self.assertEqual(mmr.tolist(), [3000.0, 2000.0])
+        self.assertTrue((np.diff(timestamps) >= 0).all())
+
+    def testLargeHistory(self):
+        """ Statistics of 100000 matches should match ones computed directly
+        from last window (latency is measured by benchmark_matches)
+        """
+        rng = np.random.RandomState(0)
+        timestamps = np.cumsum(rng.uniform(600, 86400, 100000))
+        mmr = 2500 + np.cumsum(rng.randint(-30, 31, 100000)).astype(np.float64)
+        statistics = timeseries.compute_statistics(timestamps, mmr)
+        window = statistics['window']
+        self.assertEqual(statistics['current']['mmr'], mmr[-1])
+        self.assertAlmostEqual(statistics['current']['rolling_mean'], mmr[-window:].mean())
+        self.assertAlmostEqual(
+            statistics['current']['rolling_volatility'], np.diff(mmr)[-window:].std()
+        )
+        self.assertEqual(statistics['max_drawdown'], (mmr - np.maximum.accumulate(mmr)).min())
+        self.assertEqual(len(statistics['series']['rolling_mean']), 100000)
+
+
+class DownsamplingTest(TestCase):
+    """
+    Tests downsampling of MMR history for charts
+    """
+    def testLttbKeepsExtremes(self):
+        """ LTTB should keep first and last point and peaks of series
+        """
+        x = np.arange(100, dtype=np.float64)
+        y = np.full(100, 2000.0)
+        y[37] = 3000.0
+        y[71] = 1000.0
+        selected = timeseries.lttb(x, y, 10)
+        self.assertEqual(len(selected), 10)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 99)
+        self.assertIn(37, selected)
+        self.assertIn(71, selected)
+        self.assertTrue((np.diff(selected) > 0).all())
+
+    def testLttbShortSeries(self):
+        """ Series not longer than threshold should be returned whole
+        """
+        x = np.arange(5, dtype=np.float64)
+        self.assertEqual(timeseries.lttb(x, x, 5).tolist(), [0, 1, 2, 3, 4])
+
+    def testBuckets(self):
+        """ Buckets should hold min, max and close of each week, starting on Monday
+        """
+        day = 86400.0
+        # 1970-01-05 was a Monday
+        timestamps = np.array([3, 4.5, 5, 10, 11.2, 20]) * day
+        mmr = np.array([2000.0, 2100.0, 1900.0, 1950.0, 2050.0, 2200.0])
+        starts, low, high, close = timeseries.bucket_series(timestamps, mmr, 'week', 10)
+        self.assertEqual((starts / day).tolist(), [-3, 4, 11, 18])
+        self.assertEqual(low.tolist(), [2000, 1900, 2050, 2200])
+        self.assertEqual(high.tolist(), [2000, 2100, 2050, 2200])
+        self.assertEqual(close.tolist(), [2000, 1950, 2050, 2200])
+
+        starts, low, high, close = timeseries.bucket_series(timestamps, mmr, 'day', 2)
+        self.assertEqual((starts / day).tolist(), [3, 10])
+        self.assertEqual(low.tolist(), [1900, 1950])
+        self.assertEqual(high.tolist(), [2100, 2200])
+        self.assertEqual(close.tolist(), [1900, 2200])
+
+
+class SyntheticDataTest(TestCase):
+    """
+    Tests generator of synthetic data and benchmark built on it
+    """
+    def testSeedCommand(self):
+        """ Seeded histories should be complete, with sequences and summaries
+        """
+        call_command('seed_matches', users=3, matches=40, characters=2, seed=1, stdout=StringIO())
+        users = User.objects.filter(username__startswith='synthetic-')
+        self.assertEqual(users.count(), 3)
+        for user in users:
+            self.assertEqual(Match.objects.filter(user=user).count(), 40)
+            self.assertEqual(MatchSequence.objects.filter(user=user).count(), 40)
+            self.assertEqual(RatingSummary.objects.get(user=user).last_match, Match.lastMatch(user))
+        self.assertEqual(Match.characters.through.objects.count(), 3 * 40 * 2)
+
+    def testBenchmark(self):
+        """ Benchmark should report every operation for every size and leave no data behind
+        """
+        results = benchmark.run(sizes=(5, 20), repeat=2)
+        self.assertEqual(len(results['results']), 2 * 12)
+        for result in results['results']:
+            self.assertGreater(result['wall_time']['median'], 0)
+            self.assertGreater(result['peak_memory'], 0)
+        imported, = [r for r in results['results'] if r['operation'] == 'api_matches_import'][-1:]
+        self.assertGreater(imported['rows_per_second'], 0)
+        self.assertEqual(imported['target_rows_per_second'], bulk_import.THROUGHPUT_TARGET)
+        self.assertIs(
+            imported['meets_target'], imported['rows_per_second'] >= bulk_import.THROUGHPUT_TARGET
+        )
+        sizes = {
+            result['operation']: result['response_bytes'] for result in results['results']
+            if result['matches'] == 20 and 'response_bytes' in result
+        }
+        self.assertLess(sizes['api_matches_page_columns'], sizes['api_matches_page_json'] / 4)
+        self.assertFalse(Match.objects.exists())
+        # Connection cannot be closed in test transaction
+        self.assertIsNone(results['connection_overhead'])
+        json.dumps(results)
+
+
 class MatchModelTest(TestCase):
     """
     Tests Match model (including deprecated methods)
@@ -131,12 +655,25 @@ class MatchModelTest(TestCase):
         self.assertEqual(self.matches[2].mmrDifference(), 0)
         self.assertEqual(self.matches[3].mmrDifference(), -1000)
 
+    def testCharacterLinksHaveUser(self):
+        """
+        Characters added to matches should be stored with owner of the match
+        """
+        self.assertEqual(
+            set(MatchCharacter.objects.values_list('match__user', 'user')),
+            {(self.users[0].pk, self.users[0].pk), (self.users[1].pk, self.users[1].pk)}
+        )
+        link = MatchCharacter(match=self.matches[0], character=self.characters[1])
+        link.save()
+        self.assertEqual(link.user_id, self.users[0].pk)
+
 
 class IndexPageViewTest(TestCase):
     INDEX_PAGE_VIEW_URL='/matches/list'
 
     def setUp(self):
         _createSampleData(self)
+        cache.clear()
         self.client = Client()
 
     def testIfReturnsNoMatchesForUserWithoutThem(self):
@@ -187,6 +724,76 @@ class IndexPageViewTest(TestCase):
         self.assertIn(matchData[3], response.context['matches'])
         self.client.logout()
 
+    def testNumberOfQueriesDoesNotDependOnNumberOfMatches(self):
+        """ Characters of all listed matches should be loaded at once
+        """
+        self.assertTrue(self.client.login(username='jimlahey', password='testTEST'))
+        # Load character catalog
+        self.client.get(self.INDEX_PAGE_VIEW_URL)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few_matches:
+            self.client.get(self.INDEX_PAGE_VIEW_URL)
+        for mmr in range(10):
+            match = Match(mmr_after=mmr, user=self.users[0])
+            match.save()
+            match.characters.set(self.characters)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many_matches:
+            response = self.client.get(self.INDEX_PAGE_VIEW_URL)
+        self.assertEqual(len(response.context['matches']), 12)
+        self.assertEqual(len(few_matches), len(many_matches))
+        self.client.logout()
+
+    def testPagination(self):
+        """ Index page should list matches in pages linked by cursors
+        """
+        for mmr in range(MATCHES_PER_PAGE - 1):
+            Match(mmr_after=mmr, user=self.users[0]).save()
+        self.assertTrue(self.client.login(username='jimlahey', password='testTEST'))
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL)
+        self.assertEqual(len(response.context['matches']), MATCHES_PER_PAGE)
+        self.assertIsNone(response.context['previous_cursor'])
+
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': response.context['next_cursor']})
+        self.assertEqual(
+            [m['pk'] for m in response.context['matches']],
+            [self.matches[0].pk],
+            'Second page should contain oldest match'
+        )
+        self.assertIsNone(response.context['next_cursor'])
+
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': response.context['previous_cursor']})
+        self.assertEqual(len(response.context['matches']), MATCHES_PER_PAGE)
+        self.assertEqual(response.context['matches'][-1]['pk'], self.matches[1].pk)
+        self.assertIsNone(response.context['previous_cursor'])
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+        huge_pk = encode_cursor(self.matches[0].date, 10 ** 300)
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': huge_pk})
+        self.assertEqual(response.status_code, 404)
+        self.client.logout()
+
+    def testCursorWithSkippedCharacters(self):
+        """ Cursor with characters skipped by decoding should give the same
+        page, cached under valid memcached key
+        """
+        for mmr in range(MATCHES_PER_PAGE):
+            Match(mmr_after=mmr, user=self.users[0]).save()
+        self.assertTrue(self.client.login(username='jimlahey', password='testTEST'))
+        cursor = self.client.get(self.INDEX_PAGE_VIEW_URL).context['next_cursor']
+        expected = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': cursor}).context['matches']
+        cache.clear()
+        with warnings.catch_warnings():
+            # Raised by local memory cache for keys memcached would reject
+            warnings.simplefilter('error', CacheKeyWarning)
+            for mangled in (' '.join(cursor), cursor[:4] + '!' * 300 + cursor[4:]):
+                response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'cursor': mangled})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['matches'], expected)
+        self.client.logout()
+
     def testIfMatchesAreInCorrectOrder(self):
         """ Tests if matches are passed in correct order 
         """
@@ -204,6 +811,511 @@ class IndexPageViewTest(TestCase):
         self.client.logout()
     
 
+class ConditionalIndexPageTest(TestCase):
+    INDEX_PAGE_VIEW_URL='/matches/list'
+
+    def setUp(self):
+        _createSampleData(self)
+        cache.clear()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='jimlahey', password='testTEST'))
+
+    def testNotModified(self):
+        """ Index page should answer 304 to request with current ETag without reading matches
+        """
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        tables = ('"matches_match"', '"matches_match_characters"', '"matches_prev_match_data"')
+        self.assertFalse([q for q in queries if any(t in q['sql'] for t in tables)])
+
+    def testChangesAreNoticed(self):
+        """ Creating, editing characters of and deleting match should change ETag
+        """
+        etags = [self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag']]
+        match = Match(mmr_after=2500, user=self.users[0])
+        match.save()
+        etags.append(self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag'])
+        match.characters.set([self.characters[1]])
+        etags.append(self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag'])
+        match.delete()
+        etags.append(self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    def testVersionIsPerUser(self):
+        """ Changes of other user's matches should not change ETag
+        """
+        etag = self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag']
+        version, _ = MatchDataVersion.current(self.users[1].pk)
+        Match(mmr_after=2500, user=self.users[1]).save()
+        self.assertEqual(MatchDataVersion.current(self.users[1].pk)[0], version + 1)
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class AsyncIndexPageTest(TestCase):
+    INDEX_PAGE_VIEW_URL='/matches/list'
+
+    def setUp(self):
+        _createSampleData(self)
+        cache.clear()
+
+    async def testServedAsynchronously(self):
+        """ Index page should be served on event loop by ASGI handler,
+        answering conditional requests as well
+        """
+        client = AsyncClient()
+        await client.aforce_login(self.users[0])
+        response = await client.get(self.INDEX_PAGE_VIEW_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [m['mmr_after'] for m in response.context['matches']], [3000, 2000]
+        )
+        response = await client.get(self.INDEX_PAGE_VIEW_URL, headers={
+            'If-None-Match': response['ETag']
+        })
+        self.assertEqual(response.status_code, 304)
+
+    async def testRedirectsAnonymousUser(self):
+        """ Anonymous user should be sent to login page
+        """
+        response = await AsyncClient().get(self.INDEX_PAGE_VIEW_URL)
+        self.assertEqual(response.status_code, 302)
+
+
+class ListCacheTest(TestCase):
+    INDEX_PAGE_VIEW_URL='/matches/list'
+    MATCH_TABLES = ('"matches_match"', '"matches_match_characters"', '"matches_prev_match_data"')
+
+    def setUp(self):
+        _createSampleData(self)
+        cache.clear()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='jimlahey', password='testTEST'))
+
+    def listed(self):
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL)
+        return [(m['mmr_after'], m['characters_list']) for m in response.context['matches']]
+
+    def testListIsCached(self):
+        """ Repeated request should render list without reading matches
+        """
+        Season.objects.create(name='Season 1', start=datetime(2018, 1, 1, tzinfo=timezone.utc))
+        self.listed()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.listed(), [(3000, 'char2'), (2000, 'char1')])
+        tables = (*self.MATCH_TABLES, '"matches_season"')
+        self.assertFalse([q for q in queries if any(t in q['sql'] for t in tables)])
+        self.assertContains(self.client.get(self.INDEX_PAGE_VIEW_URL), 'Season 1')
+
+    def testViewsInvalidateList(self):
+        """ Matches created, edited and deleted with views should be listed at once
+        """
+        self.listed()
+        self.client.post('/matches/new', {'characters': self.characters[0].pk, 'mmr_after': 3100})
+        self.assertEqual(self.listed()[0], (3100, 'char1'))
+        match = Match.objects.get(mmr_after=3100)
+        self.client.post('/matches/edit/{}'.format(match.pk), {
+            'characters': [self.characters[0].pk, self.characters[1].pk], 'mmr_after': 3200
+        })
+        self.assertEqual(self.listed()[0], (3200, 'char1, char2'))
+        self.client.get('/matches/delete/{}'.format(match.pk))
+        self.assertEqual(self.listed()[0], (3000, 'char2'))
+
+    def testApiInvalidatesList(self):
+        """ Matches created with API should be listed at once
+        """
+        self.listed()
+        self.client.post('/api/matches/', json.dumps({
+            'mmr_after': 3300, 'characters': [self.characters[1].pk]
+        }), content_type='application/json')
+        self.assertEqual(self.listed()[0], (3300, 'char2'))
+
+    def testAdminInvalidatesList(self):
+        """ Matches changed in admin should be listed at once
+        """
+        self.listed()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'testTEST')
+        client = Client()
+        client.force_login(admin)
+        match = self.matches[1]
+        response = client.post('/admin/matches/match/{}/change/'.format(match.pk), {
+            'user': self.users[0].pk, 'mmr_after': 2900, 'characters': [self.characters[0].pk]
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.listed()[0], (2900, 'char1'))
+        client.post('/admin/matches/match/{}/delete/'.format(match.pk), {'post': 'yes'})
+        self.assertEqual(self.listed(), [(2000, 'char1')])
+
+
+class DateRangeTest(TestCase):
+    INDEX_PAGE_VIEW_URL='/matches/list'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ranged', password='testTEST')
+        self.client = Client()
+        self.assertTrue(self.client.login(username='ranged', password='testTEST'))
+        start = datetime(2018, 7, 1, 12, tzinfo=timezone.utc)
+        for day, mmr in enumerate((2000, 2050, 2100, 2025)):
+            Match(user=self.user, date=start + timedelta(days=day), mmr_after=mmr).save()
+
+    def listed(self, **params):
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, params)
+        return [(m['mmr_after'], m['mmr_difference']) for m in response.context['matches']]
+
+    def testLookups(self):
+        """ Date bound should start at midnight, date of until should include whole day
+        """
+        self.assertEqual(date_lookups({}), {})
+        self.assertEqual(date_lookups({'since': '2018-07-02', 'until': '2018-07-03'}), {
+            'date__gte': datetime(2018, 7, 2, tzinfo=timezone.utc),
+            'date__lt': datetime(2018, 7, 4, tzinfo=timezone.utc),
+        })
+        self.assertEqual(date_lookups({'until': '2018-07-03T14:00:00+02:00'}), {
+            'date__lte': datetime(2018, 7, 3, 12, tzinfo=timezone.utc),
+        })
+        for value in ('yesterday', '2018-13-01', '2018-07-01T25:00'):
+            with self.assertRaises(InvalidDateRange):
+                date_lookups({'since': value})
+
+    def testListIsFiltered(self):
+        """ Only matches in range should be listed, with differences to
+        matches before the range
+        """
+        self.assertEqual(self.listed(since='2018-07-02', until='2018-07-03'), [(2100, 50), (2050, 50)])
+        self.assertEqual(self.listed(since='2018-07-03T12:00:00Z'), [(2025, -75), (2100, 50)])
+        self.assertEqual(self.listed(until='2018-07-01'), [(2000, 0)])
+        self.assertEqual(len(self.listed()), 4)
+
+    def testPagesKeepRange(self):
+        """ Links to other pages should keep the range
+        """
+        for day in range(MATCHES_PER_PAGE):
+            Match(user=self.user, date=datetime(2018, 8, 1, tzinfo=timezone.utc), mmr_after=2000).save()
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'since': '2018-07-02'})
+        self.assertContains(response, '&amp;since=2018-07-02')
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {
+            'since': '2018-07-02', 'cursor': response.context['next_cursor']
+        })
+        self.assertEqual(
+            [m['mmr_after'] for m in response.context['matches']], [2025, 2100, 2050]
+        )
+
+    def testInvalidRange(self):
+        """ Unparsable bound should be rejected
+        """
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'until': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+    def testFilteredQueryUsesIndex(self):
+        """ Matches in range should be read from (user, date) index
+        """
+        index = Match._meta.indexes[0]
+        queryset = Match.objects.filter(
+            user=self.user, **date_lookups({'since': '2018-07-02', 'until': '2018-07-03'})
+        ).order_by('-date', '-id')
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Planner prefers sequential scan of table this small, and
+                # user index followed by sort, depending on statistics left
+                # by other tests
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+            self.assertIn(index.name, queryset.explain())
+
+
+class SeasonTest(TestCase):
+    """
+    Tests seasons of matches and histories reset per season
+    """
+    INDEX_PAGE_VIEW_URL='/matches/list'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('seasoned', password='testTEST')
+        self.start = datetime(2018, 7, 1, 12, tzinfo=timezone.utc)
+        self.season = Season.objects.create(name='Season 1', start=self.start + timedelta(days=2))
+        self.matches = []
+        for day, mmr in enumerate((2000, 2050, 2100, 2025, 2200)):
+            match = Match(user=self.user, date=self.start + timedelta(days=day), mmr_after=mmr)
+            match.save()
+            self.matches.append(match)
+
+    def history(self):
+        """ Returns list of (season, last_match_id, mmr_difference) of user's
+        matches, checking that it agrees with full recomputation
+        """
+        rows = list(MatchWithPrevData.objects.filter(user=self.user).order_by(
+            'date', 'id'
+        ).values_list('pk', 'match_order', 'last_match_id', 'mmr_difference'))
+        self.assertEqual(MatchSequence.computed(self.user.pk), rows)
+        seasons = Match.objects.filter(user=self.user).order_by('date', 'id').values_list(
+            'season', flat=True
+        )
+        return [
+            (season, previous, difference)
+            for season, (_, _, previous, difference) in zip(seasons, rows)
+        ]
+
+    def summary(self):
+        summary = RatingSummary.objects.filter(user=self.user).values_list(
+            'current_mmr', 'peak_mmr', 'lowest_mmr', 'wins', 'losses', 'draws', 'streak'
+        ).first()
+        RatingSummary.rebuild(self.user.pk)
+        self.assertEqual(summary, RatingSummary.objects.filter(user=self.user).values_list(
+            'current_mmr', 'peak_mmr', 'lowest_mmr', 'wins', 'losses', 'draws', 'streak'
+        ).first(), 'Rebuild should not change anything')
+        return summary
+
+    def testMatchesGetSeasonOfDate(self):
+        """ Matches should be assigned to season of their date when created,
+        also in bulk
+        """
+        self.assertEqual([m.season_id for m in self.matches], [None, None] + [self.season.pk] * 3)
+        self.assertIsNone(Season.idAt(self.start))
+        later = Season.objects.create(name='Season 2', start=self.start + timedelta(days=30))
+        created = Match.objects.bulk_create([
+            Match(user=self.user, date=self.start + timedelta(days=day), mmr_after=2000)
+            for day in (-1, 10, 40)
+        ])
+        self.assertEqual([m.season_id for m in created], [None, self.season.pk, later.pk])
+        self.assertEqual(
+            list(Match.objects.filter(pk__in=[m.pk for m in created]).order_by('date').values_list(
+                'season', flat=True
+            )), [None, self.season.pk, later.pk]
+        )
+
+    def testHistoryResetsPerSeason(self):
+        """ First match of season should have no previous match, summary
+        should describe only season of last match
+        """
+        self.assertEqual(self.history(), [
+            (None, None, None),
+            (None, self.matches[0].pk, 50),
+            (self.season.pk, None, None),
+            (self.season.pk, self.matches[2].pk, -75),
+            (self.season.pk, self.matches[3].pk, 175),
+        ])
+        self.assertEqual(self.summary(), (2200, 2200, 2025, 1, 1, 0, 1))
+
+    def testSeasonChangesMoveMatches(self):
+        """ Matches should follow created and deleted seasons, with their
+        histories refreshed
+        """
+        earlier = Season.objects.create(name='Season 0', start=self.start + timedelta(days=1))
+        self.assertEqual([s for s, _, _ in self.history()], [None, earlier.pk] + [self.season.pk] * 3)
+        self.assertEqual([d for _, _, d in self.history()], [None, None, None, -75, 175])
+        self.season.delete()
+        self.assertEqual(self.history(), [
+            (None, None, None),
+            (earlier.pk, None, None),
+            (earlier.pk, self.matches[1].pk, 50),
+            (earlier.pk, self.matches[2].pk, -75),
+            (earlier.pk, self.matches[3].pk, 175),
+        ])
+        self.assertEqual(self.summary(), (2200, 2200, 2025, 2, 1, 0, 1))
+
+    def testDeletingFirstSeason(self):
+        """ Deleting earliest season should join its matches with those
+        played before it, marking match data as changed
+        """
+        version = MatchDataVersion.objects.get(user=self.user).version
+        self.season.delete()
+        self.assertEqual(self.history(), [
+            (None, None, None),
+            (None, self.matches[0].pk, 50),
+            (None, self.matches[1].pk, 50),
+            (None, self.matches[2].pk, -75),
+            (None, self.matches[3].pk, 175),
+        ])
+        self.assertEqual(self.summary(), (2200, 2200, 2000, 3, 1, 0, 1))
+        self.assertGreater(MatchDataVersion.objects.get(user=self.user).version, version)
+
+    def testSeasonLookups(self):
+        """ Season should be given by ID or as current one
+        """
+        self.assertEqual(season_lookups({}), {})
+        self.assertEqual(season_lookups({'season': str(self.season.pk)}), {'season_id': self.season.pk})
+        self.assertEqual(season_lookups({'season': 'current'}), {'season_id': self.season.pk})
+        with self.assertRaises(InvalidSeason):
+            season_lookups({'season': 'last'})
+
+    def testListIsFilteredBySeason(self):
+        """ Only matches of season should be listed, first of them without
+        difference, and links to other pages should keep the season
+        """
+        self.client = Client()
+        self.client.force_login(self.user)
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'season': 'current'})
+        self.assertEqual(
+            [(m['mmr_after'], m['mmr_difference']) for m in response.context['matches']],
+            [(2200, 175), (2025, -75), (2100, 0)]
+        )
+        self.assertContains(response, '<option value="current" selected>')
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'season': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def testStartOfSeasonIsNoticed(self):
+        """ Current season list should not be answered with 304 after next
+        season has started, though nothing was written since
+        """
+        self.client = Client()
+        self.client.force_login(self.user)
+        now = datetime.now(timezone.utc)
+        Season.objects.create(name='Season 2', start=now + timedelta(hours=1))
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, {'season': 'current'})
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(len(response.context['matches']), 3)
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(hours=2)):
+            response = self.client.get(
+                self.INDEX_PAGE_VIEW_URL, {'season': 'current'}, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['matches'], [])
+            response = self.client.get(
+                self.INDEX_PAGE_VIEW_URL, {'season': 'current'}, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.INDEX_PAGE_VIEW_URL, {'season': 'current'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def testSeasonChangesAreNoticed(self):
+        """ Adding, renaming and deleting season without matches should change
+        ETag of list, which shows all seasons
+        """
+        self.client = Client()
+        self.client.force_login(self.user)
+        etags = [self.client.get(self.INDEX_PAGE_VIEW_URL)['ETag']]
+        season = Season.objects.create(name='Season 2', start=self.start + timedelta(days=30))
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertContains(response, 'Season 2')
+        etags.append(response['ETag'])
+        season.name = 'Season 3'
+        season.save()
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertContains(response, 'Season 3')
+        etags.append(response['ETag'])
+        season.delete()
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertNotContains(response, 'Season 3')
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get(self.INDEX_PAGE_VIEW_URL, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 304)
+
+    def testSeasonQueryUsesIndex(self):
+        """ Matches of season should be read from (user, season) index
+        """
+        queryset = Match.objects.filter(user=self.user, season=self.season).order_by('-date', '-id')
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Planner prefers sequential scan of table this small, and
+                # any index of user or season followed by sort, depending
+                # on statistics left by other tests
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute('ANALYZE matches_match')
+            self.assertIn('matches_match_user_season', queryset.explain())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+class PartitioningTest(TestCase):
+    """
+    Tests hash partitioning of match tables
+    """
+    def setUp(self):
+        _createSampleData(self)
+
+    def history(self):
+        return list(MatchWithPrevData.objects.order_by('pk').values_list(
+            'pk', 'user', 'mmr_after', 'last_match_id', 'mmr_difference', 'match_order'
+        ))
+
+    def testPartitioningKeepsData(self):
+        """ Partitioned tables should contain the same matches and characters
+        """
+        history = self.history()
+        characters = Match.charactersOf([m.pk for m in self.matches])
+        partitioning.partition(4)
+        self.assertEqual(partitioning.partition_count(), 4)
+        self.assertEqual(partitioning.partition_count(partitioning.CHARACTERS_TABLE), 4)
+        self.assertEqual(self.history(), history)
+        self.assertEqual(Match.charactersOf([m.pk for m in self.matches]), characters)
+
+    def testWritesToPartitionedTables(self):
+        """ Matches should be added, edited, moved and deleted as usual
+        """
+        partitioning.partition(4)
+        match = Match(mmr_after=2500, user=self.users[0])
+        match.save()
+        self.assertGreater(match.pk, max(m.pk for m in self.matches))
+        match.characters.set(self.characters)
+        self.assertEqual(len(Match.charactersOf([match.pk])[match.pk]), 2)
+        self.assertEqual(MatchWithPrevData.objects.get(pk=match.pk).mmr_difference, -500)
+        self.assertEqual(MatchCharacter.objects.filter(user=self.users[0]).count(), 4)
+
+        self.matches[0].user = self.users[1]
+        self.matches[0].save()
+        for user in self.users:
+            self.assertEqual(
+                MatchSequence.computed(user.pk),
+                list(MatchSequence.objects.filter(user=user).order_by('sequence').values_list(
+                    'match_id', 'sequence', 'last_match_id', 'mmr_difference'
+                ))
+            )
+
+        self.users[1].delete()
+        self.assertEqual(Match.objects.count(), 2)
+        self.assertFalse(Match.characters.through.objects.filter(match_id=self.matches[0].pk).exists())
+
+    def testQueriesOfUserScanSinglePartition(self):
+        """ Matches of a user should be read from one partition
+        """
+        partitioning.partition(4)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = MatchWithPrevData.objects.filter(user=self.users[0])[:MATCHES_PER_PAGE].explain()
+        self.assertEqual(len(set(re.findall(r'matches_match_p\d+', plan))), 1)
+        plan = Match._characterLinks([m.pk for m in self.matches[:2]], self.users[0].pk).explain()
+        self.assertEqual(len(set(re.findall(r'matches_match_characters_p\d+', plan))), 1)
+
+    def testUnpartitioning(self):
+        """ Tables rebuilt without partitions should keep data and foreign keys
+        """
+        history = self.history()
+        with connection.cursor() as cursor:
+            foreign_keys = 'SELECT COUNT(*) FROM pg_constraint WHERE confrelid = %s::regclass'
+            cursor.execute(foreign_keys, [partitioning.MATCH_TABLE])
+            references, = cursor.fetchone()
+            call_command('partition_matches', partitions=4, stdout=StringIO())
+            call_command('partition_matches', undo=True, stdout=StringIO())
+            cursor.execute(foreign_keys, [partitioning.MATCH_TABLE])
+            self.assertEqual(cursor.fetchone(), (references,))
+        self.assertEqual(partitioning.partition_count(), 0)
+        self.assertEqual(self.history(), history)
+        with self.assertRaises(NotSupportedError):
+            partitioning.unpartition()
+
+    def testBenchmark(self):
+        """ Benchmark should read one partition per query and leave tables unchanged
+        """
+        results = partition_benchmark.run(users=4, matches=30, partitions=2, repeat=2)
+        self.assertEqual(results['total_matches'], 4 * 30 + len(self.matches))
+        layouts = {(r['layout'], r['operation']): r for r in results['results']}
+        self.assertEqual(layouts[('partitioned', 'prev_data_page')]['partitions_read'], 1)
+        self.assertEqual(layouts[('partitioned', 'page_characters')]['partitions_read'], 1)
+        self.assertEqual(partitioning.partition_count(), 0)
+        self.assertEqual(Match.objects.count(), len(self.matches))
+
+
 class NewMatchViewTest(TestCase):
     NEW_MATCH_VIEW_URL='/matches/new'
 
@@ -0,0 +1,226 @@
+""" Vectorized analysis of user's MMR history
+
+History is loaded with single values_list query into NumPy arrays and every
+statistic is computed with array operations (cumulative sums for rolling
+windows), so cost of analysis grows linearly with history, without Python
+loops over matches.
+"""
+
+import numpy as np
+
+from .models import Match
+
+DEFAULT_WINDOW = 10
+
+
+def load_series(user_id, lookups=None):
+    """ Returns (timestamps, mmr) arrays of user's matches (filtered by
+    lookups, if given), oldest first; timestamps are POSIX seconds
+    """
+    rows = Match.objects.filter(user_id=user_id, **(lookups or {})).order_by(
+        'date', 'id'
+    ).values_list('date', 'mmr_after')
+    rows = list(rows)
+    timestamps = np.fromiter(
+        (date.timestamp() for date, _ in rows), dtype=np.float64, count=len(rows)
+    )
+    mmr = np.fromiter(
+        (mmr_after for _, mmr_after in rows), dtype=np.float64, count=len(rows)
+    )
+    return timestamps, mmr
+
+
+def _window_sums(values, window):
+    """ Returns sums of last `window` values (fewer at the beginning) for each position
+    """
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    return sums[end] - sums[start], end - start
+
+
+def rolling_mean(values, window):
+    """ Returns mean of last `window` values for each position
+    """
+    sums, counts = _window_sums(values, window)
+    return sums / np.maximum(counts, 1)
+
+
+def rolling_std(values, window):
+    """ Returns standard deviation of last `window` values for each position
+    """
+    sums, counts = _window_sums(values, window)
+    squares, _ = _window_sums(values * values, window)
+    counts = np.maximum(counts, 1)
+    mean = sums / counts
+    return np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+
+
+def slope(x, y):
+    """ Returns least squares slope of y against x
+    """
+    x = x - x.mean()
+    return float(np.dot(x, y - y.mean()) / np.dot(x, x))
+
+
+def compute_statistics(timestamps, mmr, window=DEFAULT_WINDOW):
+    """ Returns dict of statistics of MMR series
+
+    rolling_mean - mean MMR of last `window` matches, for each match
+    rolling_volatility - standard deviation of MMR changes in last `window`
+        matches, for each match (None for first one)
+    win_probability - Laplace-smoothed share of wins among last `window`
+        matches that changed MMR, estimate of chance to win next match
+    drawdown - MMR lost since peak reached so far, for each match
+    trend - least squares slope of MMR, per day and per match
+    Last values of each series are summarized in `current`.
+    """
+    n = len(mmr)
+    statistics = {
+        'matches': n,
+        'window': window,
+        'current': None,
+        'trend': None,
+        'max_drawdown': None,
+        'series': None,
+    }
+    if n == 0:
+        return statistics
+
+    mean = rolling_mean(mmr, window)
+
+    changes = np.diff(mmr)
+    volatility = np.full(n, np.nan)
+    volatility[1:] = rolling_std(changes, window)
+
+    wins = np.zeros(n)
+    decided = np.zeros(n)
+    wins[1:] = changes > 0
+    decided[1:] = changes != 0
+    window_wins, _ = _window_sums(wins, window)
+    window_decided, _ = _window_sums(decided, window)
+    win_probability = (window_wins + 1) / (window_decided + 2)
+
+    drawdown = mmr - np.maximum.accumulate(mmr)
+
+    trend = {'per_match': 0.0, 'per_day': 0.0}
+    if n > 1:
+        trend['per_match'] = slope(np.arange(n, dtype=np.float64), mmr)
+        if timestamps[-1] > timestamps[0]:
+            trend['per_day'] = slope(timestamps / 86400.0, mmr)
+
+    statistics.update({
+        'current': {
+            'mmr': float(mmr[-1]),
+            'rolling_mean': float(mean[-1]),
+            'rolling_volatility': None if n == 1 else float(volatility[-1]),
+            'win_probability': float(win_probability[-1]),
+            'drawdown': float(drawdown[-1]),
+        },
+        'trend': trend,
+        'max_drawdown': float(drawdown.min()),
+        'series': {
+            'timestamp': timestamps,
+            'mmr': mmr,
+            'rolling_mean': mean,
+            'rolling_volatility': volatility,
+            'win_probability': win_probability,
+            'drawdown': drawdown,
+        },
+    })
+    return statistics
+
+
+def series_to_lists(series):
+    """ Converts arrays of series to JSON-serializable lists (NaN becoming None)
+    """
+    return {
+        name: [None if value != value else value for value in values.tolist()]
+        for name, values in series.items()
+    }
+
+
+def lttb(x, y, threshold):
+    """ Returns indices of `threshold` points of (x, y) series chosen with
+    Largest-Triangle-Three-Buckets algorithm
+
+    First and last points are always kept, the rest of series is split into
+    threshold - 2 buckets and from each one point forming largest triangle with
+    point chosen from previous bucket and average of next bucket is kept, so
+    peaks and valleys survive downsampling. All points are returned if there
+    are at most `threshold` of them.
+    """
+    n = len(x)
+    if n <= threshold:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold], dtype=np.intp)
+
+    x = x - x[0]
+    buckets = threshold - 2
+    edges = (np.arange(buckets + 1) * ((n - 2) / buckets)).astype(np.intp) + 1
+    edges[-1] = n - 1
+
+    # Averages of bucket following each bucket, last one is followed by last point
+    sums_x = np.concatenate(([0.0], np.cumsum(x)))
+    sums_y = np.concatenate(([0.0], np.cumsum(y)))
+    start, end = edges[1:-1], edges[2:]
+    next_x = np.append((sums_x[end] - sums_x[start]) / (end - start), x[-1])
+    next_y = np.append((sums_y[end] - sums_y[start]) / (end - start), y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(buckets):
+        bucket = slice(edges[i], edges[i + 1])
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[bucket] - y[a])
+            - (x[a] - x[bucket]) * (next_y[i] - y[a])
+        )
+        a = edges[i] + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+PERIODS = {
+    'day': 1,
+    'week': 7,
+}
+# 1970-01-01 was a Thursday, weeks start on Monday
+_WEEK_OFFSET = 3
+
+
+def bucket_series(timestamps, mmr, period, limit):
+    """ Returns (timestamps, min, max, close) arrays of MMR aggregated into
+    UTC days or weeks (starting on Monday), at most `limit` of them
+
+    timestamps are starts of buckets and close is MMR after last match of
+    bucket. When there are more buckets than limit, consecutive ones are
+    merged into evenly sized groups.
+    """
+    days = np.floor(timestamps / 86400.0).astype(np.int64)
+    if period == 'week':
+        keys = (days + _WEEK_OFFSET) // 7
+    else:
+        keys = days
+    if len(keys) == 0:
+        empty = np.array([])
+        return empty, empty, empty, empty
+
+    # Series is sorted by date, so buckets are runs of equal keys
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], starts))
+    if len(starts) > limit:
+        starts = starts[(np.arange(limit) * (len(starts) / limit)).astype(np.intp)]
+    ends = np.append(starts[1:], len(mmr)) - 1
+
+    bucket_starts = keys[starts] * PERIODS[period] * 86400.0
+    if period == 'week':
+        bucket_starts -= _WEEK_OFFSET * 86400.0
+    return (
+        bucket_starts,
+        np.minimum.reduceat(mmr, starts),
+        np.maximum.reduceat(mmr, starts),
+        mmr[ends],
+    )
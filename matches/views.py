@@ -1,25 +1,99 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseRedirect, Http404, HttpResponseForbidden
+from django.core.cache import cache
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, Http404, HttpResponseForbidden
+)
+from django.utils.http import urlencode
 
-from .models import Match, MatchWithPrevData
+from characters.catalog import catalog
+from .models import Match, MatchWithPrevData, Season
+from .conditional import (
+    async_condition, match_data_stamp, matches_etag, matches_last_modified, seasons_stamp
+)
+from .daterange import PARAMS as DATE_PARAMS, InvalidDateRange, date_lookups, lookups_key
 from .forms import MatchForm
+from .pagination import InvalidCursor, apaginate, decode_cursor
+from .seasons import PARAM as SEASON_PARAM, InvalidSeason, season_lookups
+
+def _match_row(match, characters):
+    """ Returns data of MatchWithPrevData displayed in a row of matches list
+    """
+    mmr_difference = match.mmrDifference()
+    return {
+        'pk': match.pk,
+        'characters_list': ', '.join([str(x) for x in characters]),
+        'mmr_after': match.mmr_after,
+        'mmr_difference': mmr_difference,
+        'won': mmr_difference > 0,
+        'lost': mmr_difference < 0,
+    }
+
+MATCHES_PER_PAGE = 50
+LIST_CACHE_TIMEOUT = 60 * 60
+
+def _list_cache_key(request, position, lookups):
+    """ Returns cache key of page of logged user's matches list, which changes
+    with every change of their matches, characters or seasons, so cached
+    pages never have to be deleted
+
+    position - (date, pk, reverse) decoded from cursor, None for first page;
+        cursor itself may contain characters decoding skips, which would
+        make invalid memcached key
+    """
+    version, _ = match_data_stamp(request)
+    seasons_version, _, _ = seasons_stamp(request)
+    if position is None:
+        page = ''
+    else:
+        date, pk, reverse = position
+        page = '{}{}|{}'.format('r' if reverse else 'f', date.isoformat(), pk)
+    return 'matches:list:{}:{}:{}:{}:{}:{}'.format(
+        request.user.pk, version, catalog.version(), seasons_version, page, lookups_key(lookups)
+    )
+
+async def _list_page(user, cursor, lookups):
+    """ Returns context of matches list page starting at cursor, filtered
+    by date lookups, with seasons offered by the filter
+    """
+    matches, next_cursor, previous_cursor = await apaginate(
+        MatchWithPrevData.objects.filter(user=user, **lookups), cursor, MATCHES_PER_PAGE
+    )
+    characters = await Match.acharactersOf([m.pk for m in matches], user.pk)
+    return {
+        'matches': [_match_row(m, characters[m.pk]) for m in matches],
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'seasons': [season async for season in Season.objects.values('pk', 'name')],
+    }
 
 @login_required
-def index_page(request):
-    matches = MatchWithPrevData.objects.filter(user=request.user)
-    return render(request, "matches_list.html", {
-        'matches': [
-            {
-                'pk': m.pk,
-                'characters_list': ', '.join([str(x) for x in list(m.characters.all())]),
-                'mmr_after': m.mmr_after,
-                'mmr_difference': m.mmrDifference(),
-                'won': m.mmrDifference() > 0,
-                'lost': m.mmrDifference() < 0,
-            } for m in matches
-        ]
-    })
+@async_condition(etag_func=matches_etag, last_modified_func=matches_last_modified)
+async def index_page(request):
+    cursor = request.GET.get('cursor')
+    try:
+        position = None if cursor is None else decode_cursor(cursor)
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+    try:
+        lookups = date_lookups(request.GET)
+        lookups.update(await sync_to_async(season_lookups)(request.GET))
+    except (InvalidDateRange, InvalidSeason) as e:
+        return HttpResponseBadRequest(str(e))
+    user = await request.auser()
+    key = await sync_to_async(_list_cache_key)(request, position, lookups)
+    context = await cache.aget(key)
+    if context is None:
+        context = await _list_page(user, cursor, lookups)
+        await cache.aset(key, context, LIST_CACHE_TIMEOUT)
+    dates = {
+        param: request.GET[param] for param in (*DATE_PARAMS, SEASON_PARAM)
+        if request.GET.get(param)
+    }
+    return render(request, "matches_list.html", dict(
+        context, dates=dates, dates_query=urlencode(dates)
+    ))
 
 @login_required
 def new_match(request):
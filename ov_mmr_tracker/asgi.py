@@ -0,0 +1,17 @@
+"""
+ASGI config for ov_mmr_tracker project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Served by uvicorn workers of gunicorn, see gunicorn.conf.py.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/stable/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ov_mmr_tracker.settings")
+
+application = get_asgi_application()
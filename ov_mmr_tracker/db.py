@@ -0,0 +1,24 @@
+""" Warm-up of database connections
+
+Called when worker starts (see gunicorn.conf.py), so first requests it
+serves do not wait for connections to be established. Pool of database
+configured with connection pool is filled up to its minimum size; other
+databases with persistent connections (CONN_MAX_AGE other than 0) get
+their connection opened in current thread.
+"""
+
+from django.db import connections
+
+WARM_UP_TIMEOUT = 30
+
+
+def warm_up(timeout=WARM_UP_TIMEOUT):
+    """ Opens connections of all configured databases, waiting at most
+    timeout seconds for each pool to fill
+    """
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            pool.open(wait=True, timeout=timeout)
+        elif connection.settings_dict['CONN_MAX_AGE'] != 0:
+            connection.ensure_connection()
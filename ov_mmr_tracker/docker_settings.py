@@ -2,6 +2,7 @@
 Settings to be used when project is used with Docker
 """
 
+import copy
 import os
 
 from ov_mmr_tracker.settings import *
@@ -10,12 +11,69 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'defaultsecretkey')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('DB_NAME', 'postgres'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Connections are checked before they are reused
+        'CONN_HEALTH_CHECKS': True if os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True' else False,
+        # Set DB_PGBOUNCER when connecting through pgbouncer in transaction
+        # pooling mode, which cannot keep server-side cursors (used by
+        # iterator()) between transactions
+        'DISABLE_SERVER_SIDE_CURSORS': True if os.getenv('DB_PGBOUNCER', 'False') == 'True' else False,
+    }
+}
+
+# Every worker keeps pool of up to DB_POOL_MAX_SIZE connections (0 disables
+# pool), which serves async views running in threads under ASGI. Without
+# pool, connections are kept open for DB_CONN_MAX_AGE seconds, which only
+# helps sync workers (threads of ASGI workers do not outlive requests).
+# Connections are opened before worker accepts requests, see gunicorn.conf.py.
+_pool_max_size = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+if _pool_max_size > 0:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': min(int(os.getenv('DB_POOL_MIN_SIZE', '2')), _pool_max_size),
+            'max_size': _pool_max_size,
+            # Seconds request waits for free connection before failing
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Read replicas of default database, comma-separated DB_REPLICA_HOSTS (with
+# port as host:port), serve reads of match data in requests not changing it;
+# user who has changed data reads from primary for next DB_REPLICA_PIN_SECONDS
+# (see ov_mmr_tracker.replicas). Replicas share other connection settings
+# with primary, including pool.
+REPLICA_DATABASES = []
+for _number, _host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    _alias = 'replica{}'.format(_number + 1)
+    _host, _, _port = _host.strip().partition(':')
+    DATABASES[_alias] = dict(
+        copy.deepcopy(DATABASES['default']), HOST=_host,
+        PORT=_port or DATABASES['default']['PORT'],
+        # Tests run against primary only
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(_alias)
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['ov_mmr_tracker.replicas.ReplicaRouter']
+    MIDDLEWARE = MIDDLEWARE.copy()
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'ov_mmr_tracker.replicas.ReplicaMiddleware',
+    )
+    REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+
+# Cache shared by all workers
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cache:11211'),
     }
 }
 
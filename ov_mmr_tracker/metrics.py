@@ -0,0 +1,168 @@
+""" Request metrics in Prometheus exposition format
+
+MetricsMiddleware records latency of every request and number and total
+time of SQL queries it has run (counted with connection.execute_wrapper),
+labelled with name of resolved URL pattern. Metrics are exposed by
+metrics_view to staff users.
+
+When PROMETHEUS_MULTIPROC_DIR environment variable is set, every worker
+writes its metrics to files in that directory and metrics_view aggregates
+metrics of all workers, so any gunicorn worker can answer the scrape (see
+gunicorn.conf.py). Directory has to be emptied before server starts.
+"""
+
+import os
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import (
+    CollectorRegistry, CONTENT_TYPE_LATEST, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from rest_framework import permissions
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.decorators import (
+    api_view, authentication_classes, permission_classes, renderer_classes
+)
+from rest_framework.renderers import BaseRenderer
+
+UNRESOLVED = '<unresolved>'
+
+REQUEST_DURATION = Histogram(
+    'django_http_request_duration_seconds',
+    'Time spent on processing request, by URL name and method',
+    ['route', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'django_http_request_db_queries',
+    'Number of SQL queries run while processing request, by URL name',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+REQUEST_DB_DURATION = Histogram(
+    'django_http_request_db_duration_seconds',
+    'Time spent on SQL queries while processing request, by URL name',
+    ['route'],
+)
+
+
+class QueryCounter:
+    """ Execute wrapper counting queries and time spent on them
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+def route_of(request):
+    """ Returns name of URL pattern request was resolved to
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """ Records latency and SQL queries of every request
+
+    Streamed responses are measured until their headers are ready, so time
+    and queries of producing their content are not included. Middleware
+    works both in sync and async chain, so it does not make async views run
+    in thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with self.counting(counter):
+            response = self.get_response(request)
+        self.record(request, started, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        # Connections are thread-local and async views query database in
+        # thread of the request, so wrappers are installed in that thread
+        stack = await sync_to_async(self.counting)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, started, counter)
+        return response
+
+    @staticmethod
+    def counting(counter):
+        """ Returns ExitStack wrapping database connections of current thread with counter
+        """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        return stack
+
+    @staticmethod
+    def record(request, started, counter):
+        duration = time.perf_counter() - started
+        route = route_of(request)
+        REQUEST_DURATION.labels(route, request.method).observe(duration)
+        REQUEST_QUERIES.labels(route).observe(counter.queries)
+        REQUEST_DB_DURATION.labels(route).observe(counter.duration)
+
+
+def exposition():
+    """ Returns current metrics in Prometheus text format, aggregated from
+    all workers if metrics are shared through directory
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """ Renders errors of metrics_view as plain text
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode(self.charset)
+
+
+@api_view(['GET'])
+@authentication_classes((BasicAuthentication, SessionAuthentication))
+@permission_classes((permissions.IsAdminUser,))
+@renderer_classes((PrometheusRenderer,))
+def metrics_view(request):
+    """
+    Metrics of requests in Prometheus exposition format, for staff users
+    (scraper can authenticate with HTTP Basic auth)
+    """
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,144 @@
+""" Routing of match data reads to read replicas
+
+ReplicaRouter sends reads of models of matches and characters apps made
+while ReplicaMiddleware handles GET, HEAD or OPTIONS request to one of
+REPLICA_DATABASES (chosen once per request, so all its queries see the
+same replica); everything else, i.e. writes, requests changing data,
+management commands and reads inside transactions, uses the primary
+(default) database. User, session and other auth reads stay on primary, so
+logins and logouts are seen immediately.
+
+Replicas lag behind primary, so user who has changed data read from them
+(e.g. posted new match and got redirected to matches list) is pinned to
+primary for REPLICA_PIN_SECONDS after that request; writes of other data
+(sessions, last login, ...) do not pin, so they do not keep ordinary page
+views off replicas. pin is kept in cache shared by
+all workers, so it holds for all their clients. Pin should be longer than
+usual replication lag. Version stamps of match data (MatchDataVersion,
+CatalogVersion) are read from the same replica as data, so cached pages
+and ETags never pair new stamp with stale data.
+
+Without REPLICA_DATABASES both router and middleware do nothing, see
+ov_mmr_tracker.docker_settings for configuration.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Apps whose models are read from replicas
+REPLICA_APPS = frozenset({'matches', 'characters'})
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+DEFAULT_PIN_SECONDS = 10
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def replicas():
+    return getattr(settings, 'REPLICA_DATABASES', ())
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+
+
+def _pin_key(user_id):
+    return 'replicas:pinned:{}'.format(user_id)
+
+
+class RequestState:
+    """ Replica used by request (None if it reads from primary) and whether
+    it has written any data read from replicas
+
+    Shared by all threads request runs its queries in.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if state.replica is None or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Request has to see its own changes
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label in REPLICA_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in replicas() else None
+
+
+class ReplicaMiddleware:
+    """ Chooses database of request's reads for ReplicaRouter and pins user
+    who has changed data to primary
+
+    Has to follow AuthenticationMiddleware. Works both in sync and async
+    chain.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        user = request.user
+        pinned = user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+        state = self.state(request, pinned)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote and user.is_authenticated:
+            cache.set(_pin_key(user.pk), True, pin_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        user = await request.auser()
+        pinned = user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+        state = self.state(request, pinned)
+        # Context is copied to threads async views run queries in
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote and user.is_authenticated:
+            await cache.aset(_pin_key(user.pk), True, pin_seconds())
+        return response
+
+    @staticmethod
+    def state(request, pinned):
+        if pinned or request.method not in SAFE_METHODS:
+            return RequestState(None)
+        return RequestState(random.choice(replicas()))
@@ -0,0 +1,20 @@
+"""
+Settings to run test suite without database server, on in-memory SQLite:
+
+    python manage.py test --settings=ov_mmr_tracker.test_settings
+"""
+
+from ov_mmr_tracker.settings import *
+
+SECRET_KEY = 'testsecretkey'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+SILENCED_SYSTEM_CHECKS = ['models.W042']
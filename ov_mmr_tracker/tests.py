@@ -0,0 +1,205 @@
+import base64
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase,
+    TransactionTestCase, Client, override_settings
+)
+
+from characters.models import Character
+from matches.models import Match, MatchWithPrevData
+from .db import warm_up
+from .metrics import REQUEST_DB_DURATION, REQUEST_DURATION, REQUEST_QUERIES
+from .replicas import ReplicaMiddleware, ReplicaRouter
+
+
+def _sample(metric, suffix, **labels):
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name == family.name + suffix and all(
+                sample.labels.get(k) == v for k, v in labels.items()
+            ):
+                return sample.value
+    return 0
+
+
+class MetricsTest(TestCase):
+    METRICS_URL = '/metrics'
+
+    def setUp(self):
+        self.user = User.objects.create_user('player', password='testTEST')
+        self.staff = User.objects.create_user('staff', password='testTEST', is_staff=True)
+        self.client = Client()
+
+    def testRequestsAreMeasuredByRoute(self):
+        """ Latency and queries of request should be recorded under its URL name
+        """
+        Match(user=self.user, mmr_after=2000).save()
+        requests = _sample(REQUEST_DURATION, '_count', route='matches_list', method='GET')
+        queries = _sample(REQUEST_QUERIES, '_sum', route='matches_list')
+        self.client.force_login(self.user)
+        self.client.get('/matches/list')
+        self.assertEqual(
+            _sample(REQUEST_DURATION, '_count', route='matches_list', method='GET'), requests + 1
+        )
+        self.assertGreater(_sample(REQUEST_QUERIES, '_sum', route='matches_list'), queries)
+        self.assertGreater(_sample(REQUEST_DB_DURATION, '_sum', route='matches_list'), 0)
+
+        api_requests = _sample(REQUEST_DURATION, '_count', route='match-list', method='GET')
+        self.client.get('/api/matches/')
+        self.assertEqual(
+            _sample(REQUEST_DURATION, '_count', route='match-list', method='GET'), api_requests + 1
+        )
+
+    async def testAsyncRequestsAreMeasured(self):
+        """ Queries of async views served by ASGI handler should be counted
+        """
+        requests = _sample(REQUEST_DURATION, '_count', route='match-list', method='GET')
+        queries = _sample(REQUEST_QUERIES, '_sum', route='match-list')
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        await client.get('/api/matches/')
+        self.assertEqual(
+            _sample(REQUEST_DURATION, '_count', route='match-list', method='GET'), requests + 1
+        )
+        self.assertGreater(_sample(REQUEST_QUERIES, '_sum', route='match-list'), queries)
+
+    def testMetricsAreOnlyForStaff(self):
+        """ Metrics should be exposed to staff users, also with Basic auth
+        """
+        self.assertEqual(self.client.get(self.METRICS_URL).status_code, 401)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.METRICS_URL).status_code, 403)
+
+        credentials = base64.b64encode(b'staff:testTEST').decode('ascii')
+        response = Client().get(self.METRICS_URL, HTTP_AUTHORIZATION='Basic ' + credentials)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'django_http_request_duration_seconds_bucket{', response.content)
+
+
+class WarmUpTest(TransactionTestCase):
+    def setUp(self):
+        self.conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.close()
+        if connection.connection is not None:
+            self.skipTest('Connection to in-memory database is never closed')
+
+    def tearDown(self):
+        connection.settings_dict['CONN_MAX_AGE'] = self.conn_max_age
+
+    def testOpensPersistentConnection(self):
+        """ Persistent connection should be opened by warm-up
+        """
+        connection.settings_dict['CONN_MAX_AGE'] = 60
+        warm_up()
+        self.assertIsNotNone(connection.connection)
+
+    def testSkipsConnectionClosedAfterRequest(self):
+        """ Connection closed after every request should not be opened
+        """
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        warm_up()
+        self.assertIsNone(connection.connection)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.user = User(pk=1, username='player')
+        self.other = User(pk=2, username='other')
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def request(self, method, user, write=False, written=Match):
+        """ Returns databases of MatchWithPrevData, Character and User reads
+        made while handling request by user, after write of written model
+        if write is set
+        """
+        def view(request):
+            if write:
+                self.router.db_for_write(written)
+            view.databases = [
+                self.router.db_for_read(model) for model in (MatchWithPrevData, Character, User)
+            ]
+            return HttpResponse()
+
+        request = getattr(self.factory, method)('/matches/list')
+        request.user = user
+        ReplicaMiddleware(view)(request)
+        return view.databases
+
+    def testReadsOfSafeRequestsUseReplica(self):
+        """ Match data should be read from replica, other data and data
+        of other requests from primary
+        """
+        self.assertEqual(self.request('get', self.user), ['replica', 'replica', None])
+        self.assertEqual(self.request('get', AnonymousUser()), ['replica', 'replica', None])
+        self.assertEqual(self.request('post', self.user), ['default', 'default', None])
+        self.assertIsNone(self.router.db_for_read(MatchWithPrevData))
+
+    def testUserIsPinnedAfterWrite(self):
+        """ User who has changed data should read it from primary until pin
+        expires, other users should not
+        """
+        self.assertEqual(self.request('post', self.user, write=True)[:2], ['default', 'default'])
+        self.assertEqual(self.request('get', self.user)[:2], ['default', 'default'])
+        self.assertEqual(self.request('get', self.other)[:2], ['replica', 'replica'])
+        cache.clear()
+        self.assertEqual(self.request('get', self.user)[:2], ['replica', 'replica'])
+
+    def testWritingRequestReadsFromPrimary(self):
+        """ Reads following write in the same request should see it
+        """
+        self.assertEqual(self.request('get', self.user, write=True)[:2], ['default', 'default'])
+        self.assertEqual(self.request('get', self.user)[:2], ['default', 'default'])
+
+    def testOtherWritesDoNotPin(self):
+        """ Writes of data not read from replicas, like session or last login,
+        should keep reads of the request and next ones on replica
+        """
+        for model in (Session, User):
+            self.assertEqual(
+                self.request('get', self.user, write=True, written=model)[:2], ['replica', 'replica']
+            )
+            self.assertEqual(self.request('get', self.user)[:2], ['replica', 'replica'])
+
+    async def testAsyncRequests(self):
+        """ Async chain should route queries run in threads and pin users
+        """
+        router = self.router
+
+        async def view(request):
+            view.databases.append(await sync_to_async(router.db_for_read)(MatchWithPrevData))
+            if request.method == 'POST':
+                await sync_to_async(router.db_for_write)(Match)
+            return HttpResponse()
+        view.databases = []
+
+        async def auser():
+            return self.user
+
+        middleware = ReplicaMiddleware(view)
+        for method in ('get', 'post', 'get'):
+            request = getattr(AsyncRequestFactory(), method)('/api/matches/')
+            request.auser = auser
+            await middleware(request)
+        self.assertEqual(view.databases, ['replica', 'default', 'default'])
+
+    def testRelationsAcrossReplicas(self):
+        """ Objects read from replica should be assignable to ones from primary
+        """
+        match, character = Match(), Character()
+        match._state.db, character._state.db = 'default', 'replica'
+        self.assertTrue(self.router.allow_relation(match, character))
+        self.assertFalse(self.router.allow_migrate('replica', 'matches'))
+        self.assertIsNone(self.router.allow_migrate('default', 'matches'))
@@ -17,11 +17,13 @@ from django.contrib import admin
 from django.urls import path, include
 from matches.views import index_page
 from django.contrib.auth.views import LoginView, LogoutView
+from ov_mmr_tracker.metrics import metrics_view
 
 urlpatterns = [
     path('accounts/login/', LoginView.as_view(redirect_authenticated_user=True), name="login"),
     path('accounts/logout/', LogoutView.as_view(), name="logout"),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('matches/', include('matches.urls')),
     path('', index_page),
 